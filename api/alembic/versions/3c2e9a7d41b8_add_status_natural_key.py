@@ -0,0 +1,40 @@
+"""Add status natural key
+
+Revision ID: 3c2e9a7d41b8
+Revises: fa19b5cb260e
+Create Date: 2026-10-18 14:05:12.481922
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "3c2e9a7d41b8"
+down_revision: Union[str, None] = "fa19b5cb260e"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Remove rows stored more than once by earlier full re-inserts, keeping the first copy
+    op.execute(
+        """
+        DELETE FROM status_messages a
+        USING status_messages b
+        WHERE a.device_id = b.device_id
+          AND a.timestamp = b.timestamp
+          AND a.id > b.id
+        """
+    )
+    op.create_index(
+        "uq_status_messages_device_id_timestamp",
+        "status_messages",
+        ["device_id", "timestamp"],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("uq_status_messages_device_id_timestamp", table_name="status_messages")
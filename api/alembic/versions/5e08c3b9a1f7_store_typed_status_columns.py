@@ -0,0 +1,77 @@
+"""Store typed status columns
+
+Revision ID: 5e08c3b9a1f7
+Revises: d93a5f27c6e1
+Create Date: 2026-10-18 16:20:57.904113
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "5e08c3b9a1f7"
+down_revision: Union[str, None] = "d93a5f27c6e1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ("status_messages", "device_latest_status")
+
+# Codes match shared.models.NETWORK_STATUSES, 0 is any other value
+NETWORK_STATUS_CODE = """
+    CASE network_status
+        WHEN 'Connected' THEN 1
+        WHEN 'Disconnected' THEN 2
+        WHEN 'Poor Connection' THEN 3
+        ELSE 0
+    END
+"""
+NETWORK_STATUS_NAME = """
+    CASE network_status_code
+        WHEN 1 THEN 'Connected'
+        WHEN 2 THEN 'Disconnected'
+        WHEN 3 THEN 'Poor Connection'
+        ELSE 'Unknown'
+    END
+"""
+STORAGE_USAGE = r"'^\s*(\d+)\s*GB\s*/\s*(\d+)\s*GB\s*$'"
+
+
+def upgrade() -> None:
+    for table in TABLES:
+        op.add_column(table, sa.Column("network_status_code", sa.SmallInteger(), nullable=True))
+        op.add_column(table, sa.Column("storage_used_gb", sa.Integer(), nullable=True))
+        op.add_column(table, sa.Column("storage_total_gb", sa.Integer(), nullable=True))
+        # Strings that do not match the "<used> GB / <total> GB" format are stored as 0 / 0
+        op.execute(
+            f"""
+            UPDATE {table} SET
+                network_status_code = {NETWORK_STATUS_CODE},
+                storage_used_gb = COALESCE((regexp_match(storage_usage, {STORAGE_USAGE}))[1]::integer, 0),
+                storage_total_gb = COALESCE((regexp_match(storage_usage, {STORAGE_USAGE}))[2]::integer, 0)
+            """
+        )
+        op.alter_column(table, "network_status_code", nullable=False)
+        op.alter_column(table, "storage_used_gb", nullable=False)
+        op.alter_column(table, "storage_total_gb", nullable=False)
+        op.drop_column(table, "network_status")
+        op.drop_column(table, "storage_usage")
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        op.add_column(table, sa.Column("network_status", sa.String(), nullable=True))
+        op.add_column(table, sa.Column("storage_usage", sa.String(), nullable=True))
+        op.execute(
+            f"""
+            UPDATE {table} SET
+                network_status = {NETWORK_STATUS_NAME},
+                storage_usage = storage_used_gb || ' GB / ' || storage_total_gb || ' GB'
+            """
+        )
+        op.alter_column(table, "network_status", nullable=False)
+        op.alter_column(table, "storage_usage", nullable=False)
+        op.drop_column(table, "network_status_code")
+        op.drop_column(table, "storage_used_gb")
+        op.drop_column(table, "storage_total_gb")
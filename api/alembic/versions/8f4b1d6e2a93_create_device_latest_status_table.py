@@ -0,0 +1,45 @@
+"""Create device latest status table
+
+Revision ID: 8f4b1d6e2a93
+Revises: 3c2e9a7d41b8
+Create Date: 2026-10-18 14:32:40.113508
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "8f4b1d6e2a93"
+down_revision: Union[str, None] = "3c2e9a7d41b8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "device_latest_status",
+        sa.Column("device_id", sa.String(), nullable=False, primary_key=True),
+        sa.Column("battery_level", sa.Integer(), nullable=False),
+        sa.Column("location", sa.String(), nullable=False),
+        sa.Column("network_status", sa.String(), nullable=False),
+        sa.Column("storage_usage", sa.String(), nullable=False),
+        sa.Column("last_response", sa.String(), nullable=True),
+        sa.Column("timestamp", sa.TIMESTAMP(timezone=True), nullable=False),
+    )
+    # Seed with the newest stored status of every device
+    op.execute(
+        """
+        INSERT INTO device_latest_status
+            (device_id, battery_level, location, network_status, storage_usage, last_response, timestamp)
+        SELECT DISTINCT ON (device_id)
+            device_id, battery_level, location, network_status, storage_usage, last_response, timestamp
+        FROM status_messages
+        ORDER BY device_id, timestamp DESC
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("device_latest_status")
@@ -0,0 +1,71 @@
+"""Create status rollup tables
+
+Revision ID: a4c7e2d8f610
+Revises: 5e08c3b9a1f7
+Create Date: 2026-10-18 17:41:06.218774
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "a4c7e2d8f610"
+down_revision: Union[str, None] = "5e08c3b9a1f7"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Rollup tables and the date_trunc field of their buckets
+ROLLUPS = (("status_rollup_1m", "minute"), ("status_rollup_1h", "hour"))
+
+
+def upgrade() -> None:
+    for table, field in ROLLUPS:
+        op.create_table(
+            table,
+            sa.Column("device_id", sa.String(), nullable=False, primary_key=True),
+            sa.Column("bucket", sa.TIMESTAMP(timezone=True), nullable=False, primary_key=True),
+            sa.Column("samples", sa.Integer(), nullable=False),
+            sa.Column("battery_min", sa.Integer(), nullable=False),
+            sa.Column("battery_max", sa.Integer(), nullable=False),
+            sa.Column("battery_sum", sa.BigInteger(), nullable=False),
+            sa.Column("network_unknown", sa.Integer(), nullable=False, server_default=sa.text("0")),
+            sa.Column("network_connected", sa.Integer(), nullable=False, server_default=sa.text("0")),
+            sa.Column("network_disconnected", sa.Integer(), nullable=False, server_default=sa.text("0")),
+            sa.Column("network_poor_connection", sa.Integer(), nullable=False, server_default=sa.text("0")),
+            sa.Column("storage_used_gb", sa.Integer(), nullable=False),
+            sa.Column("storage_total_gb", sa.Integer(), nullable=False),
+            sa.Column("storage_at", sa.TIMESTAMP(timezone=True), nullable=False),
+        )
+        # Roll up the stored status messages, buckets are aligned in UTC as in the ingestion pipeline
+        op.execute(
+            f"""
+            INSERT INTO {table} (
+                device_id, bucket, samples, battery_min, battery_max, battery_sum,
+                network_unknown, network_connected, network_disconnected, network_poor_connection,
+                storage_used_gb, storage_total_gb, storage_at
+            )
+            SELECT
+                device_id,
+                date_trunc('{field}', timestamp AT TIME ZONE 'UTC') AT TIME ZONE 'UTC',
+                COUNT(*),
+                MIN(battery_level),
+                MAX(battery_level),
+                SUM(battery_level),
+                COUNT(*) FILTER (WHERE network_status_code NOT IN (1, 2, 3)),
+                COUNT(*) FILTER (WHERE network_status_code = 1),
+                COUNT(*) FILTER (WHERE network_status_code = 2),
+                COUNT(*) FILTER (WHERE network_status_code = 3),
+                (array_agg(storage_used_gb ORDER BY timestamp DESC))[1],
+                (array_agg(storage_total_gb ORDER BY timestamp DESC))[1],
+                MAX(timestamp)
+            FROM status_messages
+            GROUP BY 1, 2
+            """
+        )
+
+
+def downgrade() -> None:
+    for table, _ in reversed(ROLLUPS):
+        op.drop_table(table)
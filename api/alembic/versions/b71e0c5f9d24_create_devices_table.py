@@ -0,0 +1,41 @@
+"""Create devices table
+
+Revision ID: b71e0c5f9d24
+Revises: 8f4b1d6e2a93
+Create Date: 2026-10-18 15:02:19.670341
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b71e0c5f9d24"
+down_revision: Union[str, None] = "8f4b1d6e2a93"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "devices",
+        sa.Column("device_id", sa.String(), nullable=False, primary_key=True),
+        sa.Column("first_seen", sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column("last_seen", sa.TIMESTAMP(timezone=True), nullable=False),
+    )
+    op.create_index("ix_devices_last_seen", "devices", ["last_seen"])
+    # Register every device found in the stored status messages
+    op.execute(
+        """
+        INSERT INTO devices (device_id, first_seen, last_seen)
+        SELECT device_id, MIN(timestamp), MAX(timestamp)
+        FROM status_messages
+        GROUP BY device_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_devices_last_seen", table_name="devices")
+    op.drop_table("devices")
@@ -0,0 +1,120 @@
+"""Partition status messages by day
+
+Revision ID: d93a5f27c6e1
+Revises: b71e0c5f9d24
+Create Date: 2026-10-18 15:41:03.228671
+
+"""
+from datetime import date, datetime, timedelta, timezone
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "d93a5f27c6e1"
+down_revision: Union[str, None] = "b71e0c5f9d24"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Partitions created ahead of today, db/partitions.py keeps extending them
+DAYS_AHEAD = 3
+
+
+def create_partition(day: date) -> None:
+    op.execute(
+        f"CREATE TABLE status_messages_p{day:%Y%m%d} PARTITION OF status_messages "
+        f"FOR VALUES FROM ('{day.isoformat()} 00:00:00+00') TO ('{(day + timedelta(days=1)).isoformat()} 00:00:00+00')"
+    )
+
+
+def upgrade() -> None:
+    # Move the heap table aside, its sequence is reused by the partitioned table
+    op.rename_table("status_messages", "status_messages_old")
+    op.execute("ALTER TABLE status_messages_old RENAME CONSTRAINT status_messages_pkey TO status_messages_old_pkey")
+    op.execute("ALTER INDEX uq_status_messages_device_id_timestamp RENAME TO uq_status_messages_old_device_id_timestamp")
+    op.execute("ALTER SEQUENCE status_messages_id_seq OWNED BY NONE")
+
+    # The partition key has to be part of the primary key. timestamp becomes timestamptz,
+    # existing naive values were written in UTC.
+    op.execute(
+        """
+        CREATE TABLE status_messages (
+            id BIGINT NOT NULL DEFAULT nextval('status_messages_id_seq'),
+            device_id VARCHAR NOT NULL,
+            battery_level INTEGER NOT NULL,
+            location VARCHAR NOT NULL,
+            network_status VARCHAR NOT NULL,
+            storage_usage VARCHAR NOT NULL,
+            last_response VARCHAR,
+            timestamp TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+            CONSTRAINT status_messages_pkey PRIMARY KEY (id, timestamp)
+        ) PARTITION BY RANGE (timestamp)
+        """
+    )
+    op.execute("ALTER SEQUENCE status_messages_id_seq OWNED BY status_messages.id")
+    # Serves both the ON CONFLICT natural key and newest-first lookups per device
+    op.execute(
+        "CREATE UNIQUE INDEX uq_status_messages_device_id_timestamp "
+        "ON status_messages (device_id, timestamp DESC)"
+    )
+    op.execute("CREATE TABLE status_messages_default PARTITION OF status_messages DEFAULT")
+
+    bind = op.get_bind()
+    first, last = bind.execute(sa.text("SELECT MIN(timestamp)::date, MAX(timestamp)::date FROM status_messages_old")).one()
+    today = datetime.now(timezone.utc).date()
+    day = min(first or today, today)
+    while day <= max(last or today, today) + timedelta(days=DAYS_AHEAD):
+        create_partition(day)
+        day += timedelta(days=1)
+
+    op.execute(
+        """
+        INSERT INTO status_messages
+            (id, device_id, battery_level, location, network_status, storage_usage, last_response, timestamp)
+        SELECT id, device_id, battery_level, location, network_status, storage_usage, last_response,
+               timestamp AT TIME ZONE 'UTC'
+        FROM status_messages_old
+        """
+    )
+    op.drop_table("status_messages_old")
+
+
+def downgrade() -> None:
+    op.rename_table("status_messages", "status_messages_partitioned")
+    op.execute("ALTER TABLE status_messages_partitioned RENAME CONSTRAINT status_messages_pkey TO status_messages_partitioned_pkey")
+    op.execute("ALTER INDEX uq_status_messages_device_id_timestamp RENAME TO uq_status_messages_partitioned_device_id_timestamp")
+    op.execute("ALTER SEQUENCE status_messages_id_seq OWNED BY NONE")
+
+    op.execute(
+        """
+        CREATE TABLE status_messages (
+            id INTEGER NOT NULL DEFAULT nextval('status_messages_id_seq'),
+            device_id VARCHAR NOT NULL,
+            battery_level INTEGER NOT NULL,
+            location VARCHAR NOT NULL,
+            network_status VARCHAR NOT NULL,
+            storage_usage VARCHAR NOT NULL,
+            last_response VARCHAR,
+            timestamp TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            CONSTRAINT status_messages_pkey PRIMARY KEY (id)
+        )
+        """
+    )
+    op.execute("ALTER SEQUENCE status_messages_id_seq OWNED BY status_messages.id")
+    op.execute(
+        """
+        INSERT INTO status_messages
+            (id, device_id, battery_level, location, network_status, storage_usage, last_response, timestamp)
+        SELECT id, device_id, battery_level, location, network_status, storage_usage, last_response,
+               timestamp AT TIME ZONE 'UTC'
+        FROM status_messages_partitioned
+        """
+    )
+    op.create_index(
+        "uq_status_messages_device_id_timestamp",
+        "status_messages",
+        ["device_id", "timestamp"],
+        unique=True,
+    )
+    op.drop_table("status_messages_partitioned")
@@ -1,9 +1,15 @@
 from shared.mqtt_client import MQTTClient
-from fastapi import FastAPI, HTTPException, status, Depends
+from fastapi import FastAPI, HTTPException, status, Depends, Request, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 # from .routers import status
-from routers import commands, messages, devices
+from routers import commands, messages, devices, fleet
 from typing import List 
 from mqtt_config import mqtt
+from ingestion import status_pipeline
+from db.partitions import partition_maintenance_loop
+from metrics import HTTP_REQUESTS, HTTP_REQUEST_SECONDS
+import asyncio
+import time
 
 # Create an instance of the fastapi framework
 app = FastAPI(
@@ -18,6 +24,45 @@ mqtt.init_app(app)
 app.include_router(commands.router)
 app.include_router(messages.router)
 app.include_router(devices.router)
+app.include_router(fleet.router)
+
+
+background_tasks = []
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """
+    Count every request and record its latency, labelled by route template rather than
+    path so per-device URLs do not create a series each.
+    """
+    started = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    path = route.path if route is not None else "unmatched"
+    HTTP_REQUEST_SECONDS.labels(request.method, path).observe(time.perf_counter() - started)
+    HTTP_REQUESTS.labels(request.method, path, response.status_code).inc()
+    return response
+
+
+@app.on_event("startup")
+async def start_ingestion():
+    """
+    Start the background flusher that writes received status messages to the database,
+    and the job that creates upcoming status partitions and drops expired ones.
+    """
+    await status_pipeline.start()
+    background_tasks.append(asyncio.create_task(partition_maintenance_loop()))
+
+
+@app.on_event("shutdown")
+async def stop_ingestion():
+    """
+    Stop the background jobs and the flusher, writing any status messages still queued.
+    """
+    for task in background_tasks:
+        task.cancel()
+    await status_pipeline.stop()
 
 @app.get("/")
 def home():
@@ -30,6 +75,14 @@ def home():
     return {"Message": "Welcome to the http api wrapper for mqtt devices"}
 
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """
+    Prometheus metrics of the MQTT callbacks, ingestion pipeline, database and HTTP routes.
+    """
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
 if __name__ == "__main__":
     # Run the FastAPI app using uvicorn
     import uvicorn
@@ -0,0 +1,125 @@
+import itertools
+import sys
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, List, Optional, Tuple
+
+# Memory budget of the command response buffer. The oldest responses are evicted once
+# the estimated size of the buffered responses goes over it.
+RESPONSE_BUFFER_BYTES: int = 16 * 1024 * 1024
+
+
+def estimate_size(message: Dict) -> int:
+    """
+    Rough size in bytes of a flat message dict, counting the dict and its keys and values.
+    """
+    return sys.getsizeof(message) + sum(sys.getsizeof(key) + sys.getsizeof(value) for key, value in message.items())
+
+
+class ResponseBuffer:
+    """
+    Bounded in-memory buffer of command responses, indexed by device.
+
+    Responses are kept in arrival order in a global deque and in a deque per device. Each
+    response gets a sequence number (seq) that clients use as a cursor to fetch only the
+    responses received after the last one they saw. When the estimated size of the buffer
+    goes over the memory budget, the oldest responses are evicted.
+
+    Attributes:
+        memory_budget (int): Maximum estimated size of the buffered responses in bytes.
+        size (int): Current estimated size of the buffered responses in bytes.
+        evicted (int): Number of responses evicted so far.
+    """
+
+    def __init__(self, memory_budget: int = RESPONSE_BUFFER_BYTES):
+        """
+        Initialize an empty buffer.
+
+        Args:
+            memory_budget (int): Maximum estimated size of the buffered responses in bytes.
+        """
+        self.memory_budget: int = memory_budget
+        self.size: int = 0
+        self.evicted: int = 0
+        self._seq = itertools.count(1)
+        self._responses: Deque[Tuple[int, Dict]] = deque()
+        self._by_device: Dict[str, Deque[Tuple[int, Dict]]] = {}
+        self._sizes: Dict[int, int] = {}
+
+    def append(self, response: Dict) -> int:
+        """
+        Add a response, evicting the oldest ones if the buffer goes over its budget.
+
+        Args:
+            response (dict): Decoded response, with device_id and timestamp.
+
+        Returns:
+            int: Sequence number of the response.
+        """
+        seq = next(self._seq)
+        response["seq"] = seq
+        entry = (seq, response)
+        self._responses.append(entry)
+        self._by_device.setdefault(response["device_id"], deque()).append(entry)
+        self._sizes[seq] = estimate_size(response)
+        self.size += self._sizes[seq]
+        while self.size > self.memory_budget and len(self._responses) > 1:
+            self._evict()
+        return seq
+
+    def _evict(self) -> None:
+        """
+        Remove the oldest response, which is also the oldest response of its device.
+        """
+        seq, response = self._responses.popleft()
+        device_responses = self._by_device[response["device_id"]]
+        device_responses.popleft()
+        if not device_responses:
+            del self._by_device[response["device_id"]]
+        self.size -= self._sizes.pop(seq)
+        self.evicted += 1
+
+    def query(
+        self,
+        device_id: Optional[str] = None,
+        after: Optional[int] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: int = 100,
+    ) -> List[Dict]:
+        """
+        Return buffered responses in arrival order.
+
+        Args:
+            device_id (Optional[str]): Only responses of this device.
+            after (Optional[int]): Only responses with a sequence number above this cursor.
+            since (Optional[datetime]): Only responses received at or after this time.
+            until (Optional[datetime]): Only responses received before this time.
+            limit (int): Maximum number of responses returned.
+
+        Returns:
+            List[dict]: The oldest matching responses, at most limit of them.
+        """
+        entries = self._responses if device_id is None else self._by_device.get(device_id, ())
+        if after is not None:
+            # Walk back from the newest entry to the cursor instead of scanning the whole buffer
+            newer = []
+            for seq, response in reversed(entries):
+                if seq <= after:
+                    break
+                newer.append((seq, response))
+            entries = reversed(newer)
+
+        results = []
+        for _, response in entries:
+            if since is not None and response["timestamp"] < since:
+                continue
+            if until is not None and response["timestamp"] >= until:
+                break
+            results.append(response)
+            if len(results) >= limit:
+                break
+        return results
+
+    def __len__(self) -> int:
+        return len(self._responses)
@@ -0,0 +1,89 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from metrics import register_stats
+
+# Cache sizing. Entries written by the MQTT callback are always current, the TTL
+# only bounds how long a row loaded from the database is served without re-reading it.
+LATEST_STATUS_CACHE_SIZE: int = 100000
+LATEST_STATUS_TTL: float = 60.0  # seconds
+
+
+class LatestStatusCache:
+    """
+    In-process LRU cache of the latest status of each device, with a time-to-live per entry.
+
+    The MQTT status callback writes every message into the cache, so dashboard polling of a
+    device that is reporting is answered without a database round-trip. Access is guarded by
+    a lock so the cache can also be used from sync endpoints, which run in a thread pool.
+
+    Attributes:
+        maxsize (int): Maximum number of devices kept, the least recently used is evicted first.
+        ttl (float): Seconds an entry stays valid after it was written.
+    """
+
+    def __init__(self, maxsize: int = LATEST_STATUS_CACHE_SIZE, ttl: float = LATEST_STATUS_TTL):
+        """
+        Initialize an empty cache.
+
+        Args:
+            maxsize (int): Maximum number of devices kept.
+            ttl (float): Seconds an entry stays valid after it was written.
+        """
+        self.maxsize: int = maxsize
+        self.ttl: float = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def get(self, device_id: str) -> Optional[Dict]:
+        """
+        Return the cached status of a device.
+
+        Args:
+            device_id (str): Unique identifier of the device.
+
+        Returns:
+            Optional[dict]: The latest status, or None if it is not cached or has expired.
+        """
+        with self._lock:
+            entry = self._entries.get(device_id)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[device_id]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(device_id)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, device_id: str, status: Dict) -> None:
+        """
+        Store a status unless the cache already holds a newer one for the device.
+
+        Args:
+            device_id (str): Unique identifier of the device.
+            status (dict): Status row, including its timestamp.
+        """
+        with self._lock:
+            current = self._entries.get(device_id)
+            if current is not None and current[1]["timestamp"] > status["timestamp"]:
+                return
+            self._entries[device_id] = (time.monotonic() + self.ttl, status)
+            self._entries.move_to_end(device_id)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+latest_status_cache = LatestStatusCache()
+register_stats(
+    "latest_status_cache",
+    lambda: {"entries": len(latest_status_cache), "hits": latest_status_cache.hits, "misses": latest_status_cache.misses},
+    counters=("hits", "misses"),
+)
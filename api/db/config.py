@@ -12,5 +12,10 @@ class Settings():
     db_username: str = os.environ['POSTGRES_USER']
     password: str = os.environ['POSTGRES_PASSWORD']
     port_id: int = int(os.environ['POSTGRES_PORT'])
+    # Connection pool and query limits
+    pool_size: int = int(os.environ.get('POSTGRES_POOL_SIZE', 10))
+    max_overflow: int = int(os.environ.get('POSTGRES_MAX_OVERFLOW', 20))
+    pool_timeout: float = float(os.environ.get('POSTGRES_POOL_TIMEOUT', 30))  # seconds to wait for a free connection
+    statement_timeout: int = int(os.environ.get('POSTGRES_STATEMENT_TIMEOUT', 30000))  # milliseconds
 
 settings = Settings()
@@ -1,27 +1,36 @@
-from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base 
-from sqlalchemy.orm import sessionmaker 
 
 from .config import settings 
+from metrics import DB_CHECKOUT_SECONDS
 
 username = settings.db_username
 ip_address = settings.hostname
 password = settings.password 
 db_name = settings.database
+port = settings.port_id
 
-SQLALCHEMY_DB_URL = f"postgresql://{username}:{password}@{ip_address}/{db_name}"
+SQLALCHEMY_DB_URL = f"postgresql+asyncpg://{username}:{password}@{ip_address}:{port}/{db_name}"
 
-engine = create_engine(SQLALCHEMY_DB_URL)
+# Async engine, so database I/O never blocks the event loop that also handles the MQTT subscriptions
+engine = create_async_engine(
+    SQLALCHEMY_DB_URL,
+    pool_size=settings.pool_size,
+    max_overflow=settings.max_overflow,
+    pool_timeout=settings.pool_timeout,
+    pool_pre_ping=True,
+    connect_args={"server_settings": {"statement_timeout": str(settings.statement_timeout)}},
+)
 
 # To talk to the sql database:
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
 
 Base = declarative_base() 
 
 # Dependency:
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db 
-    finally:
-        db.close()
\ No newline at end of file
+async def get_db():
+    async with SessionLocal() as db:
+        # Check the connection out up front so the time waiting on the pool is measured
+        with DB_CHECKOUT_SECONDS.labels("request").time():
+            await db.connection()
+        yield db
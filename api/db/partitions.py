@@ -0,0 +1,192 @@
+import asyncio
+import logging
+import re
+from datetime import date, datetime, time, timedelta, timezone
+from typing import List
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from .database import engine
+
+logger = logging.getLogger(__name__)
+
+# status_messages is range partitioned by day. Partitions are created ahead of time and
+# dropped whole once they fall out of the retention window, instead of deleting rows.
+PARTITIONED_TABLE: str = "status_messages"
+DEFAULT_PARTITION: str = f"{PARTITIONED_TABLE}_default"  # Catches rows outside every daily partition
+PARTITION_DAYS_AHEAD: int = 3
+RETENTION_DAYS: int = 30
+MAINTENANCE_INTERVAL: float = 3600.0  # seconds
+# Detaching a partition locks the whole table, so give up rather than queue every insert behind a long reader
+DETACH_LOCK_TIMEOUT: str = "5s"
+
+PARTITION_NAME = re.compile(rf"^{PARTITIONED_TABLE}_p(\d{{8}})$")
+
+
+def partition_name(day: date) -> str:
+    """
+    Name of the partition holding the rows of a day, e.g. status_messages_p20240131.
+    """
+    return f"{PARTITIONED_TABLE}_p{day:%Y%m%d}"
+
+
+def create_partition(connection: Connection, day: date) -> None:
+    """
+    Create the partition of a day if it does not exist yet. Bounds are UTC midnights.
+
+    Rows of that day already stored in the default partition, e.g. from a device whose clock is ahead,
+    are moved into the new partition, as Postgres refuses to create a partition whose rows sit in the default one.
+
+    Args:
+        connection (Connection): Open database connection.
+        day (date): Day covered by the partition.
+    """
+    name = partition_name(day)
+    if connection.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar() is not None:
+        return
+    bounds = {
+        "lower": datetime.combine(day, time.min, tzinfo=timezone.utc),
+        "upper": datetime.combine(day + timedelta(days=1), time.min, tzinfo=timezone.utc),
+    }
+    values = (
+        f"FOR VALUES FROM ('{day.isoformat()} 00:00:00+00') TO ('{(day + timedelta(days=1)).isoformat()} 00:00:00+00')"
+    )
+    stray = connection.execute(text(
+        f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE timestamp >= :lower AND timestamp < :upper)"
+    ), bounds).scalar()
+    if not stray:
+        connection.execute(text(f"CREATE TABLE {name} PARTITION OF {PARTITIONED_TABLE} {values}"))
+        return
+
+    connection.execute(text(f"CREATE TABLE {name} (LIKE {PARTITIONED_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    moved = connection.execute(text(
+        f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE timestamp >= :lower AND timestamp < :upper RETURNING *) "
+        f"INSERT INTO {name} SELECT * FROM moved"
+    ), bounds).rowcount
+    connection.execute(text(f"ALTER TABLE {PARTITIONED_TABLE} ATTACH PARTITION {name} {values}"))
+    logger.info(f"Moved {moved} rows from {DEFAULT_PARTITION} to the new partition {name}")
+
+
+def ensure_partitions(connection: Connection, today: date, days_ahead: int = PARTITION_DAYS_AHEAD) -> None:
+    """
+    Create the partitions from today up to days_ahead days in the future.
+
+    Args:
+        connection (Connection): Open database connection.
+        today (date): Current UTC day.
+        days_ahead (int): Number of future days to create partitions for.
+    """
+    for offset in range(days_ahead + 1):
+        create_partition(connection, today + timedelta(days=offset))
+
+
+def expired_partitions(connection: Connection, today: date, retention_days: int = RETENTION_DAYS) -> List[str]:
+    """
+    List the daily partitions older than the retention window.
+
+    Args:
+        connection (Connection): Open database connection.
+        today (date): Current UTC day.
+        retention_days (int): Number of days of history to keep, today included.
+
+    Returns:
+        List[str]: Names of the expired partitions.
+    """
+    oldest_kept = today - timedelta(days=retention_days - 1)
+    partitions = connection.execute(text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class parent ON pg_inherits.inhparent = parent.oid "
+        "JOIN pg_class child ON pg_inherits.inhrelid = child.oid "
+        "WHERE parent.relname = :parent"
+    ), {"parent": PARTITIONED_TABLE}).scalars().all()
+
+    expired = []
+    for name in partitions:
+        match = PARTITION_NAME.match(name)
+        if match is not None and datetime.strptime(match.group(1), "%Y%m%d").date() < oldest_kept:
+            expired.append(name)
+    return expired
+
+
+def drop_partition(connection: Connection, name: str) -> None:
+    """
+    Detach and drop a partition, waiting at most DETACH_LOCK_TIMEOUT for the lock on the table.
+
+    Args:
+        connection (Connection): Open database connection, in the transaction dropping the partition.
+        name (str): Name of the partition.
+    """
+    connection.execute(text(f"SET LOCAL lock_timeout = '{DETACH_LOCK_TIMEOUT}'"))
+    connection.execute(text(f"ALTER TABLE {PARTITIONED_TABLE} DETACH PARTITION {name}"))
+    connection.execute(text(f"DROP TABLE {name}"))
+
+
+def expire_default_rows(connection: Connection, today: date, retention_days: int = RETENTION_DAYS) -> int:
+    """
+    Delete the rows of the default partition older than the retention window.
+
+    Returns:
+        int: Number of deleted rows.
+    """
+    oldest_kept = datetime.combine(today - timedelta(days=retention_days - 1), time.min, tzinfo=timezone.utc)
+    return connection.execute(
+        text(f"DELETE FROM {DEFAULT_PARTITION} WHERE timestamp < :oldest_kept"), {"oldest_kept": oldest_kept}
+    ).rowcount
+
+
+async def maintain_partitions() -> List[str]:
+    """
+    Create upcoming partitions and drop expired ones.
+
+    Every step runs in its own transaction, so a partition that cannot be created or a drop that
+    times out waiting for its lock does not roll back the others, and is retried on the next run.
+
+    Returns:
+        List[str]: Names of the dropped partitions.
+    """
+    today = datetime.now(timezone.utc).date()
+    try:
+        async with engine.begin() as connection:
+            await connection.run_sync(ensure_partitions, today)
+    except Exception as e:
+        logger.error(f"Failed to create upcoming partitions: {e}")
+
+    async with engine.begin() as connection:
+        expired = await connection.run_sync(expired_partitions, today)
+    dropped = []
+    for name in expired:
+        try:
+            async with engine.begin() as connection:
+                await connection.run_sync(drop_partition, name)
+            dropped.append(name)
+        except Exception as e:
+            logger.error(f"Failed to drop expired partition {name}: {e}")
+    if dropped:
+        logger.info(f"Dropped expired partitions: {', '.join(dropped)}")
+
+    async with engine.begin() as connection:
+        expired_rows = await connection.run_sync(expire_default_rows, today)
+    if expired_rows:
+        logger.info(f"Deleted {expired_rows} expired rows from {DEFAULT_PARTITION}")
+    return dropped
+
+
+async def partition_maintenance_loop(interval: float = MAINTENANCE_INTERVAL) -> None:
+    """
+    Run maintain_partitions every interval seconds until cancelled.
+
+    Args:
+        interval (float): Seconds between two runs.
+    """
+    while True:
+        try:
+            await maintain_partitions()
+        except Exception as e:
+            logger.error(f"Partition maintenance failed: {e}")
+        await asyncio.sleep(interval)
+
+
+if __name__ == "__main__":
+    # Run once, e.g. from cron: python -m db.partitions
+    print(asyncio.run(maintain_partitions()))
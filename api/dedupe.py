@@ -0,0 +1,101 @@
+from typing import Dict, Tuple
+
+from metrics import register_stats
+
+# Sequence numbers remembered behind the newest one of each device, older redeliveries are let through
+DEDUPE_WINDOW: int = 1024
+
+
+class SequenceDeduplicator:
+    """
+    Detects status messages delivered more than once, from the sequence number stamped by each device.
+
+    QoS 1 delivers every status at least once: a message whose acknowledgement was lost is sent
+    again, by the device to the broker or by the broker to the API. Each device numbers its
+    statuses with an increasing seq, and the deduplicator keeps, per device, the highest seq seen
+    and a bitmap of the window seqs below it that were already received. A seq seen before is a
+    duplicate; one that is newer moves the window forward. A seq further than window behind the
+    highest one can no longer be checked: it is let through without changing the window, and is
+    only counted as stale. The unique (device_id, timestamp) index still keeps it from being stored
+    twice, and the device state ignores statuses older than its own.
+
+    The deduplicator holds one entry per device and is only used on the event loop, so it needs no lock.
+
+    Attributes:
+        window (int): Number of seqs remembered behind the highest one of each device.
+        duplicates (int): Number of duplicate messages detected.
+        stale (int): Number of messages let through because their seq was too far behind to be checked.
+    """
+
+    def __init__(self, window: int = DEDUPE_WINDOW):
+        """
+        Initialize an empty deduplicator.
+
+        Args:
+            window (int): Number of seqs remembered behind the highest one of each device.
+        """
+        self.window: int = window
+        self.duplicates: int = 0
+        self.stale: int = 0
+        self._seen: Dict[str, Tuple[int, int]] = {}  # device_id -> (highest seq, bitmap of seqs received below it)
+
+    def accept(self, device_id: str, seq: int) -> bool:
+        """
+        Check a received seq of a device and record it unless it is a duplicate.
+
+        Args:
+            device_id (str): The device that sent the message.
+            seq (int): Sequence number of the message.
+
+        Returns:
+            bool: False if the message is a duplicate and must be discarded.
+        """
+        if self.is_duplicate(device_id, seq):
+            return False
+        self.record(device_id, seq)
+        return True
+
+    def is_duplicate(self, device_id: str, seq: int) -> bool:
+        """
+        Whether a seq of a device was already recorded, without recording it.
+        """
+        state = self._seen.get(device_id)
+        if state is None or seq > state[0]:
+            return False
+        highest, bitmap = state
+        behind = highest - seq
+        if behind == 0 or (behind <= self.window and bitmap & (1 << (behind - 1))):
+            self.duplicates += 1
+            return True
+        return False
+
+    def record(self, device_id: str, seq: int) -> None:
+        """
+        Record a seq of a device once its message was accepted.
+        """
+        state = self._seen.get(device_id)
+        if state is None:
+            self._seen[device_id] = (seq, 0)
+            return
+        highest, bitmap = state
+        if seq > highest:
+            shift = seq - highest
+            bitmap = ((bitmap << shift) | (1 << (shift - 1))) & ((1 << self.window) - 1) if shift <= self.window else 0
+            self._seen[device_id] = (seq, bitmap)
+            return
+        behind = highest - seq
+        if behind > self.window:
+            self.stale += 1
+        elif behind:
+            self._seen[device_id] = (highest, bitmap | (1 << (behind - 1)))
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+
+status_dedupe = SequenceDeduplicator()
+register_stats(
+    "status_dedupe",
+    lambda: {"devices": len(status_dedupe), "duplicates": status_dedupe.duplicates, "stale": status_dedupe.stale},
+    counters=("duplicates", "stale"),
+)
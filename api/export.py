@@ -0,0 +1,196 @@
+import csv
+import io
+import json
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional
+
+from sqlalchemy import or_, select
+
+import models
+from db import database
+from shared.models import network_status_name
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet export is optional
+    pa = None
+    pq = None
+
+# Rows fetched per query, the export holds at most one chunk in memory
+EXPORT_CHUNK_SIZE: int = 5000
+
+EXPORT_COLUMNS = (
+    "device_id",
+    "timestamp",
+    "battery_level",
+    "location",
+    "network_status",
+    "storage_used_gb",
+    "storage_total_gb",
+    "last_response",
+)
+MEDIA_TYPES: Dict[str, str] = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def export_formats() -> List[str]:
+    """
+    Export formats available, Parquet only when pyarrow is installed.
+    """
+    return [name for name in MEDIA_TYPES if name != "parquet" or pq is not None]
+
+
+async def status_chunks(
+    device_ids: Optional[List[str]] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+) -> AsyncIterator[List[Dict]]:
+    """
+    Stream stored status messages in chunks, ordered by device and time.
+
+    Each chunk is read by its own short query, resuming after the (device_id, timestamp) key of the
+    previous chunk, and the session is released before the chunk is yielded. However slowly the
+    client downloads, the export never holds a connection or a transaction open, which would keep
+    locks on every partition and block partition maintenance, and the inserts queued behind it.
+
+    Args:
+        device_ids (Optional[List[str]]): Only these devices, all of them if None.
+        since (Optional[datetime]): Only statuses taken at or after this time.
+        until (Optional[datetime]): Only statuses taken before this time.
+        chunk_size (int): Rows fetched per query.
+
+    Yields:
+        List[dict]: Up to chunk_size rows with the EXPORT_COLUMNS.
+    """
+    status = models.Status
+    query = select(
+        status.device_id,
+        status.timestamp,
+        status.battery_level,
+        status.location,
+        status.network_status_code,
+        status.storage_used_gb,
+        status.storage_total_gb,
+        status.last_response,
+    ).order_by(status.device_id, status.timestamp)
+    if device_ids:
+        query = query.where(status.device_id.in_(device_ids))
+    if since is not None:
+        query = query.where(status.timestamp >= since)
+    if until is not None:
+        query = query.where(status.timestamp < until)
+
+    query = query.limit(chunk_size)
+
+    page = query
+    while True:
+        async with database.SessionLocal() as db:
+            rows = [dict(row) for row in (await db.execute(page)).mappings().all()]
+        if not rows:
+            return
+        last_device_id, last_timestamp = rows[-1]["device_id"], rows[-1]["timestamp"]
+        # The redundant device_id bound lets the scan start at the last device instead of filtering from the first
+        page = query.where(
+            status.device_id >= last_device_id,
+            or_(status.device_id > last_device_id, status.timestamp > last_timestamp),
+        )
+        for row in rows:
+            row["network_status"] = network_status_name(row.pop("network_status_code"))
+        yield rows
+        if len(rows) < chunk_size:
+            return
+
+
+async def to_csv(chunks: AsyncIterator[List[Dict]]) -> AsyncIterator[str]:
+    """
+    Encode chunks of rows as CSV, with a header line.
+    """
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS, extrasaction="ignore")
+    writer.writeheader()
+    async for rows in chunks:
+        for row in rows:
+            row["timestamp"] = row["timestamp"].isoformat()
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _ordered(row: Dict) -> Dict:
+    return {column: row[column] for column in EXPORT_COLUMNS}
+
+
+async def to_ndjson(chunks: AsyncIterator[List[Dict]]) -> AsyncIterator[str]:
+    """
+    Encode chunks of rows as newline-delimited JSON, one object per row.
+    """
+    async for rows in chunks:
+        for row in rows:
+            row["timestamp"] = row["timestamp"].isoformat()
+        yield "".join(json.dumps(_ordered(row)) + "\n" for row in rows)
+
+
+class _ChunkSink:
+    """
+    Write-only file collecting the bytes written by the Parquet writer until they are taken,
+    while reporting the total number of bytes written as its position.
+    """
+
+    def __init__(self):
+        self._parts: List[bytes] = []
+        self._position: int = 0
+        self.closed: bool = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def take(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+async def to_parquet(chunks: AsyncIterator[List[Dict]]) -> AsyncIterator[bytes]:
+    """
+    Encode chunks of rows as a Parquet file, one row group per chunk.
+    """
+    schema = pa.schema([
+        ("device_id", pa.string()),
+        ("timestamp", pa.timestamp("us", tz="UTC")),
+        ("battery_level", pa.int32()),
+        ("location", pa.string()),
+        ("network_status", pa.string()),
+        ("storage_used_gb", pa.int32()),
+        ("storage_total_gb", pa.int32()),
+        ("last_response", pa.string()),
+    ])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    async for rows in chunks:
+        writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+        yield sink.take()
+    writer.close()
+    yield sink.take()
+
+
+ENCODERS = {"csv": to_csv, "ndjson": to_ndjson, "parquet": to_parquet}
@@ -0,0 +1,136 @@
+import time
+from typing import Dict
+
+import numpy as np
+
+from metrics import register_stats
+from shared.models import NETWORK_STATUSES, UNKNOWN_NETWORK_STATUS
+
+# Devices the snapshot has room for before its columns are grown (doubled)
+INITIAL_CAPACITY: int = 1024
+BATTERY_BINS = np.arange(0, 101, 10)  # 10% wide battery histogram bins, the last one includes 100
+PERCENTILES = (10, 25, 50, 75, 90, 99)
+NETWORK_STATUS_LABELS = (UNKNOWN_NETWORK_STATUS,) + NETWORK_STATUSES
+
+
+class FleetSnapshot:
+    """
+    Latest state of every device, kept in NumPy columns for fleet-wide aggregates.
+
+    Each device gets a row the first time it reports, and its row is overwritten in place by
+    every newer status, so aggregates over the whole fleet are vectorized operations over a
+    few contiguous arrays instead of loops over message dicts or database scans. The snapshot
+    is only updated and read on the event loop, so it needs no lock.
+
+    Attributes:
+        size (int): Number of devices in the snapshot.
+    """
+
+    def __init__(self, capacity: int = INITIAL_CAPACITY):
+        """
+        Initialize an empty snapshot.
+
+        Args:
+            capacity (int): Initial number of rows of the columns.
+        """
+        self.size: int = 0
+        self._rows: Dict[str, int] = {}
+        self.battery = np.zeros(capacity, dtype=np.int16)
+        self.network_status_code = np.zeros(capacity, dtype=np.int8)
+        self.storage_used_gb = np.zeros(capacity, dtype=np.int32)
+        self.storage_total_gb = np.zeros(capacity, dtype=np.int32)
+        self.last_seen = np.zeros(capacity, dtype=np.float64)  # Unix time of the latest status
+
+    def _grow(self) -> None:
+        capacity = len(self.battery) * 2
+        for name in ("battery", "network_status_code", "storage_used_gb", "storage_total_gb", "last_seen"):
+            column = getattr(self, name)
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            setattr(self, name, grown)
+
+    def update(self, row: Dict) -> None:
+        """
+        Store the status of a device unless the snapshot already holds a newer one.
+
+        Args:
+            row (dict): Status row as written by the ingestion pipeline, with a timezone-aware timestamp.
+        """
+        seen = row["timestamp"].timestamp()
+        index = self._rows.get(row["device_id"])
+        if index is None:
+            if self.size == len(self.battery):
+                self._grow()
+            index = self.size
+            self._rows[row["device_id"]] = index
+            self.size += 1
+        elif self.last_seen[index] > seen:
+            return
+        self.battery[index] = row["battery_level"]
+        self.network_status_code[index] = row["network_status_code"]
+        self.storage_used_gb[index] = row["storage_used_gb"]
+        self.storage_total_gb[index] = row["storage_total_gb"]
+        self.last_seen[index] = seen
+
+    def summary(self, online_window: float = 60.0, low_battery: int = 20, online_only: bool = False) -> Dict:
+        """
+        Aggregate the latest state of the fleet.
+
+        Args:
+            online_window (float): Seconds since its last status after which a device is offline.
+            low_battery (int): Battery level under which a device counts as low on battery.
+            online_only (bool): Aggregate only the devices that are online.
+
+        Returns:
+            dict: Device counts, battery histogram and percentiles, network status counts and storage usage.
+        """
+        last_seen = self.last_seen[:self.size]
+        online = last_seen >= time.time() - online_window
+        online_count = int(np.count_nonzero(online))
+        selected = online if online_only else slice(None)
+
+        battery = self.battery[:self.size][selected]
+        codes = self.network_status_code[:self.size][selected]
+        used = self.storage_used_gb[:self.size][selected]
+        total = self.storage_total_gb[:self.size][selected]
+        count = len(battery)
+
+        histogram, _ = np.histogram(battery, bins=BATTERY_BINS)
+        codes = np.where((codes > 0) & (codes <= len(NETWORK_STATUSES)), codes, 0)
+        network_counts = np.bincount(codes, minlength=len(NETWORK_STATUS_LABELS))
+        usage = np.divide(used, total, out=np.zeros(count), where=total > 0)
+
+        return {
+            "devices": self.size,
+            "online": online_count,
+            "offline": self.size - online_count,
+            "aggregated": count,
+            "battery": {
+                "mean": float(battery.mean()) if count else None,
+                "low": int(np.count_nonzero(battery < low_battery)),
+                "percentiles": self._percentiles(battery),
+                "histogram": [
+                    {"low": int(low), "high": int(high), "devices": int(devices)}
+                    for low, high, devices in zip(BATTERY_BINS[:-1], BATTERY_BINS[1:], histogram)
+                ],
+            },
+            "network_status": {label: int(devices) for label, devices in zip(NETWORK_STATUS_LABELS, network_counts)},
+            "storage": {
+                "used_gb": int(used.sum()),
+                "total_gb": int(total.sum()),
+                "usage_percentiles": self._percentiles(usage * 100),
+            },
+        }
+
+    @staticmethod
+    def _percentiles(values: np.ndarray) -> Dict[str, float]:
+        if not len(values):
+            return {}
+        return {f"p{p}": float(value) for p, value in zip(PERCENTILES, np.percentile(values, PERCENTILES))}
+
+    def __len__(self) -> int:
+        return self.size
+
+
+fleet_snapshot = FleetSnapshot()
+register_stats("fleet_snapshot", lambda: {"devices": len(fleet_snapshot)})
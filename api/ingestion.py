@@ -0,0 +1,454 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple, Union
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+
+import models
+from rollups import write_rollups
+from db import database
+from db.partitions import PARTITION_DAYS_AHEAD
+from metrics import DB_CHECKOUT_SECONDS, DB_COMMIT_SECONDS, INGESTION_BATCH_ROWS, INGESTION_BATCH_SECONDS, register_stats
+from shared.models import network_status_code, parse_storage_usage
+
+logger = logging.getLogger(__name__)
+
+# Ingestion tuning. The queue bounds memory, the batch size and flush interval
+# decide how often the flusher writes to the database.
+MAX_QUEUE_SIZE: int = 10000
+BATCH_SIZE: int = 500
+FLUSH_INTERVAL: float = 1.0  # seconds
+PUT_TIMEOUT: float = 0.5  # seconds a producer waits on a full queue before dropping
+WRITE_RETRIES: int = 2  # times a failed batch is retried before its rows are written one by one
+RETRY_BACKOFF: float = 0.2  # seconds before the first retry, doubled for each further retry
+FLUSH_TIMEOUT: float = 30.0  # seconds a requested flush waits for the flusher before giving up
+# Statuses stamped further ahead by a device clock are rejected, they would land in the default partition
+MAX_CLOCK_SKEW: timedelta = timedelta(days=PARTITION_DAYS_AHEAD)
+
+STATUS_COLUMNS = frozenset(column.name for column in models.Status.__table__.columns if column.name != "id")
+
+
+def parse_timestamp(value: Union[str, datetime]) -> datetime:
+    """
+    Convert a status timestamp to a timezone-aware datetime. Naive values are taken as UTC.
+
+    Args:
+        value (Union[str, datetime]): ISO formatted string or datetime.
+
+    Returns:
+        datetime: Timezone-aware timestamp.
+
+    Raises:
+        ValueError: If the value is neither an ISO formatted string nor a datetime.
+    """
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if not isinstance(value, datetime):
+        raise ValueError(f"Invalid timestamp: {value!r}")
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def status_row(message: Dict) -> Dict:
+    """
+    Reduce a decoded status message to the columns of the status_messages table.
+    The network status is stored as its code and the storage usage as used/total gigabytes.
+    The fields the live views aggregate are validated here, so a malformed message is rejected
+    before it changes any state.
+
+    Args:
+        message (dict): Decoded status message.
+
+    Returns:
+        dict: Row ready to be inserted.
+
+    Raises:
+        KeyError: If a required field is missing.
+        ValueError: If the device ID is not a non-empty string, the battery level is not an integer, the storage usage
+                    or timestamp cannot be parsed, or the timestamp is more than MAX_CLOCK_SKEW ahead.
+    """
+    row = {key: value for key, value in message.items() if key in STATUS_COLUMNS}
+    if not isinstance(message["device_id"], str) or not message["device_id"]:
+        raise ValueError(f"Invalid device ID: {message['device_id']!r}")
+    try:
+        row["battery_level"] = int(message["battery_level"])
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid battery level: {message['battery_level']!r}")
+    row["network_status_code"] = network_status_code(message["network_status"])
+    row["storage_used_gb"], row["storage_total_gb"] = parse_storage_usage(message["storage_usage"])
+    row["timestamp"] = parse_timestamp(row["timestamp"])
+    if row["timestamp"] > datetime.now(timezone.utc) + MAX_CLOCK_SKEW:
+        raise ValueError(f"Timestamp too far in the future: {row['timestamp'].isoformat()}")
+    return row
+
+
+def latest_rows(rows: List[Dict]) -> List[Dict]:
+    """
+    Keep only the newest row of each device.
+
+    Args:
+        rows (List[dict]): Status rows.
+
+    Returns:
+        List[dict]: One row per device.
+    """
+    latest: Dict[str, Dict] = {}
+    for row in rows:
+        current = latest.get(row["device_id"])
+        if current is None or current["timestamp"] < row["timestamp"]:
+            latest[row["device_id"]] = row
+    return list(latest.values())
+
+
+def device_rows(rows: List[Dict]) -> List[Dict]:
+    """
+    Summarise status rows into one devices registry row per device.
+
+    Args:
+        rows (List[dict]): Status rows.
+
+    Returns:
+        List[dict]: device_id with the first and last timestamp seen in the rows.
+    """
+    devices: Dict[str, Dict] = {}
+    for row in rows:
+        device = devices.get(row["device_id"])
+        if device is None:
+            devices[row["device_id"]] = {
+                "device_id": row["device_id"],
+                "first_seen": row["timestamp"],
+                "last_seen": row["timestamp"],
+            }
+        else:
+            device["first_seen"] = min(device["first_seen"], row["timestamp"])
+            device["last_seen"] = max(device["last_seen"], row["timestamp"])
+    return list(devices.values())
+
+
+class StatusIngestionPipeline:
+    """
+    Write-behind pipeline that persists device status messages in batches.
+
+    Status messages received over MQTT are put on a bounded asyncio queue. A background
+    flusher drains the queue and writes a batch with a single multi-row insert whenever
+    the batch is full or the flush interval has elapsed, whichever comes first.
+
+    The flusher is the only consumer and drains the queue in order, so the number of rows it
+    has handed to the database (flushed_seq) is a high-water mark over the queue: a flush
+    requested after N rows were queued is complete once flushed_seq reaches N. Rows are deduplicated on (device_id, timestamp), so a redelivered
+    status is skipped by the database instead of stored twice.
+
+    A batch that fails to be written is retried with exponential backoff, which rides out transient
+    database errors. If it still fails, its rows are written one by one so a single malformed row only
+    loses itself.
+
+    Attributes:
+        queue (asyncio.Queue): Bounded queue of status rows waiting to be written.
+        batch_size (int): Maximum number of rows written per insert.
+        flush_interval (float): Maximum seconds a row waits in a partial batch.
+        put_timeout (float): Seconds a producer waits on a full queue before the message is dropped.
+    """
+
+    def __init__(
+        self,
+        max_queue_size: int = MAX_QUEUE_SIZE,
+        batch_size: int = BATCH_SIZE,
+        flush_interval: float = FLUSH_INTERVAL,
+        put_timeout: float = PUT_TIMEOUT,
+    ):
+        """
+        Initialize the pipeline. The flusher is not running until start() is awaited.
+
+        Args:
+            max_queue_size (int): Capacity of the queue.
+            batch_size (int): Maximum number of rows written per insert.
+            flush_interval (float): Maximum seconds a row waits in a partial batch.
+            put_timeout (float): Seconds a producer waits on a full queue before dropping.
+        """
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue_size)
+        self.batch_size: int = batch_size
+        self.flush_interval: float = flush_interval
+        self.put_timeout: float = put_timeout
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: asyncio.Event = asyncio.Event()
+        self._flush_requested: asyncio.Event = asyncio.Event()
+        self._flushed: asyncio.Condition = asyncio.Condition()
+
+        # Position in the queue of the last flushed row
+        self.flushed_seq: int = 0
+
+        # Counters exposed through stats()
+        self.enqueued: int = 0
+        self.dropped: int = 0
+        self.written: int = 0
+        self.inserted: int = 0
+        self.duplicates: int = 0
+        self.failed: int = 0
+        self.flushes: int = 0
+        self.last_flush_latency: float = 0.0
+        self.max_flush_latency: float = 0.0
+        self.total_flush_latency: float = 0.0
+
+    async def submit(self, message: Dict) -> bool:
+        """
+        Queue a status message for persistence.
+
+        When the queue is full the caller waits up to put_timeout for the flusher to make
+        room, which slows the producer down. If there is still no room the message is dropped.
+
+        Args:
+            message (dict): Decoded status message.
+
+        Returns:
+            bool: True if the message was queued, False if it was dropped.
+        """
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            try:
+                await asyncio.wait_for(self.queue.put(message), timeout=self.put_timeout)
+            except asyncio.TimeoutError:
+                self.dropped += 1
+                return False
+        self.enqueued += 1
+        # Wake the flusher when a batch starts (to arm its timer) and when a batch is full
+        depth = self.queue.qsize()
+        if depth == 1 or depth >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    async def flush(self) -> Dict:
+        """
+        Write every row queued so far, without waiting for the flush interval.
+
+        Returns:
+            dict: Rows written, inserted, skipped as duplicates and failed during this flush,
+                  plus the high-water mark reached.
+
+        Raises:
+            asyncio.TimeoutError: If the flusher did not reach the high-water mark within FLUSH_TIMEOUT.
+        """
+        target = self.enqueued
+        before = (self.written, self.inserted, self.duplicates, self.failed)
+        if self._task is None or self._task.done():
+            while self.flushed_seq < target and not self.queue.empty():
+                await self._flush(self._drain(self.batch_size))
+        else:
+            self._flush_requested.set()
+            self._wakeup.set()
+            async with self._flushed:
+                await asyncio.wait_for(self._flushed.wait_for(lambda: self.flushed_seq >= target), timeout=FLUSH_TIMEOUT)
+        return {
+            "written": self.written - before[0],
+            "inserted": self.inserted - before[1],
+            "duplicates": self.duplicates - before[2],
+            "failed": self.failed - before[3],
+            "high_water_mark": self.flushed_seq,
+            "pending": self.queue.qsize(),
+        }
+
+    async def start(self) -> None:
+        """
+        Start the background flusher task.
+        """
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Stop the flusher and write whatever is still queued.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        while not self.queue.empty():
+            await self._flush(self._drain(self.batch_size))
+
+    async def _run(self) -> None:
+        """
+        Flusher loop: write a batch once it is full, flush_interval has passed since its
+        first row was queued, or a flush was requested.
+        """
+        while True:
+            await self._wait_for_batch()
+            await self._flush(self._drain(self.batch_size))
+            if self.queue.empty():
+                self._flush_requested.clear()
+
+    async def _wait_for_batch(self) -> None:
+        """
+        Wait until a batch should be written.
+        """
+        deadline = None
+        while True:
+            depth = self.queue.qsize()
+            if depth >= self.batch_size or (depth and self._flush_requested.is_set()):
+                return
+            if depth and deadline is None:
+                deadline = time.monotonic() + self.flush_interval
+            timeout = None if deadline is None else deadline - time.monotonic()
+            if timeout is not None and timeout <= 0:
+                return
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                return
+
+    def _drain(self, limit: int) -> List[Dict]:
+        """
+        Take up to limit rows off the queue without waiting.
+        """
+        rows = []
+        while len(rows) < limit:
+            try:
+                rows.append(self.queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        return rows
+
+    async def _flush(self, rows: List[Dict]) -> None:
+        """
+        Write a batch to the database, advance the high-water mark and record the flush latency.
+        """
+        if not rows:
+            return
+        started = time.perf_counter()
+        try:
+            inserted, failed = await self._write(rows)
+        except asyncio.CancelledError:
+            # Stopped mid-write: count the rows as failed and release the flushes waiting on them
+            self.failed += len(rows)
+            await self._advance(len(rows))
+            raise
+        self.written += len(rows) - failed
+        self.inserted += inserted
+        self.duplicates += len(rows) - failed - inserted
+        self.failed += failed
+        latency = time.perf_counter() - started
+        INGESTION_BATCH_SECONDS.observe(latency)
+        INGESTION_BATCH_ROWS.observe(len(rows))
+        self.flushes += 1
+        self.last_flush_latency = latency
+        self.max_flush_latency = max(self.max_flush_latency, latency)
+        self.total_flush_latency += latency
+        await self._advance(len(rows))
+
+    async def _advance(self, count: int) -> None:
+        """
+        Move the high-water mark past count handled rows and wake the flushes waiting on it.
+        """
+        async with self._flushed:
+            self.flushed_seq += count
+            self._flushed.notify_all()
+
+    async def _write(self, rows: List[Dict]) -> Tuple[int, int]:
+        """
+        Write a batch, retrying it with backoff on failure and then falling back to one insert per row.
+
+        Returns:
+            Tuple[int, int]: Number of rows inserted and number of rows that could not be written.
+        """
+        for attempt in range(WRITE_RETRIES + 1):
+            try:
+                return await self._write_batch(rows), 0
+            except Exception as e:
+                logger.warning(f"Failed to write {len(rows)} status messages (attempt {attempt + 1}): {e}")
+            if attempt < WRITE_RETRIES:
+                await asyncio.sleep(RETRY_BACKOFF * 2 ** attempt)
+        if len(rows) == 1:
+            logger.error(f"Dropping status message of {rows[0].get('device_id')} that could not be written")
+            return 0, 1
+
+        inserted = failed = 0
+        for row in rows:
+            try:
+                inserted += await self._write_batch([row])
+            except Exception as e:
+                failed += 1
+                logger.error(f"Dropping status message of {row.get('device_id')} that could not be written: {e}")
+        return inserted, failed
+
+    @staticmethod
+    async def _write_batch(rows: List[Dict]) -> int:
+        """
+        Insert the rows with a single executemany, which SQLAlchemy sends as multi-row VALUES.
+        Rows whose (device_id, timestamp) is already stored, or repeated within the batch, are skipped. The newest row of each
+        device is upserted into device_latest_status, the device registry is updated and the
+        inserted rows are added to the status rollups in the same transaction.
+
+        Returns:
+            int: Number of rows actually inserted.
+        """
+        statement = (
+            insert(models.Status)
+            .on_conflict_do_nothing(index_elements=["device_id", "timestamp"])
+            .returning(models.Status.device_id, models.Status.timestamp)
+        )
+        latest = insert(models.DeviceLatestStatus)
+        latest = latest.on_conflict_do_update(
+            index_elements=["device_id"],
+            set_={column: latest.excluded[column] for column in STATUS_COLUMNS if column != "device_id"},
+            where=models.DeviceLatestStatus.timestamp < latest.excluded.timestamp,
+        )
+        devices = insert(models.Device)
+        devices = devices.on_conflict_do_update(
+            index_elements=["device_id"],
+            set_={
+                "first_seen": func.least(models.Device.first_seen, devices.excluded.first_seen),
+                "last_seen": func.greatest(models.Device.last_seen, devices.excluded.last_seen),
+            },
+        )
+        # Keep the first row of each key, so a reading repeated in the batch is not rolled up twice
+        unique: Dict[Tuple[str, datetime], Dict] = {}
+        for row in rows:
+            unique.setdefault((row["device_id"], row["timestamp"]), row)
+        async with database.SessionLocal() as db:
+            with DB_CHECKOUT_SECONDS.labels("ingestion").time():
+                await db.connection()
+            inserted = set((await db.execute(statement, list(unique.values()))).tuples().all())
+            await db.execute(latest, latest_rows(rows))
+            await db.execute(devices, device_rows(rows))
+            await write_rollups(db, [row for key, row in unique.items() if key in inserted])
+            with DB_COMMIT_SECONDS.labels("ingestion").time():
+                await db.commit()
+        return len(inserted)
+
+    def stats(self) -> Dict:
+        """
+        Snapshot of the pipeline counters.
+
+        Returns:
+            dict: Queue depth, message counters and flush latencies in seconds.
+        """
+        return {
+            "queue_depth": self.queue.qsize(),
+            "queue_capacity": self.queue.maxsize,
+            "enqueued": self.enqueued,
+            "dropped": self.dropped,
+            "written": self.written,
+            "inserted": self.inserted,
+            "duplicates": self.duplicates,
+            "failed": self.failed,
+            "high_water_mark": self.flushed_seq,
+            "flushes": self.flushes,
+            "last_flush_latency": self.last_flush_latency,
+            "max_flush_latency": self.max_flush_latency,
+            "avg_flush_latency": self.total_flush_latency / self.flushes if self.flushes else 0.0,
+        }
+
+
+status_pipeline = StatusIngestionPipeline()
+register_stats(
+    "ingestion",
+    status_pipeline.stats,
+    counters=("enqueued", "dropped", "written", "inserted", "duplicates", "failed", "flushes"),
+)
@@ -0,0 +1,103 @@
+import functools
+import time
+from typing import Callable, Dict, Iterable
+
+from prometheus_client import Counter, Histogram, REGISTRY
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+# Buckets of the latency histograms in seconds, from sub-millisecond callbacks to slow batch writes
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PAYLOAD_BUCKETS = (64, 128, 256, 512, 1024, 4096, 16384, 65536, 262144)
+BATCH_ROWS_BUCKETS = (1, 10, 50, 100, 250, 500, 1000, 5000)
+
+MQTT_MESSAGES = Counter(
+    "mqtt_messages_received", "MQTT messages received, by subscription", ["subscription"]
+)
+MQTT_MESSAGES_DISCARDED = Counter(
+    "mqtt_messages_discarded", "MQTT messages discarded before ingestion, by subscription and reason", ["subscription", "reason"]
+)
+MQTT_PAYLOAD_BYTES = Histogram(
+    "mqtt_payload_bytes", "Size of the received MQTT payloads", ["subscription"], buckets=PAYLOAD_BUCKETS
+)
+MQTT_CALLBACK_SECONDS = Histogram(
+    "mqtt_callback_duration_seconds", "Time spent in the MQTT subscription callbacks", ["subscription"], buckets=LATENCY_BUCKETS
+)
+DB_CHECKOUT_SECONDS = Histogram(
+    "db_session_checkout_seconds", "Time waiting for a database connection from the pool", ["operation"], buckets=LATENCY_BUCKETS
+)
+DB_COMMIT_SECONDS = Histogram(
+    "db_commit_duration_seconds", "Time spent committing database transactions", ["operation"], buckets=LATENCY_BUCKETS
+)
+INGESTION_BATCH_SECONDS = Histogram(
+    "ingestion_batch_write_seconds", "Time to write one batch of status messages", buckets=LATENCY_BUCKETS
+)
+INGESTION_BATCH_ROWS = Histogram(
+    "ingestion_batch_rows", "Status messages per written batch", buckets=BATCH_ROWS_BUCKETS
+)
+HTTP_REQUESTS = Counter(
+    "http_requests", "HTTP requests handled, by route and status code", ["method", "route", "status"]
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "HTTP request latency, by route", ["method", "route"], buckets=LATENCY_BUCKETS
+)
+
+
+def instrument_mqtt(subscription: str) -> Callable:
+    """
+    Decorator counting the messages of an MQTT subscription callback, their payload size and
+    the time spent handling them. Apply it below @mqtt.subscribe.
+
+    Args:
+        subscription (str): Label of the subscription, e.g. "device/status".
+    """
+    messages = MQTT_MESSAGES.labels(subscription)
+    payload_bytes = MQTT_PAYLOAD_BYTES.labels(subscription)
+    callback_seconds = MQTT_CALLBACK_SECONDS.labels(subscription)
+
+    def decorator(callback: Callable) -> Callable:
+        @functools.wraps(callback)
+        async def wrapper(client, topic, payload, qos, properties):
+            messages.inc()
+            payload_bytes.observe(len(payload))
+            started = time.perf_counter()
+            try:
+                return await callback(client, topic, payload, qos, properties)
+            finally:
+                callback_seconds.observe(time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+class StatsCollector:
+    """
+    Exposes the counters a component already keeps in a stats() dict, read at scrape time,
+    so they are not counted twice.
+    """
+
+    def __init__(self, prefix: str, stats: Callable[[], Dict], counters: Iterable[str]):
+        """
+        Args:
+            prefix (str): Prefix of the metric names, e.g. "ingestion".
+            stats (Callable[[], Dict]): Returns the current values by name.
+            counters (Iterable[str]): Names of the values that only grow, exposed as counters. The others are gauges.
+        """
+        self.prefix: str = prefix
+        self.stats: Callable[[], Dict] = stats
+        self.counters = frozenset(counters)
+
+    def collect(self):
+        for name, value in self.stats().items():
+            metric = f"{self.prefix}_{name}"
+            if name in self.counters:
+                yield CounterMetricFamily(metric, f"{self.prefix} {name.replace('_', ' ')}", value=value)
+            else:
+                yield GaugeMetricFamily(metric, f"{self.prefix} {name.replace('_', ' ')}", value=value)
+
+
+def register_stats(prefix: str, stats: Callable[[], Dict], counters: Iterable[str] = ()) -> StatsCollector:
+    """
+    Register a StatsCollector on the default registry.
+    """
+    collector = StatsCollector(prefix, stats, counters)
+    REGISTRY.register(collector)
+    return collector
@@ -1,15 +1,102 @@
 from db.database import Base 
-from sqlalchemy import Column, Integer, String, ForeignKey, VARCHAR, Boolean, TIMESTAMP, text
+from sqlalchemy import Column, BigInteger, Integer, SmallInteger, String, ForeignKey, VARCHAR, Boolean, TIMESTAMP, Index, text
 from sqlalchemy.orm import relationship 
+from shared.models import NETWORK_STATUSES, network_status_name, format_storage_usage
 
-class Status(Base):
+
+class StatusColumns:
+    """
+    Status reading columns shared by status_messages and device_latest_status.
+    network_status and storage_usage are stored as numbers and rebuilt as strings for the API views.
+    """
+    battery_level = Column(Integer, nullable=False)
+    location = Column(String, nullable=False)
+    network_status_code = Column(SmallInteger, nullable=False)
+    storage_used_gb = Column(Integer, nullable=False)
+    storage_total_gb = Column(Integer, nullable=False)
+    last_response = Column(String, nullable=True)
+
+    @property
+    def network_status(self) -> str:
+        return network_status_name(self.network_status_code)
+
+    @property
+    def storage_usage(self) -> str:
+        return format_storage_usage(self.storage_used_gb, self.storage_total_gb)
+
+
+class Status(StatusColumns, Base):
+    """
+    Status messages, range partitioned by day on timestamp (see db/partitions.py).
+    The partition key has to be part of the primary key.
+    """
     __tablename__ = "status_messages"
-    id = Column(Integer, primary_key=True, nullable=False)
+    id = Column(BigInteger, primary_key=True, nullable=False, server_default=text("nextval('status_messages_id_seq')"))
     device_id = Column(String, nullable=False)
-    battery_level = Column(Integer, nullable=False)
-    location = Column(String, default=True)
-    network_status =Column(String, nullable=False)
-    storage_usage = Column(String, nullable=False)
-    last_response =  Column(String, nullable=True)
-    timestamp = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text('now()'))
+    timestamp = Column(TIMESTAMP(timezone=True), primary_key=True, nullable=False, server_default=text('now()'))
+
+    __table_args__ = {"postgresql_partition_by": "RANGE (timestamp)"}
+
+# Natural key of a status reading, used to skip redelivered messages on insert, and newest-first lookups per device
+Index("uq_status_messages_device_id_timestamp", Status.device_id, Status.timestamp.desc(), unique=True)
+
+
+
+class DeviceLatestStatus(StatusColumns, Base):
+    """
+    Latest status of each device, upserted by the ingestion pipeline so lookups never scan status_messages.
+    """
+    __tablename__ = "device_latest_status"
+    device_id = Column(String, primary_key=True, nullable=False)
+    timestamp = Column(TIMESTAMP(timezone=True), nullable=False)
+
+
+class Device(Base):
+    """
+    Registry of every device that has reported a status, upserted by the ingestion pipeline.
+    """
+    __tablename__ = "devices"
+    device_id = Column(String, primary_key=True, nullable=False)
+    first_seen = Column(TIMESTAMP(timezone=True), nullable=False)
+    last_seen = Column(TIMESTAMP(timezone=True), nullable=False, index=True)
+
+
+# Rollup column counting the readings of each network status code, index 0 for unknown statuses
+NETWORK_COUNT_COLUMNS = ("network_unknown",) + tuple(
+    "network_" + name.lower().replace(" ", "_") for name in NETWORK_STATUSES
+)
+
+
+class StatusRollupColumns:
+    """
+    Aggregates of the status readings of one device over one time bucket, upserted by the ingestion pipeline.
+    Every column is a sum, a minimum, a maximum or the value of the newest reading, so a batch of new readings
+    is merged into an existing bucket without reading its raw rows again.
+    """
+    device_id = Column(String, primary_key=True, nullable=False)
+    bucket = Column(TIMESTAMP(timezone=True), primary_key=True, nullable=False)
+    samples = Column(Integer, nullable=False)
+    battery_min = Column(Integer, nullable=False)
+    battery_max = Column(Integer, nullable=False)
+    battery_sum = Column(BigInteger, nullable=False)
+    network_unknown = Column(Integer, nullable=False, server_default=text("0"))
+    network_connected = Column(Integer, nullable=False, server_default=text("0"))
+    network_disconnected = Column(Integer, nullable=False, server_default=text("0"))
+    network_poor_connection = Column(Integer, nullable=False, server_default=text("0"))
+    storage_used_gb = Column(Integer, nullable=False)
+    storage_total_gb = Column(Integer, nullable=False)
+    storage_at = Column(TIMESTAMP(timezone=True), nullable=False)  # timestamp of the reading the storage comes from
+
+
+class StatusRollupMinute(StatusRollupColumns, Base):
+    """
+    Per-device status rollup over 1-minute buckets.
+    """
+    __tablename__ = "status_rollup_1m"
+
 
+class StatusRollupHour(StatusRollupColumns, Base):
+    """
+    Per-device status rollup over 1-hour buckets.
+    """
+    __tablename__ = "status_rollup_1h"
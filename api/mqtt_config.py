@@ -1,11 +1,47 @@
 from fastapi_mqtt import FastMQTT, MQTTConfig 
 from datetime import datetime 
+import os
+from typing import Any
+from shared.codec import codec_for
 # Declare the mqtt broker, and topics
 mqtt_broker = "mosquitto"
 topic_status = "device/status"
 topic_response = "device/response"
 topic_command = "device/command"
 
+# QoS of each topic, 1 for at least once delivery (duplicate statuses are discarded by dedupe.status_dedupe)
+QOS_STATUS: int = int(os.environ.get("MQTT_QOS_STATUS", 1))
+QOS_RESPONSE: int = int(os.environ.get("MQTT_QOS_RESPONSE", 1))
+QOS_COMMAND: int = int(os.environ.get("MQTT_QOS_COMMAND", 1))
+# Stable client ID, so the broker keeps the persistent session and queues QoS 1 messages while the API is down.
+# Every API replica needs its own.
+MQTT_CLIENT_ID: str = os.environ.get("MQTT_CLIENT_ID", "backend-api")
+
+
+def device_command_topic(device_id: str) -> str:
+    """
+    Topic of the commands addressed to a single device, e.g. device/command/6eee65279d79.
+    """
+    return f"{topic_command}/{device_id}"
+
+
+def payload_codec(topic: str, properties: dict):
+    """
+    Codec of a received payload, advertised by the MQTT v5 content-type property
+    or by the codec suffix of the topic (e.g. device/status/msgpack). JSON is the default.
+    """
+    content_type = (properties or {}).get("content_type")
+    if isinstance(content_type, (list, tuple)):
+        content_type = content_type[0] if content_type else None
+    return codec_for(topic, content_type)
+
+
+def decode_payload(topic: str, payload: bytes, properties: dict) -> Any:
+    """
+    Decode a received payload with its codec, see payload_codec.
+    """
+    return payload_codec(topic, properties).decode(payload)
+
 
 # Set the mqtt configuration commands. Use default port 1883 
 mqtt_config = MQTTConfig(host = mqtt_broker,
@@ -17,5 +53,6 @@ mqtt_config = MQTTConfig(host = mqtt_broker,
 # Create an instance of the fastmqtt library
 mqtt = FastMQTT(
     config=mqtt_config,
+    client_id=MQTT_CLIENT_ID,
     clean_session=False
     )
\ No newline at end of file
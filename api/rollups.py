@@ -0,0 +1,160 @@
+import math
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import case, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import models
+from shared.models import NETWORK_STATUSES, UNKNOWN_NETWORK_STATUS, format_storage_usage
+
+# Rollup tables by bucket width in seconds, finest first
+ROLLUPS: Tuple[Tuple[int, type], ...] = (
+    (60, models.StatusRollupMinute),
+    (3600, models.StatusRollupHour),
+)
+# Maximum number of points returned by the history endpoint, a coarser resolution is used for longer ranges
+MAX_HISTORY_POINTS: int = 1000
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+NETWORK_STATUS_LABELS = (UNKNOWN_NETWORK_STATUS,) + NETWORK_STATUSES
+
+
+def bucket_start(timestamp: datetime, seconds: int) -> datetime:
+    """
+    Start of the bucket of a given width holding a timestamp, buckets being aligned on the Unix epoch.
+    """
+    offset = (timestamp - EPOCH) // timedelta(seconds=seconds)
+    return EPOCH + timedelta(seconds=offset * seconds)
+
+
+def reading_rollup(row: Dict) -> Dict:
+    """
+    Rollup of a single status reading, in the format of the status rows written by the ingestion pipeline.
+    """
+    battery = row["battery_level"]
+    code = row["network_status_code"]
+    rollup = {
+        "device_id": row["device_id"],
+        "bucket": row["timestamp"],
+        "samples": 1,
+        "battery_min": battery,
+        "battery_max": battery,
+        "battery_sum": battery,
+        "storage_used_gb": row["storage_used_gb"],
+        "storage_total_gb": row["storage_total_gb"],
+        "storage_at": row["timestamp"],
+    }
+    for column in models.NETWORK_COUNT_COLUMNS:
+        rollup[column] = 0
+    rollup[models.NETWORK_COUNT_COLUMNS[code if 0 < code < len(models.NETWORK_COUNT_COLUMNS) else 0]] = 1
+    return rollup
+
+
+def merge_rollups(rollups: Iterable[Dict], seconds: int) -> List[Dict]:
+    """
+    Merge rollups, or single readings from reading_rollup, into one rollup per device and bucket.
+
+    Args:
+        rollups (Iterable[dict]): Rollups with their bucket start (or reading timestamp).
+        seconds (int): Width of the merged buckets in seconds.
+
+    Returns:
+        List[dict]: The merged rollups, ordered by device and bucket.
+    """
+    merged: Dict[Tuple[str, datetime], Dict] = {}
+    for rollup in rollups:
+        key = (rollup["device_id"], bucket_start(rollup["bucket"], seconds))
+        current = merged.get(key)
+        if current is None:
+            merged[key] = {**rollup, "bucket": key[1]}
+            continue
+        current["samples"] += rollup["samples"]
+        current["battery_min"] = min(current["battery_min"], rollup["battery_min"])
+        current["battery_max"] = max(current["battery_max"], rollup["battery_max"])
+        current["battery_sum"] += rollup["battery_sum"]
+        for column in models.NETWORK_COUNT_COLUMNS:
+            current[column] += rollup[column]
+        if rollup["storage_at"] >= current["storage_at"]:
+            current["storage_used_gb"] = rollup["storage_used_gb"]
+            current["storage_total_gb"] = rollup["storage_total_gb"]
+            current["storage_at"] = rollup["storage_at"]
+    return [merged[key] for key in sorted(merged)]
+
+
+def upsert_rollups(model: type):
+    """
+    Insert statement merging rollups into the existing buckets of a rollup table.
+    """
+    statement = insert(model)
+    excluded = statement.excluded
+    newer = excluded.storage_at >= model.storage_at
+    return statement.on_conflict_do_update(
+        index_elements=["device_id", "bucket"],
+        set_={
+            "samples": model.samples + excluded.samples,
+            "battery_min": func.least(model.battery_min, excluded.battery_min),
+            "battery_max": func.greatest(model.battery_max, excluded.battery_max),
+            "battery_sum": model.battery_sum + excluded.battery_sum,
+            **{column: getattr(model, column) + excluded[column] for column in models.NETWORK_COUNT_COLUMNS},
+            "storage_used_gb": case((newer, excluded.storage_used_gb), else_=model.storage_used_gb),
+            "storage_total_gb": case((newer, excluded.storage_total_gb), else_=model.storage_total_gb),
+            "storage_at": func.greatest(model.storage_at, excluded.storage_at),
+        },
+    )
+
+
+async def write_rollups(db: AsyncSession, rows: List[Dict]) -> None:
+    """
+    Add newly inserted status rows to every rollup table, in the caller's transaction.
+
+    Args:
+        db (AsyncSession): Session of the transaction inserting the rows.
+        rows (List[dict]): Status rows that were actually inserted, so redelivered readings are not counted twice.
+    """
+    if not rows:
+        return
+    readings = [reading_rollup(row) for row in rows]
+    for seconds, model in ROLLUPS:
+        await db.execute(upsert_rollups(model), merge_rollups(readings, seconds))
+
+
+def history_source(since: datetime, until: datetime, resolution: Optional[int] = None) -> Tuple[int, Optional[type]]:
+    """
+    Choose the coarsest rollup table that still provides the requested resolution.
+
+    The resolution is raised so that the range holds at most MAX_HISTORY_POINTS buckets, and rounded up to
+    a multiple of the chosen table's bucket width.
+
+    Args:
+        since (datetime): Start of the range.
+        until (datetime): End of the range.
+        resolution (Optional[int]): Requested bucket width in seconds, the finest that fits MAX_HISTORY_POINTS if None.
+
+    Returns:
+        Tuple[int, Optional[type]]: Bucket width in seconds and rollup model, None to aggregate raw status_messages rows.
+    """
+    needed = max(resolution or 1, math.ceil((until - since).total_seconds() / MAX_HISTORY_POINTS), 1)
+    source_seconds, source = 1, None
+    for seconds, model in ROLLUPS:
+        if seconds <= needed:
+            source_seconds, source = seconds, model
+    return math.ceil(needed / source_seconds) * source_seconds, source
+
+
+def history_point(rollup: Dict) -> Dict:
+    """
+    API view of a rollup bucket.
+    """
+    return {
+        "bucket": rollup["bucket"],
+        "samples": rollup["samples"],
+        "battery_min": rollup["battery_min"],
+        "battery_avg": rollup["battery_sum"] / rollup["samples"],
+        "battery_max": rollup["battery_max"],
+        "network_status": {
+            label: rollup[column] for label, column in zip(NETWORK_STATUS_LABELS, models.NETWORK_COUNT_COLUMNS)
+        },
+        "storage_usage": format_storage_usage(rollup["storage_used_gb"], rollup["storage_total_gb"]),
+    }
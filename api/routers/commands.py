@@ -1,55 +1,96 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, status, Depends, Query
 from shared.models import  Command
-from mqtt_config import mqtt, topic_response, topic_command
-from datetime import datetime 
-from typing import List 
+from mqtt_config import mqtt, topic_response, topic_command, device_command_topic, decode_payload, QOS_COMMAND, QOS_RESPONSE
+from db import database
+from sqlalchemy import select
+import models
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
 import json 
+import uuid
 import schemas 
-from datetime import datetime 
+from buffers import ResponseBuffer
+from tracking import command_tracker
+from metrics import instrument_mqtt, register_stats
 
 router = APIRouter(prefix="/commands", tags=["Commands"])
-response_messages = []
+response_messages = ResponseBuffer()
+register_stats(
+    "response_buffer",
+    lambda: {"responses": len(response_messages), "bytes": response_messages.size, "evicted": response_messages.evicted},
+    counters=("evicted",),
+)
 
 
 @router.post("/post-command", response_model=schemas.CommandResponseView, status_code=status.HTTP_201_CREATED)
-async def send_command_to_topic(command: Command): 
+async def send_command_to_topic(command: schemas.CommandRequest): 
     """
-    Endpoint to broadcast a command to devices via MQTT topic device/command
+    Endpoint to send a command to devices via MQTT topic device/command
 
     This endpoint takes a Command object as input and publishes it to the specified MQTT topic.
     The Command object should adhere to the Command model structure. Action should be "echo", and Parameters should be a dict, with the key as "message" for this to work as expected.
+    The command is given a correlation ID (command_id) unless one is supplied. Devices echo it back in their responses,
+    which can then be fetched with GET /commands/{command_id}.
+
+    Without a target the command is broadcast on device/command. With device_ids, or with online_within to select the devices
+    that reported a status within that many seconds, it is published only on the device/command/{device_id} topic of each
+    targeted device, so the rest of the fleet never receives it.
 
     Args:
-        command (Command): The Command object containing the action and parameters.
+        command (schemas.CommandRequest): The Command object containing the action and parameters, and optionally its targets.
 
     Returns:
         dict: A dictionary indicating the status of the command sending process.
-              If successful, returns {"status": "Command sent successfully!"}
+              If successful, returns {"status": "Command sent successfully!", "command_id": "<id>"}
               If unsuccessful, an exception is raised.
 
     Raises:
+        HTTPException: 404 if the targets select no device.
         Exception: Any exception encountered during the MQTT publish process, or schema not followed.
     """
-    payload = command.model_dump() 
+    if command.command_id is None:
+        command.command_id = uuid.uuid4().hex
+    payload = Command(**command.model_dump(exclude={"device_ids", "online_within"})).model_dump() 
+
+    device_ids = command.device_ids
+    if command.online_within is not None:
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=command.online_within)
+        # Only this selector needs the database, broadcasts do not hold a pooled connection
+        async with database.SessionLocal() as db:
+            selected = (await db.scalars(select(models.Device.device_id).where(models.Device.last_seen >= cutoff))).all()
+        device_ids = sorted(set(device_ids or ()) | set(selected))
+    if device_ids is not None and not device_ids:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No device matches the command's targets")
     
     # Publish the JSON payload to the MQTT topic
     try:
-        mqtt.publish(topic_command, payload) #publishing mqtt topic
+        command_tracker.register(command.command_id, payload, device_ids)
+        if device_ids is None:
+            mqtt.publish(topic_command, payload, qos=QOS_COMMAND) #publishing mqtt topic
+        else:
+            for device_id in device_ids:
+                mqtt.publish(device_command_topic(device_id), payload, qos=QOS_COMMAND)
         # print(f"Sent {payload}!")
-        return  {"status": "Command sent successfully!"}
+        return  {
+            "status": "Command sent successfully!",
+            "command_id": command.command_id,
+            "targets": None if device_ids is None else len(device_ids),
+        }
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"{e}")
 
 
 ''' RESPONSE MESSAGES '''
-@mqtt.subscribe(f"{topic_response}/#")
+@mqtt.subscribe(f"{topic_response}/#", qos=QOS_RESPONSE)
+@instrument_mqtt(topic_response)
 async def response_to_topic(client, topic, payload, qos, properties):
     """
     MQTT Subscription Callback for Response Messages.
 
     This function is called when an MQTT message is received on the specified response topic.
     It is triggered once a command message has been sent by the API.
-    It decodes the payload, adds a timestamp, and appends the message to the response_messages list.
+    It decodes the payload, adds a timestamp, and appends the message to the bounded response_messages buffer.
+    Responses carrying a command_id are also recorded under their command, for GET /commands/{command_id}.
 
     Args:
         client: The MQTT client instance.
@@ -66,32 +107,80 @@ async def response_to_topic(client, topic, payload, qos, properties):
                    The exception details are logged.
 
     Notes:
-        The decoded message is expected to be in JSON format.
+        The message is decoded with the codec the device advertised, JSON by default.
         The timestamp is added to the message for tracking when the response was received.
     """
-    decoded_message = str(payload.decode("utf-8")) 
-    message = json.loads(decoded_message)
-    message['timestamp'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    message = decode_payload(topic, payload, properties)
+    message['timestamp'] = datetime.now(timezone.utc)
     response_messages.append(message)
+    await command_tracker.record(message)
 
 
 
-@router.get("/responses", response_model=List[schemas.ResponseView], status_code=status.HTTP_200_OK)
-def mqtt_responses_to_command():
+@router.get("/responses", response_model=schemas.ResponsesPageView, status_code=status.HTTP_200_OK)
+async def mqtt_responses_to_command(
+    device_id: Optional[str] = None,
+    after: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = Query(default=100, ge=1, le=1000),
+):
     """
     Endpoint to retrieve MQTT responses after command is sent.
 
-    This endpoint returns a list of MQTT responses that have been received by the devices.
-    The responses are expected to adhere to the ResponseView model structure.
+    This endpoint returns the MQTT responses received from the devices that are still held in the bounded response buffer,
+    oldest first. The responses are expected to adhere to the ResponseView model structure.
+    Each response carries a sequence number: pass the next_after value of a page as 'after' to fetch only newer responses.
+
+    Args:
+        device_id: Only responses from this device
+        after: Only responses with a sequence number above this cursor
+        since: Only responses received at or after this time
+        until: Only responses received before this time
+        limit: Maximum number of responses in the page
 
     Returns:
-        List[schemas.ResponseView]: A list of MQTT responses.
+        schemas.ResponsesPageView: A page of MQTT responses.
 
     Raises:
         HTTPException: If there is an issue retrieving the responses,
                        it raises an HTTPException with a 400 status code.
     """
+    # Naive times are taken as UTC, like the stored receipt times
+    since = since.replace(tzinfo=timezone.utc) if since is not None and since.tzinfo is None else since
+    until = until.replace(tzinfo=timezone.utc) if until is not None and until.tzinfo is None else until
     try:
-        return response_messages
+        responses = response_messages.query(device_id=device_id, after=after, since=since, until=until, limit=limit)
+        next_after = responses[-1]["seq"] if responses else after
+        return {"responses": responses, "next_after": next_after}
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e)
+
+
+@router.get("/{command_id}", response_model=schemas.CommandStatusView, status_code=status.HTTP_200_OK)
+async def command_responses(
+    command_id: str,
+    wait_for: int = Query(default=0, ge=0),
+    timeout: float = Query(default=10.0, ge=0, le=60),
+):
+    """
+    Endpoint to retrieve a command sent by the API together with the responses received for it.
+
+    With wait_for set, the request is held open until that many responses have arrived or the timeout passes,
+    so clients can await the outcome of a command instead of polling '/commands/responses'.
+
+    Args:
+        command_id (str): Correlation ID returned by '/commands/post-command'.
+        wait_for: Number of responses to wait for, 0 returns immediately
+        timeout: Maximum seconds to wait for the responses
+
+    Returns:
+        schemas.CommandStatusView: The command and the responses received so far.
+
+    Raises:
+        HTTPException: If the command is unknown or no longer tracked, with a 404 status code.
+    """
+    entry = await command_tracker.wait(command_id, wait_for, timeout)
+    if entry is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Unknown command {command_id}")
+    return entry
@@ -1,71 +1,83 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, status, Depends, Query
 from db.database import get_db
-from typing import List 
+from typing import List, Literal, Optional
+from datetime import datetime, timedelta, timezone
 
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 import models
 import schemas 
-from sqlalchemy import desc 
+from sqlalchemy import desc, select
+from cache import latest_status_cache
+from ingestion import STATUS_COLUMNS, parse_timestamp
+from rollups import bucket_start, history_point, history_source, merge_rollups, reading_rollup
 # from messages import received_messages
 router = APIRouter(prefix="/device", tags=["Devices"])
 
 
 
 
-@router.get("/all-devices",  response_model=List[schemas.DevicesView], status_code=status.HTTP_200_OK)
-def get_all_devices(
-    db: Session = Depends(get_db),
-    limit: int = 5
+@router.get("/all-devices",  response_model=schemas.DevicesPageView, status_code=status.HTTP_200_OK)
+async def get_all_devices(
+    db: AsyncSession = Depends(get_db),
+    limit: int = Query(default=100, ge=1, le=1000),
+    after: Optional[str] = None,
+    state: Optional[Literal["online", "offline"]] = None,
+    online_window: int = Query(default=60, ge=1),
 ):
     """
-    Endpoint to retrieve all unique, non-duplicated device ids from the database messages sent.
+    Endpoint to retrieve the devices that have reported a status, from the device registry.
 
-    This endpoint returns a list of unique device ids, by querying the database and creating a set of all devices found.
-    The limit (5) can be changed depending on traffic and expected number of devices
+    The registry holds one row per device and is kept current by the ingestion pipeline, so the cost of this endpoint
+    depends only on the page size, not on how many status messages are stored. Devices are listed in device_id order.
+    Pages are fetched with a keyset cursor: pass the next_after value of a page as 'after' to get the next one.
 
     Args:
-        db (Session): SQLAlchemy database session. Dependency injection 
-        limit: Number of most recent message entries to fetch from the database table
+        db (AsyncSession): SQLAlchemy database session. Dependency injection 
+        limit: Maximum number of devices in the page
+        after: Only list devices whose device_id sorts after this value
+        state: 'online' for devices that reported within online_window seconds, 'offline' for the others
+        online_window: Seconds since the last status after which a device is considered offline
 
     Returns:
-        List[schemas.DevicesView]: A list of devices subscribed/publishing to the mqtt client.
+        schemas.DevicesPageView: A page of devices subscribed/publishing to the mqtt client.
 
     Raises:
         HTTPException: If there is an issue retrieving the devices,
                        it raises an HTTPException with a 400 status code.
     """
-    # Setup a list to hold distinct devices
-    distinct_device_ids = set()
-    unique_devices: List[schemas.DevicesView] = []
+    query = select(models.Device).order_by(models.Device.device_id).limit(limit)
+    if after is not None:
+        query = query.where(models.Device.device_id > after)
+    if state is not None:
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=online_window)
+        if state == "online":
+            query = query.where(models.Device.last_seen >= cutoff)
+        else:
+            query = query.where(models.Device.last_seen < cutoff)
 
     try:
-        # Fetch message entries from the database
-        # all_messages = db.query(models.Status).limit(limit).all()
-        all_messages = db.query(models.Status).order_by(models.Status.timestamp.desc()).limit(limit).all()
-
-        for entry in all_messages:
-            if entry.device_id not in distinct_device_ids:
-                distinct_device_ids.add(entry.device_id)
-                unique_devices.append(schemas.DevicesView(id=entry.id, device_id=entry.device_id))
-
-        return unique_devices
-    
+        devices = (await db.scalars(query)).all()
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e)
 
+    next_after = devices[-1].device_id if len(devices) == limit else None
+    return {"devices": devices, "next_after": next_after}
+
 
 @router.get("/latest-status-update/{device_id}",  response_model=schemas.StatusView, status_code=status.HTTP_200_OK)
-def latest_device_status_update(
+async def latest_device_status_update(
     device_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Endpoint to retrieve the latest status update for each device.
-    You can get the ID from the '/all-device' post endpoint, to parse in as the api argument.
+    You can get the ID from the '/all-devices' endpoint, to parse in as the api argument.
+    The status is served from the in-process cache kept current by the MQTT callback, and falls back to the
+    device_latest_status table, a primary key lookup, when the device is not cached.
     
     Args:
         device_id (str): Unique identifier of the device.
-        db (Session): SQLAlchemy database session.
+        db (AsyncSession): SQLAlchemy database session.
 
 
     Returns:
@@ -74,12 +86,83 @@ def latest_device_status_update(
     Raises:
         HTTPException: If there is an issue retrieving the responses,
                        it raises an HTTPException with a 400 status code.
+                       If no status has been received from the device, a 404 status code is returned.
     """
+    latest_status = latest_status_cache.get(device_id)
+    if latest_status is not None:
+        return latest_status
+
     try:
         # Query the database to get the latest status updates for the device
-        latest_status = db.query(models.Status).filter(
-            models.Status.device_id == device_id).order_by(models.Status.timestamp.desc()).limit(1).first()
-        
-        return latest_status
+        entry = await db.get(models.DeviceLatestStatus, device_id)
     except Exception as e:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e)
\ No newline at end of file
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e)
+
+    if entry is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"No status received from device {device_id}")
+
+    latest_status = {column: getattr(entry, column) for column in STATUS_COLUMNS}
+    latest_status["timestamp"] = parse_timestamp(latest_status["timestamp"])
+    latest_status_cache.put(device_id, latest_status)
+    return latest_status
+
+
+@router.get("/history/{device_id}", response_model=schemas.HistoryView, status_code=status.HTTP_200_OK)
+async def device_status_history(
+    device_id: str,
+    since: datetime,
+    until: Optional[datetime] = None,
+    resolution: Optional[int] = Query(default=None, ge=1, description="Bucket width in seconds"),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Endpoint to retrieve the status history of a device, aggregated into time buckets.
+
+    Each bucket holds the min/avg/max battery level, the number of readings per network status and the storage usage
+    of its newest reading. The buckets are read from the coarsest rollup table (1-minute or 1-hour) that provides the
+    requested resolution, so charting a week of history reads a few hundred rollup rows instead of every raw reading.
+    Raw status_messages rows are only aggregated for resolutions under a minute. The resolution is raised if needed so
+    the range holds at most rollups.MAX_HISTORY_POINTS buckets.
+
+    Args:
+        device_id (str): Unique identifier of the device.
+        since (datetime): Start of the range.
+        until (Optional[datetime]): End of the range, now by default.
+        resolution (Optional[int]): Bucket width in seconds, the finest that fits the point limit by default.
+        db (AsyncSession): SQLAlchemy database session.
+
+    Returns:
+        schemas.HistoryView: The buckets of the range, oldest first.
+
+    Raises:
+        HTTPException: 400 if the range is empty or the query fails.
+    """
+    since = parse_timestamp(since)
+    until = parse_timestamp(until) if until is not None else datetime.now(timezone.utc)
+    if until <= since:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="'until' must be after 'since'")
+
+    resolution, source = history_source(since, until, resolution)
+    try:
+        if source is None:
+            query = (
+                select(models.Status)
+                .where(models.Status.device_id == device_id, models.Status.timestamp >= since, models.Status.timestamp < until)
+                .order_by(models.Status.timestamp)
+            )
+            rows = [reading_rollup({column: getattr(status_row, column) for column in STATUS_COLUMNS})
+                    for status_row in (await db.scalars(query)).all()]
+            source_name = models.Status.__tablename__
+        else:
+            query = (
+                select(source.__table__)
+                .where(source.device_id == device_id, source.bucket >= bucket_start(since, resolution), source.bucket < until)
+                .order_by(source.bucket)
+            )
+            rows = [dict(row) for row in (await db.execute(query)).mappings().all()]
+            source_name = source.__tablename__
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e)
+
+    points = [history_point(rollup) for rollup in merge_rollups(rows, resolution)]
+    return {"device_id": device_id, "resolution": resolution, "source": source_name, "points": points}
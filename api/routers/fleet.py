@@ -0,0 +1,29 @@
+from fastapi import APIRouter, status, Query
+import schemas
+from fleet import fleet_snapshot
+
+router = APIRouter(prefix="/fleet", tags=["Fleet"])
+
+
+@router.get("/summary", response_model=schemas.FleetSummaryView, status_code=status.HTTP_200_OK)
+async def fleet_summary(
+    online_window: int = Query(default=60, ge=1, description="Seconds since the last status after which a device is offline"),
+    low_battery: int = Query(default=20, ge=0, le=100, description="Battery level under which a device counts as low"),
+    online_only: bool = Query(default=False, description="Aggregate only the online devices"),
+):
+    """
+    Endpoint to retrieve fleet-wide aggregates of the latest status of every device.
+
+    The aggregates are computed from the in-memory fleet snapshot, NumPy columns updated in place by the MQTT status
+    callback, so the endpoint never touches the database and answers in milliseconds for very large fleets.
+    The snapshot only holds the devices that reported since the API started.
+
+    Args:
+        online_window (int): Seconds since the last status after which a device is offline.
+        low_battery (int): Battery level under which a device counts as low on battery.
+        online_only (bool): Aggregate only the devices that are online.
+
+    Returns:
+        schemas.FleetSummaryView: Device counts, battery histogram and percentiles, network status counts and storage usage.
+    """
+    return fleet_snapshot.summary(online_window=online_window, low_battery=low_battery, online_only=online_only)
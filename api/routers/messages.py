@@ -1,18 +1,32 @@
-from fastapi import APIRouter, HTTPException, status, Depends
-from mqtt_config import mqtt, topic_status
+from fastapi import APIRouter, HTTPException, status, Depends, Query
+from fastapi.responses import StreamingResponse
+from mqtt_config import mqtt, topic_status, decode_payload, payload_codec, QOS_STATUS
 from db import database
-from typing import List 
+from typing import List, Literal, Optional
 import json 
+import logging
+import asyncio
 import schemas 
-import models
-from psycopg2.errors import UniqueViolation
 from pydantic import ValidationError
-from db.database import get_db
-from sqlalchemy.orm import Session
-from datetime import datetime 
+from datetime import datetime, timezone
+from collections import deque
+from ingestion import parse_timestamp, status_pipeline, status_row
+from cache import latest_status_cache
+from fleet import fleet_snapshot
+from state import device_states
+from dedupe import status_dedupe
+from metrics import MQTT_MESSAGES_DISCARDED, instrument_mqtt, register_stats
+from shared.codec import decode_batch, is_batch_topic
+from streaming import KEEPALIVE_INTERVAL, SubscriberEvicted, status_stream
+from export import ENCODERS, MEDIA_TYPES, export_formats, status_chunks
 
 router = APIRouter(prefix="/message", tags=["Messages"])
-received_messages = []
+logger = logging.getLogger(__name__)
+
+# Only the most recent messages are kept in memory for the live view, persistence goes through the ingestion pipeline
+RECENT_MESSAGES_LIMIT = 1000
+received_messages = deque(maxlen=RECENT_MESSAGES_LIMIT)
+register_stats("received_messages", lambda: {"buffered": len(received_messages)})
 last_message_received = []
 
 # Global variable to store latest MQTT message
@@ -21,14 +35,16 @@ latest_mqtt_message = None
 # Set up database instance
 db = database.get_db()
 
-@mqtt.subscribe(f"{topic_status}/#")
+@mqtt.subscribe(f"{topic_status}/#", qos=QOS_STATUS)
+@instrument_mqtt(topic_status)
 async def status_message_to_topic(client, topic, payload, qos, properties):
     """
     MQTT Subscription Callback for Response Messages.
 
     This function is called when an MQTT message is received from the device/status topic
     It is triggered once the devices begin broadcasting their status information which is continuous.
-    It decodes the payload, adds a timestamp, and appends the message to the response_messages list.
+    It decodes the payload, adds a timestamp if the device did not send one, keeps the message in the bounded received_messages buffer,
+    updates the latest-status cache and fleet snapshot, and queues it on the ingestion pipeline, which writes it to the database in batches.
 
     Args:
         client: The MQTT client instance.
@@ -45,14 +61,78 @@ async def status_message_to_topic(client, topic, payload, qos, properties):
                    The exception details are logged.
 
     Notes:
-        The decoded message is expected to be in JSON format.
+        The message is decoded with the codec the device advertised, JSON by default.
+        Batches published on device/status/batch are unpacked and each of their messages is ingested on its own.
+        Deltas holding only the changed fields are merged into the device's last known state (see state.DeviceStateMap).
+        Statuses are delivered at least once, those redelivered with an already received seq are discarded (see dedupe.SequenceDeduplicator).
         The timestamp is added to the message for tracking when the response was received.
     """    
-    decoded_message = str(payload.decode("utf-8")) 
-    message = json.loads(decoded_message)
-    message['timestamp'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    if is_batch_topic(topic):
+        try:
+            messages = decode_batch(payload, payload_codec(topic, properties))
+        except Exception as e:
+            logger.warning(f"Discarding malformed status batch on {topic}: {e}")
+            MQTT_MESSAGES_DISCARDED.labels(topic_status, "malformed_batch").inc()
+            return
+        if not isinstance(messages, list) or not all(isinstance(message, dict) for message in messages):
+            logger.warning(f"Discarding malformed status batch on {topic}: not a list of messages")
+            MQTT_MESSAGES_DISCARDED.labels(topic_status, "malformed_batch").inc()
+            return
+        for message in messages:
+            # One bad message does not drop the rest of the batch
+            try:
+                await ingest_status_message(topic, message)
+            except Exception as e:
+                logger.warning(f"Discarding malformed status message on {topic}: {e}")
+                MQTT_MESSAGES_DISCARDED.labels(topic_status, "malformed").inc()
+        return
+    await ingest_status_message(topic, decode_payload(topic, payload, properties))
+
+
+async def ingest_status_message(topic: str, message: dict) -> None:
+    """
+    Keep a decoded status message in the live view and cache, and queue it for the database.
+
+    Args:
+        topic (str): The topic the message was received on, for logging.
+        message (dict): The decoded status message, a full status or a delta of the fields that changed.
+    """
+    # Discard redelivered statuses before they are merged into the device's state
+    seq = message.get('seq')
+    if seq is not None and (not isinstance(seq, int) or isinstance(seq, bool) or seq < 0):
+        logger.warning(f"Discarding malformed status message on {topic}: invalid seq {seq!r}")
+        MQTT_MESSAGES_DISCARDED.labels(topic_status, "malformed").inc()
+        return
+    if seq is not None and status_dedupe.is_duplicate(message.get('device_id'), seq):
+        logger.debug(f"Discarding duplicate status {seq} on {topic}")
+        MQTT_MESSAGES_DISCARDED.labels(topic_status, "duplicate").inc()
+        return
+
+    # Keep the device's own timestamp, it is part of the key used to skip duplicates
+    if not message.get('timestamp'):
+        message['timestamp'] = datetime.now(timezone.utc)
 
+    # Rebuild the full status of devices that only send the changed fields
+    message = device_states.rebuild(message)
+    if message is None:
+        logger.debug(f"Discarding status delta on {topic} received before a keyframe of the device or out of order")
+        MQTT_MESSAGES_DISCARDED.labels(topic_status, "delta_without_keyframe").inc()
+        return
+
+    try:
+        row = status_row(message)
+    except (KeyError, ValueError) as e:
+        logger.warning(f"Discarding malformed status message on {topic}: {e}")
+        MQTT_MESSAGES_DISCARDED.labels(topic_status, "malformed").inc()
+        return
+    if seq is not None:
+        status_dedupe.record(row['device_id'], seq)
+    device_states.remember(message)
     received_messages.append(message)
+    latest_status_cache.put(row['device_id'], row)
+    fleet_snapshot.update(row)
+    status_stream.publish(message)
+    await status_pipeline.submit(row)
 
 
 @router.get("/all-status-messages", response_model=List[schemas.StatusView], status_code=status.HTTP_200_OK)
@@ -71,50 +151,130 @@ def get_all_mqtt_messages():
                        it raises an HTTPException with a 400 status code.
     """
     try:
-        return received_messages[::-1]
+        return list(reversed(received_messages))
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e)
 
-@router.post("/post-all-status-messages", response_model=List[schemas.StatusView], status_code=status.HTTP_201_CREATED)
-async def post_all_mqtt_messages(db: Session = Depends(get_db)):
+@router.get("/stream", status_code=status.HTTP_200_OK)
+async def stream_status_messages(
+    device_id: Optional[List[str]] = Query(default=None, description="Only stream these devices, repeat for several"),
+    min_interval: float = Query(default=0.0, ge=0, le=3600, description="Minimum seconds between two statuses of a device"),
+):
     """
-    Endpoint to bulk insert messages received from devices via MQTT topic device/status to the database
-    This endpoint takes the list of status messages received from the status topic as input and stores it in the database. The list is in descending order of creation datetime.
+    Endpoint to stream live device statuses as server-sent events, instead of polling all-status-messages.
+
+    Each status received from the devices is sent as a "data:" event holding a StatusView. The stream keeps at most one
+    waiting status per device: when the client falls behind, or within min_interval of the last status of a device,
+    newer statuses replace the one not yet sent. A client that still falls too far behind gets an "evicted" event and
+    the stream ends. A keepalive comment is sent when no status was sent for a while.
 
     Args:
-        db (Session): SQLAlchemy database session.
+        device_id (Optional[List[str]]): Devices to stream, all of them if omitted.
+        min_interval (float): Minimum seconds between two statuses of the same device.
 
     Returns:
-        list:  List[schemas.StatusView]: List of inserted status messages.
+        StreamingResponse: text/event-stream of statuses.
 
     Raises:
-        HTTPException: If an error occurs during the insertion process.
+        HTTPException: 503 if the maximum number of streaming clients is reached.
     """
-    message_jsons = []
-    batch_size = 100
-    # Process messages received in descending order and store in database object format
-    for row in received_messages[::-1]:
+    subscriber = status_stream.subscribe(device_id, min_interval)
+    if subscriber is None:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Too many streaming clients")
+
+    async def events():
         try:
-            # print(row)
-            post = models.Status(**row)
-            message_jsons.append(post)
-        except Exception as e:
-            print(e)
-    
-    # Bulk insert messages in batches
+            while True:
+                try:
+                    message = await asyncio.wait_for(subscriber.get(), timeout=KEEPALIVE_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                except SubscriberEvicted:
+                    yield "event: evicted\ndata: {}\n\n"
+                    return
+                yield f"data: {schemas.StatusView.model_validate(message).model_dump_json()}\n\n"
+        finally:
+            status_stream.unsubscribe(subscriber)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@router.get("/export", status_code=status.HTTP_200_OK)
+async def export_status_messages(
+    format: Literal["csv", "ndjson", "parquet"] = "csv",
+    device_id: Optional[List[str]] = Query(default=None, description="Only export these devices, repeat for several"),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+):
+    """
+    Endpoint to export stored status messages as CSV, newline-delimited JSON or Parquet.
+
+    Rows are read from status_messages in keyset-paginated chunks of export.EXPORT_CHUNK_SIZE, each by its own short query,
+    and each chunk is encoded and sent before the next one is fetched. Memory use stays constant however many rows are
+    exported, and a slow download does not hold a database connection or transaction open.
+    Rows are ordered by device and time. Parquet needs the pyarrow package and writes one row group per chunk.
+
+    Args:
+        format (str): "csv", "ndjson" or "parquet".
+        device_id (Optional[List[str]]): Devices to export, all of them if omitted.
+        since (Optional[datetime]): Only statuses taken at or after this time.
+        until (Optional[datetime]): Only statuses taken before this time.
+
+    Returns:
+        StreamingResponse: The exported rows, as an attachment.
+
+    Raises:
+        HTTPException: 400 if the format is not available.
+    """
+    if format not in export_formats():
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Export format {format} is not available")
+    chunks = status_chunks(
+        device_ids=device_id,
+        since=parse_timestamp(since) if since is not None else None,
+        until=parse_timestamp(until) if until is not None else None,
+    )
+    return StreamingResponse(
+        ENCODERS[format](chunks),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="status_messages.{format}"'},
+    )
+
+
+@router.post("/post-all-status-messages", response_model=schemas.FlushSummaryView, status_code=status.HTTP_201_CREATED)
+async def post_all_mqtt_messages():
+    """
+    Endpoint to persist every status message received from devices via MQTT topic device/status that is not yet in the database.
+    Received messages are queued on the ingestion pipeline, which writes them in the background. This endpoint flushes the
+    pipeline up to its current high-water mark instead of waiting for the next scheduled flush, so repeated calls only write
+    rows that arrived since the previous call. Rows already stored for the same device_id and device timestamp are skipped.
+
+    Returns:
+        schemas.FlushSummaryView: Counts of rows written, inserted, skipped as duplicates and failed during the flush.
+
+    Raises:
+        HTTPException: 503 if the pipeline did not finish the flush in time, 500 if an error occurs during the insertion process.
+    """
     try:
-        for i in range(0, len(received_messages), batch_size):
-            batch = message_jsons[i : i + batch_size]
-            try:
-                db.bulk_save_objects(batch)
-                db.commit()
-                # received_messages = []
-            except UniqueViolation:
-                db.rollback()
-        return message_jsons
-    
+        return await status_pipeline.flush()
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="The ingestion pipeline did not finish the flush in time",
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="An error occurred while uploading records",
-        )
\ No newline at end of file
+        )
+
+
+@router.get("/ingestion-stats", response_model=schemas.IngestionStatsView, status_code=status.HTTP_200_OK)
+def ingestion_stats():
+    """
+    Endpoint to retrieve the counters of the status ingestion pipeline.
+
+    Returns:
+        schemas.IngestionStatsView: Queue depth, enqueued/dropped/written message counts and flush latencies.
+    """
+    return status_pipeline.stats()
\ No newline at end of file
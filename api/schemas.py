@@ -1,6 +1,7 @@
 from datetime import datetime
-from pydantic import BaseModel
-from typing import Optional 
+from pydantic import BaseModel, Field, field_validator, model_validator
+from typing import Dict, List, Optional 
+from shared.models import Command, network_status_name, format_storage_usage
 
 
 class StatusView(BaseModel):
@@ -18,6 +19,18 @@ class StatusView(BaseModel):
     class Config:
         from_attributes = True
 
+    @model_validator(mode="before")
+    @classmethod
+    def from_status_row(cls, data):
+        """
+        Rebuild network_status and storage_usage from the stored columns of a status row.
+        """
+        if isinstance(data, dict) and "network_status_code" in data:
+            data = dict(data)
+            data.setdefault("network_status", network_status_name(data["network_status_code"]))
+            data.setdefault("storage_usage", format_storage_usage(data["storage_used_gb"], data["storage_total_gb"]))
+        return data
+
 class CommandView(BaseModel):
     """
     Pydantic model representing a command to be sent to a device.
@@ -25,27 +38,161 @@ class CommandView(BaseModel):
     action: str # "echo"
     parameters: dict # {"message":"<>"}
 
+class CommandRequest(Command):
+    """
+    Pydantic model representing a command to send, with the devices it is addressed to.
+    Without device_ids or online_within the command is broadcast to every device.
+    """
+    device_ids: Optional[List[str]] = None  # ["6eee65279d79"]
+    online_within: Optional[int] = Field(default=None, ge=1)  # also target devices that reported within this many seconds
+
+    @field_validator("device_ids")
+    @classmethod
+    def check_device_ids(cls, device_ids):
+        """
+        Reject device IDs that cannot be used as a single level of the device/command/{device_id} topic.
+        """
+        for device_id in device_ids or ():
+            if not device_id or any(character in device_id for character in "/+#"):
+                raise ValueError(f"Invalid device ID {device_id!r}: it must be non-empty and free of '/', '+' and '#'")
+        return device_ids
+
 class CommandResponseView(BaseModel):
     """
     Pydantic model representing the response to a command sent.
     """
     status: str
+    command_id: Optional[str] = None  # correlation ID echoed back by the devices
+    targets: Optional[int] = None  # number of devices addressed, None for a broadcast
 
 class ResponseView(BaseModel):
     """
     Pydantic model representing a response received once a command is successfully sent to the device.
     """
+    seq: int  # position in the response buffer, used as a cursor
     device_id: str
     response_type: str
     response_message: str = None
+    command_id: Optional[str] = None
     timestamp: datetime
 
+class CommandStatusView(BaseModel):
+    """
+    Pydantic model representing a command sent and the responses received for it.
+    """
+    command_id: str
+    action: str
+    parameters: dict
+    device_ids: Optional[List[str]] = None  # None for a broadcast
+    sent_at: datetime
+    responses: List[ResponseView]
+
+class ResponsesPageView(BaseModel):
+    """
+    Pydantic model representing one page of buffered command responses.
+    """
+    responses: List[ResponseView]
+    next_after: Optional[int] = None  # pass as 'after' to fetch newer responses
+
 class DevicesView(BaseModel):
     """
     Pydantic model representing a view of all devices sending/receiving messages
     """
-    id: int
     device_id: str 
+    first_seen: datetime
+    last_seen: datetime
     
     class Config:
         from_attributes = True
+
+class DevicesPageView(BaseModel):
+    """
+    Pydantic model representing one page of the device registry.
+    """
+    devices: List[DevicesView]
+    next_after: Optional[str] = None  # pass as 'after' to fetch the next page, None on the last page
+
+
+class HistoryPointView(BaseModel):
+    """
+    Pydantic model representing the aggregated statuses of a device over one time bucket.
+    """
+    bucket: datetime  # start of the bucket
+    samples: int
+    battery_min: int
+    battery_avg: float
+    battery_max: int
+    network_status: Dict[str, int]  # readings per network status
+    storage_usage: str  # of the newest reading in the bucket
+
+class HistoryView(BaseModel):
+    """
+    Pydantic model representing the status history of a device.
+    """
+    device_id: str
+    resolution: int  # bucket width in seconds
+    source: str  # "status_messages" or the rollup table the buckets were read from
+    points: List[HistoryPointView]
+
+
+class BatteryBinView(BaseModel):
+    """
+    Pydantic model representing one bin of the fleet battery histogram, from low (included) to high.
+    """
+    low: int
+    high: int
+    devices: int
+
+class FleetBatteryView(BaseModel):
+    mean: Optional[float] = None
+    low: int  # devices under the low_battery level
+    percentiles: Dict[str, float]
+    histogram: List[BatteryBinView]
+
+class FleetStorageView(BaseModel):
+    used_gb: int
+    total_gb: int
+    usage_percentiles: Dict[str, float]  # percent of each device's storage in use
+
+class FleetSummaryView(BaseModel):
+    """
+    Pydantic model representing fleet-wide aggregates of the latest status of every device.
+    """
+    devices: int
+    online: int
+    offline: int
+    aggregated: int  # devices included in the aggregates
+    battery: FleetBatteryView
+    network_status: Dict[str, int]
+    storage: FleetStorageView
+
+
+class IngestionStatsView(BaseModel):
+    """
+    Pydantic model representing the counters of the status ingestion pipeline.
+    """
+    queue_depth: int
+    queue_capacity: int
+    enqueued: int
+    dropped: int
+    written: int
+    inserted: int
+    duplicates: int
+    failed: int
+    high_water_mark: int
+    flushes: int
+    last_flush_latency: float  # seconds
+    max_flush_latency: float  # seconds
+    avg_flush_latency: float  # seconds
+
+
+class FlushSummaryView(BaseModel):
+    """
+    Pydantic model representing the outcome of flushing received status messages to the database.
+    """
+    written: int  # rows sent to the database
+    inserted: int  # rows stored
+    duplicates: int  # rows skipped, already stored for the same device_id and timestamp
+    failed: int
+    high_water_mark: int  # position in the ingestion queue up to which rows are flushed
+    pending: int  # rows received after the flush started
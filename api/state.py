@@ -0,0 +1,103 @@
+from typing import Dict, Optional
+from shared.delta import KEYFRAME_FIELD, apply_delta
+from metrics import register_stats
+
+
+class DeviceStateMap:
+    """
+    Last known full status of every device, used to rebuild the statuses of devices that
+    only report the fields that changed.
+
+    Devices using delta reporting send a keyframe with every field at a fixed interval and
+    deltas in between. A delta is merged into the last known state of its device; deltas
+    received before the first keyframe of a device are discarded.
+
+    Messages can arrive out of order, e.g. redelivered at QoS 1 or drained from a device's outbox.
+    Each status carries the device's seq, which increases by one per status. A delta only applies
+    on top of the status right before it: an older delta is discarded, and a delta after a gap
+    makes the device wait for its next keyframe, as the fields changed in between are unknown.
+    An older keyframe is still a full status, but does not replace a newer state.
+
+    The map holds one entry per device and is never expired, an entry is needed for as long
+    as the device keeps sending deltas.
+
+    Attributes:
+        discarded (int): Number of deltas discarded because their device had no known state, or they were out of order.
+    """
+
+    def __init__(self):
+        """
+        Initialize an empty map.
+        """
+        self.discarded: int = 0
+        self._states: Dict[str, Dict] = {}
+
+    def apply(self, message: Dict) -> Optional[Dict]:
+        """
+        Rebuild the full status of a received message and remember it as the device's state.
+
+        Args:
+            message (dict): Decoded status message, a keyframe, a delta or a plain full status.
+
+        Returns:
+            Optional[dict]: The full status, or None if the message is a delta of an unknown device or out of order.
+        """
+        status = self.rebuild(message)
+        if status is not None:
+            self.remember(status)
+        return status
+
+    def rebuild(self, message: Dict) -> Optional[Dict]:
+        """
+        Rebuild the full status of a received message without remembering it, see remember.
+
+        Args:
+            message (dict): Decoded status message, a keyframe, a delta or a plain full status.
+
+        Returns:
+            Optional[dict]: The full status, or None if the message is a delta of an unknown device or out of order.
+        """
+        device_id = message.get("device_id")
+        state = self._states.get(device_id)
+        seq = message.get("seq")
+        last_seq = None if state is None else state.get("seq")
+        if message.get(KEYFRAME_FIELD, True):
+            return apply_delta(None, message)
+
+        if state is not None and seq is not None and last_seq is not None and seq != last_seq + 1:
+            if seq > last_seq:
+                # Statuses are missing in between, the state is unknown until the next keyframe
+                del self._states[device_id]
+            state = None
+        status = apply_delta(state, message)
+        if status is None:
+            self.discarded += 1
+        return status
+
+    def remember(self, status: Dict) -> None:
+        """
+        Store a rebuilt status as its device's state, unless the state is newer.
+        """
+        device_id = status.get("device_id")
+        state = self._states.get(device_id)
+        seq = status.get("seq")
+        last_seq = None if state is None else state.get("seq")
+        if seq is None or last_seq is None or seq >= last_seq:
+            self._states[device_id] = dict(status)
+
+    def get(self, device_id: str) -> Optional[Dict]:
+        """
+        Return the last known full status of a device, or None.
+        """
+        return self._states.get(device_id)
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+
+device_states = DeviceStateMap()
+register_stats(
+    "device_states",
+    lambda: {"devices": len(device_states), "discarded": device_states.discarded},
+    counters=("discarded",),
+)
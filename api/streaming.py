@@ -0,0 +1,177 @@
+import asyncio
+import heapq
+import time
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+from metrics import register_stats
+
+# Live status streaming limits
+MAX_SUBSCRIBERS: int = 100
+MAX_PENDING_PER_SUBSCRIBER: int = 10000  # Devices ready to be sent before a subscriber counts as too slow
+KEEPALIVE_INTERVAL: float = 15.0  # seconds without a message before a keepalive comment is sent
+
+
+class SubscriberEvicted(Exception):
+    """
+    Raised to a subscriber that fell too far behind and was disconnected.
+    """
+
+
+class StatusSubscriber:
+    """
+    Bounded, coalescing queue of status messages for one streaming client.
+
+    The queue holds at most one message per device: a newer status replaces the one still
+    waiting, so a client that falls behind receives the current state of each device rather
+    than a backlog. Each device is sent at most once per min_interval, statuses received in
+    between are coalesced into the next one sent.
+
+    Devices that may be sent now wait in a ready queue, oldest first, and devices held back by
+    min_interval in a heap ordered by the time they may be sent again, so getting the next
+    message does not scan every pending device. Only the ready backlog counts as falling behind:
+    a client whose ready queue grows past max_pending devices is evicted.
+
+    Attributes:
+        device_ids (Optional[Set[str]]): Devices streamed, None for all of them.
+        min_interval (float): Minimum seconds between two messages of the same device.
+        max_pending (int): Maximum number of devices ready to be sent.
+        sent (int): Messages delivered.
+        coalesced (int): Messages replaced by a newer status of their device before being sent.
+        evicted (bool): Whether the subscriber was disconnected for being too slow.
+    """
+
+    def __init__(self, device_ids: Optional[Iterable[str]] = None, min_interval: float = 0.0,
+                 max_pending: int = MAX_PENDING_PER_SUBSCRIBER):
+        """
+        Initialize an empty queue.
+
+        Args:
+            device_ids (Optional[Iterable[str]]): Devices streamed, None for all of them.
+            min_interval (float): Minimum seconds between two messages of the same device.
+            max_pending (int): Maximum number of devices ready to be sent.
+        """
+        self.device_ids: Optional[Set[str]] = set(device_ids) if device_ids else None
+        self.min_interval: float = min_interval
+        self.max_pending: int = max_pending
+        self.sent: int = 0
+        self.coalesced: int = 0
+        self.evicted: bool = False
+        self._pending: Dict[str, Dict] = {}  # Latest unsent message of each device, ready or held back
+        self._ready: Deque[str] = deque()  # Devices that may be sent now, oldest first
+        self._held: List[Tuple[float, str]] = []  # Heap of (time the device may be sent again, device)
+        self._next_allowed: Dict[str, float] = {}
+        self._wakeup: asyncio.Event = asyncio.Event()
+
+    def offer(self, message: Dict) -> bool:
+        """
+        Queue a status message if the subscriber follows its device.
+
+        Args:
+            message (dict): Full status message, with device_id.
+
+        Returns:
+            bool: False if the subscriber is too slow and must be evicted.
+        """
+        device_id = message["device_id"]
+        if self.device_ids is not None and device_id not in self.device_ids:
+            return True
+        if device_id in self._pending:
+            self._pending[device_id] = message
+            self.coalesced += 1
+            return True
+        allowed = self._next_allowed.get(device_id, 0.0)
+        if allowed > time.monotonic():
+            heapq.heappush(self._held, (allowed, device_id))
+        elif len(self._ready) >= self.max_pending:
+            self.evicted = True
+            self._wakeup.set()
+            return False
+        else:
+            self._next_allowed.pop(device_id, None)
+            self._ready.append(device_id)
+        self._pending[device_id] = message
+        self._wakeup.set()
+        return True
+
+    async def get(self) -> Dict:
+        """
+        Wait for the next message that may be sent, oldest device first.
+
+        Raises:
+            SubscriberEvicted: If the subscriber was evicted.
+        """
+        while True:
+            if self.evicted:
+                raise SubscriberEvicted()
+            now = time.monotonic()
+            while self._held and self._held[0][0] <= now:
+                self._ready.append(heapq.heappop(self._held)[1])
+            if self._ready:
+                device_id = self._ready.popleft()
+                message = self._pending.pop(device_id)
+                if self.min_interval > 0:
+                    self._next_allowed[device_id] = now + self.min_interval
+                self.sent += 1
+                return message
+            wake_at = self._held[0][0] if self._held else None
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=None if wake_at is None else wake_at - now)
+            except asyncio.TimeoutError:
+                pass
+
+
+class StatusBroadcaster:
+    """
+    Fans the status messages received over MQTT out to the streaming subscribers.
+
+    Attributes:
+        max_subscribers (int): Maximum number of concurrent subscribers.
+        evictions (int): Number of subscribers evicted for being too slow.
+    """
+
+    def __init__(self, max_subscribers: int = MAX_SUBSCRIBERS):
+        self.max_subscribers: int = max_subscribers
+        self.evictions: int = 0
+        self._subscribers: Set[StatusSubscriber] = set()
+
+    def subscribe(self, device_ids: Optional[Iterable[str]] = None, min_interval: float = 0.0) -> Optional[StatusSubscriber]:
+        """
+        Add a subscriber.
+
+        Args:
+            device_ids (Optional[Iterable[str]]): Devices streamed, None for all of them.
+            min_interval (float): Minimum seconds between two messages of the same device.
+
+        Returns:
+            Optional[StatusSubscriber]: The subscriber, or None if the subscriber limit is reached.
+        """
+        if len(self._subscribers) >= self.max_subscribers:
+            return None
+        subscriber = StatusSubscriber(device_ids, min_interval)
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: StatusSubscriber) -> None:
+        self._subscribers.discard(subscriber)
+
+    def publish(self, message: Dict) -> None:
+        """
+        Offer a status message to every subscriber, evicting those that fell too far behind.
+        """
+        for subscriber in list(self._subscribers):
+            if not subscriber.offer(message):
+                self._subscribers.discard(subscriber)
+                self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+
+status_stream = StatusBroadcaster()
+register_stats(
+    "status_stream",
+    lambda: {"subscribers": len(status_stream), "evictions": status_stream.evictions},
+    counters=("evictions",),
+)
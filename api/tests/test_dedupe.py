@@ -0,0 +1,54 @@
+import unittest
+from dedupe import SequenceDeduplicator
+
+
+class TestSequenceDeduplicator(unittest.TestCase):
+
+    def setUp(self):
+        self.dedupe = SequenceDeduplicator(window=4)
+
+    def test_new_seqs_are_accepted(self):
+        self.assertEqual([True] * 3, [self.dedupe.accept("a", seq) for seq in (10, 11, 12)])
+        self.assertEqual(0, self.dedupe.duplicates)
+
+    def test_redelivery_is_a_duplicate(self):
+        for seq in (10, 11, 12):
+            self.dedupe.accept("a", seq)
+        self.assertFalse(self.dedupe.accept("a", 12))
+        self.assertFalse(self.dedupe.accept("a", 11))
+        self.assertEqual(2, self.dedupe.duplicates)
+
+    def test_out_of_order_within_window(self):
+        self.assertTrue(self.dedupe.accept("a", 10))
+        self.assertTrue(self.dedupe.accept("a", 12))
+        self.assertTrue(self.dedupe.accept("a", 11))
+        self.assertFalse(self.dedupe.accept("a", 11))
+
+    def test_window_moves_forward(self):
+        self.dedupe.accept("a", 10)
+        self.assertTrue(self.dedupe.accept("a", 20))
+        self.assertTrue(self.dedupe.accept("a", 18))
+        self.assertFalse(self.dedupe.accept("a", 18))
+
+    def test_far_behind_seq_keeps_the_window(self):
+        for seq in (10, 11, 12):
+            self.dedupe.accept("a", seq)
+        self.assertTrue(self.dedupe.accept("a", 3))
+        self.assertEqual(1, self.dedupe.stale)
+        self.assertFalse(self.dedupe.accept("a", 11))
+        self.assertFalse(self.dedupe.accept("a", 12))
+
+    def test_check_does_not_record(self):
+        self.dedupe.accept("a", 10)
+        self.assertFalse(self.dedupe.is_duplicate("a", 11))
+        self.assertTrue(self.dedupe.accept("a", 11))
+        self.assertTrue(self.dedupe.is_duplicate("a", 11))
+
+    def test_devices_are_independent(self):
+        self.dedupe.accept("a", 10)
+        self.assertTrue(self.dedupe.accept("b", 10))
+        self.assertEqual(2, len(self.dedupe))
+
+
+if __name__ == '__main__':
+    unittest.main()
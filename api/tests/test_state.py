@@ -0,0 +1,48 @@
+import unittest
+from state import DeviceStateMap
+
+
+class TestDeviceStateMap(unittest.TestCase):
+
+    def setUp(self):
+        self.states = DeviceStateMap()
+        self.keyframe = {"device_id": "123", "seq": 1, "battery_level": 80, "location": "1 Main St", "keyframe": True}
+
+    def delta(self, seq, **fields):
+        return {"device_id": "123", "seq": seq, "keyframe": False, **fields}
+
+    def test_deltas_in_order(self):
+        self.states.apply(self.keyframe)
+        self.assertEqual(79, self.states.apply(self.delta(2, battery_level=79))["battery_level"])
+        status = self.states.apply(self.delta(3, location="2 Main St"))
+        self.assertEqual((79, "2 Main St", 3), (status["battery_level"], status["location"], status["seq"]))
+
+    def test_delta_before_keyframe(self):
+        self.assertIsNone(self.states.apply(self.delta(2, battery_level=79)))
+        self.assertEqual(1, self.states.discarded)
+
+    def test_stale_delta_is_discarded(self):
+        self.states.apply(self.keyframe)
+        self.states.apply(self.delta(2, battery_level=79))
+        self.assertIsNone(self.states.apply(self.delta(2, battery_level=79)))
+        self.assertEqual(79, self.states.get("123")["battery_level"])
+
+    def test_gap_waits_for_keyframe(self):
+        self.states.apply(self.keyframe)
+        self.assertIsNone(self.states.apply(self.delta(3, battery_level=78)))
+        self.assertIsNone(self.states.apply(self.delta(4, battery_level=77)))
+        self.states.apply({**self.keyframe, "seq": 5, "battery_level": 76})
+        self.assertEqual(75, self.states.apply(self.delta(6, battery_level=75))["battery_level"])
+
+    def test_older_keyframe_keeps_newer_state(self):
+        self.states.apply({**self.keyframe, "seq": 5, "battery_level": 70})
+        self.assertEqual(80, self.states.apply(self.keyframe)["battery_level"])
+        self.assertEqual(70, self.states.get("123")["battery_level"])
+
+    def test_statuses_without_seq(self):
+        self.states.apply({"device_id": "123", "battery_level": 80})
+        self.assertEqual(79, self.states.apply({"device_id": "123", "keyframe": False, "battery_level": 79})["battery_level"])
+
+
+if __name__ == '__main__':
+    unittest.main()
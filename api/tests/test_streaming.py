@@ -0,0 +1,65 @@
+import asyncio
+import unittest
+from streaming import StatusBroadcaster, StatusSubscriber, SubscriberEvicted
+
+
+class TestStatusSubscriber(unittest.TestCase):
+
+    def test_coalesces_per_device(self):
+        subscriber = StatusSubscriber()
+        subscriber.offer({"device_id": "a", "battery_level": 80})
+        subscriber.offer({"device_id": "b", "battery_level": 50})
+        subscriber.offer({"device_id": "a", "battery_level": 79})
+
+        async def receive():
+            return [await subscriber.get() for _ in range(2)]
+
+        self.assertEqual([("a", 79), ("b", 50)], [(m["device_id"], m["battery_level"]) for m in asyncio.run(receive())])
+        self.assertEqual(1, subscriber.coalesced)
+
+    def test_min_interval_holds_device_back(self):
+        subscriber = StatusSubscriber(min_interval=0.05)
+
+        async def receive():
+            subscriber.offer({"device_id": "a", "battery_level": 80})
+            await subscriber.get()
+            subscriber.offer({"device_id": "a", "battery_level": 79})
+            subscriber.offer({"device_id": "b", "battery_level": 50})
+            return [(await subscriber.get())["device_id"] for _ in range(2)]
+
+        self.assertEqual(["b", "a"], asyncio.run(receive()))
+
+    def test_held_devices_do_not_count_towards_eviction(self):
+        subscriber = StatusSubscriber(min_interval=60, max_pending=2)
+
+        async def receive():
+            for device_id in ("a", "b", "c"):
+                subscriber.offer({"device_id": device_id})
+                await subscriber.get()
+            return [subscriber.offer({"device_id": device_id}) for device_id in ("a", "b", "c")]
+
+        self.assertEqual([True, True, True], asyncio.run(receive()))
+        self.assertFalse(subscriber.evicted)
+
+    def test_evicted_when_ready_backlog_is_full(self):
+        subscriber = StatusSubscriber(max_pending=2)
+        self.assertTrue(subscriber.offer({"device_id": "a"}))
+        self.assertTrue(subscriber.offer({"device_id": "b"}))
+        self.assertFalse(subscriber.offer({"device_id": "c"}))
+        with self.assertRaises(SubscriberEvicted):
+            asyncio.run(subscriber.get())
+
+
+class TestStatusBroadcaster(unittest.TestCase):
+
+    def test_filters_devices_and_limits_subscribers(self):
+        broadcaster = StatusBroadcaster(max_subscribers=1)
+        subscriber = broadcaster.subscribe(device_ids=["a"])
+        self.assertIsNone(broadcaster.subscribe())
+        broadcaster.publish({"device_id": "b"})
+        broadcaster.publish({"device_id": "a"})
+        self.assertEqual("a", asyncio.run(subscriber.get())["device_id"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import asyncio
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+# Number of commands whose responses are tracked. The oldest command is forgotten first.
+MAX_TRACKED_COMMANDS: int = 10000
+# Responses kept per command, so a broadcast to a large fleet cannot grow one entry without bound
+MAX_RESPONSES_PER_COMMAND: int = 10000
+
+
+class CommandTracker:
+    """
+    Tracks the responses to each command sent, keyed by the command's correlation ID.
+
+    Every command published by the API carries a command_id that devices echo back in their
+    responses. The response callback records each response under that ID, and waiters can
+    await until a number of responses has arrived instead of scanning all responses.
+
+    Attributes:
+        max_commands (int): Number of commands tracked, the oldest is forgotten first.
+    """
+
+    def __init__(self, max_commands: int = MAX_TRACKED_COMMANDS):
+        """
+        Initialize an empty tracker.
+
+        Args:
+            max_commands (int): Number of commands tracked.
+        """
+        self.max_commands: int = max_commands
+        self._commands: "OrderedDict[str, Dict]" = OrderedDict()
+        self._updated: asyncio.Condition = asyncio.Condition()
+
+    def register(self, command_id: str, command: Dict, device_ids: Optional[List[str]] = None) -> Dict:
+        """
+        Start tracking a command.
+
+        Args:
+            command_id (str): Correlation ID of the command.
+            command (dict): The command payload as published.
+            device_ids (Optional[List[str]]): Devices the command was addressed to, None for a broadcast.
+
+        Returns:
+            dict: The tracked command, with its send time and an empty response list.
+        """
+        entry = {
+            "command_id": command_id,
+            "action": command["action"],
+            "parameters": command["parameters"],
+            "device_ids": device_ids,
+            "sent_at": datetime.now(timezone.utc),
+            "responses": [],
+        }
+        self._commands[command_id] = entry
+        self._commands.move_to_end(command_id)
+        while len(self._commands) > self.max_commands:
+            self._commands.popitem(last=False)
+        return entry
+
+    def get(self, command_id: str) -> Optional[Dict]:
+        """
+        Return a tracked command, or None if it is unknown or was forgotten.
+        """
+        return self._commands.get(command_id)
+
+    async def record(self, response: Dict) -> bool:
+        """
+        Record a response under the command it answers and wake up the waiters.
+
+        Args:
+            response (dict): Decoded response, with its command_id.
+
+        Returns:
+            bool: True if the response belongs to a tracked command.
+        """
+        entry = self._commands.get(response.get("command_id"))
+        if entry is None:
+            return False
+        if len(entry["responses"]) < MAX_RESPONSES_PER_COMMAND:
+            entry["responses"].append(response)
+        async with self._updated:
+            self._updated.notify_all()
+        return True
+
+    async def wait(self, command_id: str, responses: int, timeout: float) -> Optional[Dict]:
+        """
+        Wait until a command has at least a number of responses, or the timeout passes.
+
+        Args:
+            command_id (str): Correlation ID of the command.
+            responses (int): Number of responses to wait for.
+            timeout (float): Maximum seconds to wait.
+
+        Returns:
+            Optional[dict]: The tracked command with the responses received so far,
+                            or None if the command is unknown.
+        """
+        entry = self._commands.get(command_id)
+        if entry is None:
+            return None
+        deadline = time.monotonic() + timeout
+        async with self._updated:
+            while len(entry["responses"]) < responses:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    await asyncio.wait_for(self._updated.wait(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+        return entry
+
+
+command_tracker = CommandTracker()
@@ -0,0 +1,305 @@
+"""
+End-to-end benchmark of the status path: devices -> MQTT -> API -> Postgres.
+
+Runs against the docker-compose stack (mosquitto, api, postgres). Simulated devices publish
+statuses at a fixed rate through the broker to the API's status subscription while probe
+statuses measure how long a status takes to be stored in Postgres and queryable through the API. At the end
+the ingestion pipeline is flushed to Postgres through post-all-status-messages.
+
+Usage, from the repository root:
+
+    python -m benchmarks.e2e --devices 1000 --rate 2000 --duration 60 --api-container backend-api-1
+
+Results are printed and saved as JSON (benchmarks/results/ by default) so runs of different
+releases can be compared.
+"""
+import argparse
+import json
+import os
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+import paho.mqtt.client as mqtt
+from shared.codec import codec_topic, get_codec
+from shared.models import Status
+
+STATUS_TOPIC: str = "device/status"
+RESULTS_DIR: str = os.path.join(os.path.dirname(__file__), "results")
+# Seconds a probe status may take to become queryable before it counts as lost
+PROBE_TIMEOUT: float = 10.0
+PROBE_POLL_INTERVAL: float = 0.005
+
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    """
+    Nearest-rank percentile of a list of values, None if the list is empty.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summarize(values: List[float]) -> Dict:
+    """
+    Count, p50, p99 and max of latencies in seconds, reported in milliseconds.
+    """
+    def ms(value):
+        return None if value is None else round(value * 1000, 3)
+    return {
+        "count": len(values),
+        "p50_ms": ms(percentile(values, 0.50)),
+        "p99_ms": ms(percentile(values, 0.99)),
+        "max_ms": ms(max(values) if values else None),
+    }
+
+
+class ApiClient:
+    """
+    Minimal HTTP client for the API that records the latency of every call per endpoint.
+    """
+
+    def __init__(self, base_url: str):
+        self.base_url: str = base_url.rstrip("/")
+        self.latencies: Dict[str, List[float]] = {}
+
+    def call(self, method: str, path: str, name: Optional[str] = None) -> Optional[Dict]:
+        """
+        Call an endpoint and return its decoded JSON body, None on a 404.
+        """
+        request = urllib.request.Request(f"{self.base_url}{path}", method=method)
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                body = json.loads(response.read() or b"null")
+        except urllib.error.HTTPError as e:
+            if e.code != 404:
+                raise
+            body = None
+        self.latencies.setdefault(name or path, []).append(time.perf_counter() - started)
+        return body
+
+
+def api_memory(api_pid: Optional[int], api_container: Optional[str]) -> Optional[int]:
+    """
+    Resident memory of the API in bytes, read from /proc for a local process or from
+    docker stats for a container. None if neither is given or it cannot be read.
+    """
+    if api_pid:
+        try:
+            with open(f"/proc/{api_pid}/status") as status_file:
+                for line in status_file:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            return None
+    if api_container:
+        try:
+            output = subprocess.run(
+                ["docker", "stats", "--no-stream", "--format", "{{.MemUsage}}", api_container],
+                capture_output=True, text=True, check=True,
+            ).stdout
+        except (OSError, subprocess.CalledProcessError):
+            return None
+        usage = output.split("/")[0].strip()
+        units = {"KiB": 1024, "MiB": 1024 ** 2, "GiB": 1024 ** 3, "B": 1}
+        for unit, factor in units.items():
+            if usage.endswith(unit):
+                return int(float(usage[:-len(unit)]) * factor)
+    return None
+
+
+class LoadGenerator:
+    """
+    Publishes statuses of simulated devices at a fixed total rate over a few MQTT connections.
+
+    Attributes:
+        published (int): Number of statuses published.
+    """
+
+    def __init__(self, broker: str, port: int, devices: int, rate: float, connections: int, codec):
+        self.device_ids: List[str] = [f"bench-{index:06d}" for index in range(devices)]
+        self.rate: float = rate
+        self.codec = codec
+        self.published: int = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._clients: List[mqtt.Client] = []
+        for _ in range(connections):
+            client = mqtt.Client()
+            client.connect(broker, port, 60)
+            client.loop_start()
+            self._clients.append(client)
+        self._threads: List[threading.Thread] = [
+            threading.Thread(target=self._publish, args=(client, self.device_ids[index::connections]), daemon=True)
+            for index, client in enumerate(self._clients)
+        ]
+
+    def _publish(self, client: mqtt.Client, device_ids: List[str]) -> None:
+        """
+        Publish one status per device of the slice in turn, paced to the connection's share of the rate.
+        """
+        if not device_ids:
+            return
+        interval = len(self._clients) / self.rate
+        topic = codec_topic(STATUS_TOPIC, self.codec)
+        next_send = time.perf_counter()
+        while not self._stop.is_set():
+            for status in Status.generate_fake_statuses(device_ids):
+                if self._stop.is_set():
+                    break
+                client.publish(topic, self.codec.encode(status.model_dump(mode="json")))
+                with self._lock:
+                    self.published += 1
+                next_send += interval
+                delay = next_send - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+
+    def start(self) -> None:
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+        for client in self._clients:
+            client.loop_stop()
+            client.disconnect()
+
+
+def probe(api: ApiClient, client: mqtt.Client, codec, device_id: str) -> Optional[float]:
+    """
+    Publish a status and wait until the API reads it back from Postgres.
+
+    The device's history is polled at a resolution under a minute, which the API serves from the raw
+    status_messages rows, so the latency includes the ingestion pipeline's write. The latest-status
+    endpoint would not: its cache is updated as soon as the status is received.
+
+    Returns:
+        Optional[float]: Seconds between the publish and the status being queryable, None on timeout.
+    """
+    status = Status.generate_fake_status(device_id=device_id)
+    sent = status.timestamp
+    query = urllib.parse.urlencode({
+        "since": sent.isoformat(),
+        "until": (sent + timedelta(seconds=1)).isoformat(),
+        "resolution": 1,
+    })
+    started = time.perf_counter()
+    client.publish(codec_topic(STATUS_TOPIC, codec), codec.encode(status.model_dump(mode="json")))
+    while time.perf_counter() - started < PROBE_TIMEOUT:
+        history = api.call("GET", f"/device/history/{device_id}?{query}", "GET /device/history")
+        if history and any(point["samples"] for point in history["points"]):
+            return time.perf_counter() - started
+        time.sleep(PROBE_POLL_INTERVAL)
+    return None
+
+
+def run(args: argparse.Namespace) -> Dict:
+    """
+    Run the benchmark and return its results.
+    """
+    codec = get_codec(args.codec)
+    api = ApiClient(args.api)
+    memory_before = api_memory(args.api_pid, args.api_container)
+    stats_before = api.call("GET", "/message/ingestion-stats")
+
+    load = LoadGenerator(args.broker, args.port, args.devices, args.rate, args.connections, codec)
+    probe_client = mqtt.Client()
+    probe_client.connect(args.broker, args.port, 60)
+    probe_client.loop_start()
+
+    latencies: List[float] = []
+    lost = 0
+    started_at = datetime.now(timezone.utc)
+    started = time.perf_counter()
+    load.start()
+    probe_interval = args.duration / max(1, args.probes)
+    for index in range(args.probes):
+        latency = probe(api, probe_client, codec, f"bench-probe-{index:04d}")
+        if latency is None:
+            lost += 1
+        else:
+            latencies.append(latency)
+        api.call("GET", "/device/all-devices?limit=100", "GET /device/all-devices")
+        api.call("GET", "/message/all-status-messages", "GET /message/all-status-messages")
+        api.call("GET", "/message/ingestion-stats", "GET /message/ingestion-stats")
+        time.sleep(max(0.0, started + (index + 1) * probe_interval - time.perf_counter()))
+    load.stop()
+    publish_elapsed = time.perf_counter() - started
+
+    flush = api.call("POST", "/message/post-all-status-messages", "POST /message/post-all-status-messages")
+    total_elapsed = time.perf_counter() - started
+    stats_after = api.call("GET", "/message/ingestion-stats")
+    memory_after = api_memory(args.api_pid, args.api_container)
+    probe_client.loop_stop()
+    probe_client.disconnect()
+
+    published = load.published + args.probes
+    written = stats_after["written"] - stats_before["written"]
+    return {
+        "started_at": started_at.isoformat(),
+        "config": {
+            "devices": args.devices,
+            "rate": args.rate,
+            "duration": args.duration,
+            "connections": args.connections,
+            "codec": args.codec,
+            "probes": args.probes,
+        },
+        "throughput": {
+            "published": published,
+            "published_per_sec": round(published / publish_elapsed, 1),
+            "written": written,
+            "written_per_sec": round(written / total_elapsed, 1),
+            "dropped": stats_after["dropped"] - stats_before["dropped"],
+            "failed": stats_after["failed"] - stats_before["failed"],
+            "duplicates": stats_after["duplicates"] - stats_before["duplicates"],
+        },
+        "ingest_to_queryable": {**summarize(latencies), "lost": lost},
+        "flush": flush,
+        "endpoints": {name: summarize(values) for name, values in sorted(api.latencies.items())},
+        "memory": {
+            "before_bytes": memory_before,
+            "after_bytes": memory_after,
+            "growth_bytes": None if memory_before is None or memory_after is None else memory_after - memory_before,
+        },
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="End-to-end MQTT -> API -> Postgres benchmark")
+    parser.add_argument("--broker", default="localhost", help="MQTT broker host")
+    parser.add_argument("--port", type=int, default=1883, help="MQTT broker port")
+    parser.add_argument("--api", default="http://localhost:5000", help="Base URL of the API")
+    parser.add_argument("--devices", type=int, default=1000, help="Number of simulated devices")
+    parser.add_argument("--rate", type=float, default=1000, help="Total statuses published per second")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds of load")
+    parser.add_argument("--connections", type=int, default=4, help="MQTT connections used to publish")
+    parser.add_argument("--codec", default="json", help="Payload codec, json or msgpack")
+    parser.add_argument("--probes", type=int, default=100, help="Number of ingest-to-queryable latency samples")
+    parser.add_argument("--api-pid", type=int, help="PID of a local API process, to measure its memory")
+    parser.add_argument("--api-container", help="Docker container of the API, to measure its memory")
+    parser.add_argument("--output", help="Results file, benchmarks/results/e2e-<time>.json by default")
+    args = parser.parse_args()
+
+    results = run(args)
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"e2e-{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}.json")
+    with open(output, "w") as results_file:
+        json.dump(results, results_file, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"Results saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
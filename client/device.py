@@ -1,10 +1,15 @@
 import json
+import time
 import asyncio
 import threading
 import paho.mqtt.client as mqtt
 from shared.mqtt_client import MQTTClient
-from typing import Any
+from typing import Any, Dict, List, Optional
+from pydantic import BaseModel
 from shared.models import Status, Command, Response
+from shared.codec import JSON, BATCH_LEVEL, codec_for, codec_topic, encode_batch
+from shared.delta import encode_delta
+from outbox import Outbox
 
 
 class Device:
@@ -18,9 +23,25 @@ class Device:
         mqtt_client (MQTTClient): An instance of MQTTClient for handling MQTT communication.
         status_topic (str): MQTT topic for publishing status updates.
         command_topic (str): MQTT topic to subscribe to for receiving commands.
+        device_command_topic (str): MQTT topic of the commands addressed to this device only.
         response_topic (str): MQTT topic for publishing responses to commands.
+        codec: Payload codec of the published status updates and responses (see shared.codec).
+        report_interval (float): Seconds between two status readings.
+        batch_size (int): Number of readings published together in one batch, 1 to publish each reading on its own.
+        batch_interval (float): Maximum seconds a reading waits in an incomplete batch.
+        keyframe_interval (int): Number of reports between two full statuses, 0 to always send full statuses.
+        outbox (Optional[Outbox]): Disk-backed buffer of the statuses reported while offline, None to drop them.
+        drain_rate (float): Maximum publishes per second while draining the outbox.
+        drain_batch_size (int): Buffered statuses packed into each publish while draining the outbox.
+        status_qos (int): QoS of the published status updates.
+        response_qos (int): QoS of the published responses.
+        command_qos (int): QoS of the command subscriptions.
+        seq (int): Sequence number of the last status reading.
     """
-    def __init__(self, device_id, mqtt_client: MQTTClient, status_topic: str, command_topic: str, response_topic: str):
+    def __init__(self, device_id, mqtt_client: MQTTClient, status_topic: str, command_topic: str, response_topic: str, codec=JSON,
+                 report_interval: float = 1.0, batch_size: int = 1, batch_interval: float = 60.0, keyframe_interval: int = 0,
+                 outbox: Optional[Outbox] = None, drain_rate: float = 10.0, drain_batch_size: int = 50,
+                 status_qos: int = 0, response_qos: int = 0, command_qos: int = 0):
         """
         Initialize the Device with MQTT topics and client.
 
@@ -30,15 +51,53 @@ class Device:
             status_topic (str): MQTT topic for publishing status updates.
             command_topic (str): MQTT topic to subscribe to for receiving commands.
             response_topic (str): MQTT topic for publishing responses to commands.
+            codec: Payload codec of the published messages, JSON by default. Other codecs are advertised
+                   by publishing on the topic suffixed with the codec name, e.g. device/status/msgpack.
+            report_interval (float): Seconds between two status readings.
+            batch_size (int): Readings per batch. Above 1, readings are accumulated and published as a single
+                              compressed message on the status topic's batch level, e.g. device/status/batch.
+            batch_interval (float): Maximum seconds a reading waits before an incomplete batch is published.
+            keyframe_interval (int): Above 0, only the fields that changed since the last report are sent,
+                                     with a full keyframe every keyframe_interval reports.
+            outbox (Optional[Outbox]): Where statuses are kept while the broker is unreachable. They are published
+                                       after reconnecting, oldest first, as batches on the status topic's batch level.
+            drain_rate (float): Maximum publishes per second while draining the outbox, so a reconnecting fleet
+                                does not flood the broker.
+            drain_batch_size (int): Buffered statuses packed into each publish while draining the outbox.
+            status_qos (int): QoS of the published status updates, 1 for at least once delivery. Every reading
+                              carries an increasing seq so the API can discard the ones delivered twice.
+            response_qos (int): QoS of the published responses.
+            command_qos (int): QoS of the command subscriptions.
         """
         self.device_id: int = device_id
         self.mqtt_client: MQTTClient = mqtt_client
         self.status_topic: str = status_topic
         self.command_topic: str = command_topic
+        self.device_command_topic: str = f"{command_topic}/{device_id}"
         self.response_topic: str = response_topic
+        self.codec = codec
+        self.report_interval: float = report_interval
+        self.batch_size: int = batch_size
+        self.batch_interval: float = batch_interval
+        self.batch_topic: str = f"{status_topic}/{BATCH_LEVEL}"
+        self.pending_statuses: List[Dict] = []
+        self._batch_started: float = 0.0
+        self.keyframe_interval: int = keyframe_interval
+        self._last_reported: Optional[Dict] = None
+        self._reports_since_keyframe: int = 0
+        self.outbox: Optional[Outbox] = outbox
+        self.drain_rate: float = drain_rate
+        self.drain_batch_size: int = drain_batch_size
+        self._drain_task: Optional[asyncio.Task] = None
+        self.status_qos: int = status_qos
+        self.response_qos: int = response_qos
+        self.command_qos: int = command_qos
+        # Start from the clock so the sequence keeps increasing across restarts
+        self.seq: int = int(time.time() * 1000)
 
-        # Subscribe to the command topic with a callback
-        self.mqtt_client.subscribe(self.command_topic, self.on_command)
+        # Subscribe to the broadcast and the device's own command topics with a callback
+        self.mqtt_client.subscribe(self.command_topic, self.on_command, qos=self.command_qos)
+        self.mqtt_client.subscribe(self.device_command_topic, self.on_command, qos=self.command_qos)
 
     def on_command(self, client: mqtt.Client, userdata: Any, message: mqtt.MQTTMessage) -> None:
         """
@@ -51,29 +110,175 @@ class Device:
         """
         print(f"Command received: {message.topic} {str(message.payload)}")
         # Implement command handling logic here
-        command = Command(**json.loads(message.payload))
+        command = Command(**codec_for(message.topic).decode(message.payload))
         if command.action == "echo":
-            self.handle_echo_command(command.parameters["message"])
+            self.handle_echo_command(command.parameters["message"], command.command_id)
 
-    def handle_echo_command(self, message: str):
+    def handle_echo_command(self, message: str, command_id: Optional[str] = None):
         """
         Handles the 'echo' command by responding with the received message.
 
         Args:
             message (str): The message to be echoed back.
+            command_id (Optional[str]): Correlation ID of the command, echoed back in the response.
         """
-        response = Response.generate_fake_echo_response(device_id=f"{self.device_id}", message=message)
-        self.mqtt_client.publish(self.response_topic, response.json())
+        response = Response.generate_fake_echo_response(device_id=f"{self.device_id}", message=message, command_id=command_id)
+        self.publish(self.response_topic, response)
         print(f"Generated response: {response.json()}")
 
     async def report_status(self) -> None:
         """
         Continuously reports the device's status at regular intervals.
+        With an outbox, statuses buffered while offline are drained alongside.
+        """
+        if self.outbox is not None:
+            self._drain_task = asyncio.create_task(self.drain_outbox())
+        try:
+            while True:
+                status = Status.generate_fake_status(device_id=f"{self.device_id}")  # Replace with actual device ID
+                self.report(status)
+                await asyncio.sleep(self.report_interval)  # Status update interval
+        finally:
+            if self._drain_task is not None:
+                self._drain_task.cancel()
+                self._drain_task = None
+
+    def report(self, status: Status) -> None:
+        """
+        Publish a status reading, or add it to the current batch when batching is enabled.
+        The batch is published once it holds batch_size readings or batch_interval has passed since its first reading.
+
+        Args:
+            status (Status): The status reading.
+        """
+        message = self.status_message(status)
+        if self.batch_size <= 1:
+            self.publish_statuses([message])
+            return
+
+        if not self.pending_statuses:
+            self._batch_started = time.monotonic()
+        self.pending_statuses.append(message)
+        if len(self.pending_statuses) >= self.batch_size or time.monotonic() - self._batch_started >= self.batch_interval:
+            self.flush_batch()
+
+    def status_message(self, status: Status) -> Dict:
+        """
+        Build the full status message of a status reading, stamped with the next sequence number.
+        Messages are kept in full until they are published, see encode_statuses.
+
+        Args:
+            status (Status): The status reading.
+
+        Returns:
+            dict: The full status message.
+        """
+        self.seq += 1
+        message = status.model_dump(mode="json")
+        message["seq"] = self.seq
+        return message
+
+    def encode_statuses(self, messages: List[Dict], keyframe: bool = False) -> List[Dict]:
+        """
+        Encode full status messages for publishing, in order: unchanged, or with delta reporting enabled,
+        as the fields that changed since the last message published and a full keyframe every keyframe_interval.
+
+        Args:
+            messages (List[dict]): Full status messages.
+            keyframe (bool): Start with a keyframe, e.g. after messages were lost or buffered.
+
+        Returns:
+            List[dict]: The messages to publish.
+        """
+        if self.keyframe_interval <= 0:
+            return messages
+        if keyframe:
+            self._last_reported = None
+        encoded = []
+        for current in messages:
+            if self._reports_since_keyframe >= self.keyframe_interval:
+                self._last_reported = None
+            encoded.append(encode_delta(self._last_reported, current))
+            self._reports_since_keyframe = 1 if self._last_reported is None else self._reports_since_keyframe + 1
+            self._last_reported = current
+        return encoded
+
+    def flush_batch(self) -> None:
+        """
+        Publish the accumulated readings as one compressed batch message.
+        """
+        if not self.pending_statuses:
+            return
+        self.publish_statuses(self.pending_statuses)
+        self.pending_statuses = []
+
+    def publish_statuses(self, messages: List[Dict]) -> None:
+        """
+        Publish status messages, a single one on the status topic or several as one batch.
+        With an outbox, the messages are appended to it instead while the device is offline, while older
+        statuses are still waiting in it (to keep them in order), or when the publish fails. The outbox keeps
+        full statuses, so evicting the oldest ones never leaves deltas without their keyframe.
+
+        Args:
+            messages (List[dict]): The full status messages.
+        """
+        if self.outbox is not None and (len(self.outbox) or not self.mqtt_client.connected):
+            sent = False
+        else:
+            encoded = self.encode_statuses(messages)
+            if len(encoded) == 1:
+                sent = self.mqtt_client.publish(codec_topic(self.status_topic, self.codec), self.codec.encode(encoded[0]),
+                                                qos=self.status_qos)
+            else:
+                sent = self.mqtt_client.publish(codec_topic(self.batch_topic, self.codec), encode_batch(encoded, self.codec),
+                                                qos=self.status_qos)
+            if not sent:
+                # The deltas that follow cannot build on messages that were not sent
+                self._last_reported = None
+        if not sent and self.outbox is not None:
+            for message in messages:
+                self.outbox.put(message)
+
+    async def drain_outbox(self) -> None:
+        """
+        Publish the statuses buffered in the outbox whenever the device is connected, at most
+        drain_rate publishes per second of drain_batch_size statuses each.
         """
         while True:
-            status = Status.generate_fake_status(device_id=f"{self.device_id}")  # Replace with actual device ID
-            self.mqtt_client.publish(self.status_topic, status.json())
-            await asyncio.sleep(1)  # Status update interval
+            if self.mqtt_client.connected and self.drain_outbox_once():
+                await asyncio.sleep(1 / self.drain_rate)
+            else:
+                await asyncio.sleep(self.report_interval)
+
+    def drain_outbox_once(self) -> bool:
+        """
+        Publish the oldest buffered statuses as one batch, and remove them from the outbox once published.
+        Every batch starts with a keyframe, so it does not depend on what was published before.
+
+        Returns:
+            bool: True if statuses were published.
+        """
+        entries = self.outbox.peek(self.drain_batch_size)
+        if not entries:
+            return False
+        batch = self.encode_statuses([message for _, message in entries], keyframe=True)
+        if not self.mqtt_client.publish(codec_topic(self.batch_topic, self.codec), encode_batch(batch, self.codec),
+                                        qos=self.status_qos):
+            self._last_reported = None
+            return False
+        self.outbox.remove(entries[-1][0])
+        return True
+
+    def publish(self, topic: str, message: BaseModel) -> None:
+        """
+        Encode a message with the device's codec and publish it.
+
+        Args:
+            topic (str): MQTT topic, suffixed with the codec name unless the codec is JSON.
+            message (BaseModel): The message to publish.
+        """
+        self.mqtt_client.publish(codec_topic(topic, self.codec), self.codec.encode(message.model_dump(mode="json")),
+                                 qos=self.response_qos)
 
     def start(self) -> None:
         """
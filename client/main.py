@@ -1,5 +1,9 @@
 from shared.mqtt_client import MQTTClient
+from shared.dispatch import ThreadPoolDispatcher
+from shared.codec import get_codec
 from device import Device
+from outbox import Outbox
+import os
 import socket
 
 # MQTT settings
@@ -7,15 +11,34 @@ BROKER_ADDRESS: str = "mosquitto"  # Docker-compose service name for the broker
 STATUS_TOPIC: str = "device/status"  # Topic to publish status
 COMMAND_TOPIC: str = "device/command"  # Topic to subscribe for commands
 RESPONSE_TOPIC: str = "device/response"  # Topic to subscribe for responses
+PAYLOAD_CODEC: str = os.environ.get("PAYLOAD_CODEC", "json")  # "json" or "msgpack"
+STATUS_BATCH_SIZE: int = int(os.environ.get("STATUS_BATCH_SIZE", 1))  # Readings per status message, 1 disables batching
+STATUS_BATCH_INTERVAL: float = float(os.environ.get("STATUS_BATCH_INTERVAL", 60))  # Max seconds before a partial batch is sent
+STATUS_KEYFRAME_INTERVAL: int = int(os.environ.get("STATUS_KEYFRAME_INTERVAL", 0))  # Reports between full statuses, 0 disables deltas
+OUTBOX_PATH: str = os.environ.get("OUTBOX_PATH", "outbox.sqlite3")  # Statuses kept while offline, empty to drop them
+OUTBOX_MAX_MESSAGES: int = int(os.environ.get("OUTBOX_MAX_MESSAGES", 100000))  # The oldest are evicted beyond this
+OUTBOX_DRAIN_RATE: float = float(os.environ.get("OUTBOX_DRAIN_RATE", 10))  # Publishes per second after reconnecting
+OUTBOX_DRAIN_BATCH_SIZE: int = int(os.environ.get("OUTBOX_DRAIN_BATCH_SIZE", 50))  # Buffered statuses per publish
+STATUS_QOS: int = int(os.environ.get("STATUS_QOS", 1))  # 1 for at least once delivery of the statuses
+RESPONSE_QOS: int = int(os.environ.get("RESPONSE_QOS", 1))
+COMMAND_QOS: int = int(os.environ.get("COMMAND_QOS", 1))
 
 def get_device_id():
     container_id = socket.gethostname()
     return container_id
 
 if __name__ == "__main__":
-    mqtt_client: MQTTClient = MQTTClient(BROKER_ADDRESS)
     device_id = get_device_id()
+    # Handle commands on worker threads so a slow handler does not stall the network thread.
+    # A stable client ID keeps the device's session, and the commands queued for it, across reconnects.
+    mqtt_client: MQTTClient = MQTTClient(BROKER_ADDRESS, dispatcher=ThreadPoolDispatcher(workers=2),
+                                         client_id=f"device-{device_id}")
     print(device_id)
-    device: Device = Device(device_id, mqtt_client, STATUS_TOPIC, COMMAND_TOPIC, RESPONSE_TOPIC)
+    device: Device = Device(device_id, mqtt_client, STATUS_TOPIC, COMMAND_TOPIC, RESPONSE_TOPIC, codec=get_codec(PAYLOAD_CODEC),
+                            batch_size=STATUS_BATCH_SIZE, batch_interval=STATUS_BATCH_INTERVAL,
+                            keyframe_interval=STATUS_KEYFRAME_INTERVAL,
+                            outbox=Outbox(OUTBOX_PATH, OUTBOX_MAX_MESSAGES) if OUTBOX_PATH else None,
+                            drain_rate=OUTBOX_DRAIN_RATE, drain_batch_size=OUTBOX_DRAIN_BATCH_SIZE,
+                            status_qos=STATUS_QOS, response_qos=RESPONSE_QOS, command_qos=COMMAND_QOS)
     print("Starting device")
     device.start()
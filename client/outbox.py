@@ -0,0 +1,86 @@
+import json
+import sqlite3
+import threading
+from typing import Dict, List, Tuple
+
+# Statuses kept on disk while the broker is unreachable, the oldest are evicted first
+OUTBOX_MAX_MESSAGES: int = 100000
+
+
+class Outbox:
+    """
+    Disk-backed FIFO of status messages that could not be published, stored in SQLite.
+
+    While the device is offline its statuses are appended to the outbox instead of being
+    handed to paho, whose in-memory queue would otherwise grow without bound or drop them.
+    Once the outbox holds max_messages statuses, the oldest are evicted to make room.
+    The device drains it after reconnecting, oldest first.
+
+    Attributes:
+        path (str): Path of the SQLite database file.
+        max_messages (int): Maximum number of statuses kept.
+        evicted (int): Number of statuses evicted because the outbox was full.
+    """
+
+    def __init__(self, path: str, max_messages: int = OUTBOX_MAX_MESSAGES):
+        """
+        Open the outbox, keeping the statuses left over from a previous run.
+
+        Args:
+            path (str): Path of the SQLite database file, ":memory:" for a non-persistent outbox.
+            max_messages (int): Maximum number of statuses kept.
+        """
+        self.path: str = path
+        self.max_messages: int = max_messages
+        self.evicted: int = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS outbox (id INTEGER PRIMARY KEY AUTOINCREMENT, message TEXT NOT NULL)")
+        self._count: int = self._db.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    def put(self, message: Dict) -> None:
+        """
+        Append a status, evicting the oldest ones if the outbox is full.
+
+        Args:
+            message (dict): The status message, made of JSON types.
+        """
+        with self._lock:
+            self._db.execute("INSERT INTO outbox (message) VALUES (?)", (json.dumps(message),))
+            self._count += 1
+            excess = self._count - self.max_messages
+            if excess > 0:
+                self._db.execute("DELETE FROM outbox WHERE id IN (SELECT id FROM outbox ORDER BY id LIMIT ?)", (excess,))
+                self._count -= excess
+                self.evicted += excess
+
+    def peek(self, limit: int) -> List[Tuple[int, Dict]]:
+        """
+        Return the oldest statuses without removing them.
+
+        Args:
+            limit (int): Maximum number of statuses returned.
+
+        Returns:
+            List[Tuple[int, dict]]: The ID and message of each status, oldest first.
+        """
+        with self._lock:
+            rows = self._db.execute("SELECT id, message FROM outbox ORDER BY id LIMIT ?", (limit,)).fetchall()
+        return [(row_id, json.loads(message)) for row_id, message in rows]
+
+    def remove(self, last_id: int) -> None:
+        """
+        Remove the statuses up to and including an ID returned by peek, once they were published.
+        """
+        with self._lock:
+            removed = self._db.execute("DELETE FROM outbox WHERE id <= ?", (last_id,)).rowcount
+            self._count -= removed
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def __len__(self) -> int:
+        return self._count
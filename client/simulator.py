@@ -0,0 +1,175 @@
+import asyncio
+import logging
+import os
+import random
+import socket
+from typing import Any, List, Optional
+import paho.mqtt.client as mqtt
+from shared.mqtt_client import MQTTClient
+from shared.dispatch import AsyncioDispatcher
+from shared.codec import JSON, get_codec
+from shared.models import Status
+from device import Device
+from main import (BROKER_ADDRESS, STATUS_TOPIC, COMMAND_TOPIC, RESPONSE_TOPIC, PAYLOAD_CODEC,
+                  STATUS_BATCH_SIZE, STATUS_BATCH_INTERVAL, STATUS_KEYFRAME_INTERVAL, STATUS_QOS, RESPONSE_QOS, COMMAND_QOS)
+
+logger = logging.getLogger(__name__)
+
+# Simulator settings
+SIMULATED_DEVICES: int = int(os.environ.get("SIMULATED_DEVICES", 1000))  # Logical devices hosted by the process
+SIMULATOR_CONNECTIONS: int = int(os.environ.get("SIMULATOR_CONNECTIONS", 4))  # MQTT connections shared by the devices
+REPORT_INTERVAL: float = float(os.environ.get("REPORT_INTERVAL", 1.0))  # Seconds between two reports of a device
+REPORT_JITTER: float = float(os.environ.get("REPORT_JITTER", 0.1))  # Random +/- seconds added to every interval
+COMMAND_LATENCY: float = float(os.environ.get("COMMAND_LATENCY", 0.0))  # Seconds a device takes to handle a command
+STATS_INTERVAL: float = 10.0  # Seconds between two progress log lines
+
+
+class SimulatedDevice(Device):
+    """
+    A logical device hosted by the Simulator, sharing its event loop and MQTT connection with other devices.
+
+    Attributes:
+        loop (asyncio.AbstractEventLoop): The simulator's event loop.
+        jitter (float): Random +/- seconds added to every report interval.
+        command_latency (float): Seconds the device takes to handle a command.
+        reports (int): Number of status reports made.
+    """
+
+    def __init__(self, device_id: str, mqtt_client: MQTTClient, loop: asyncio.AbstractEventLoop,
+                 jitter: float = 0.0, command_latency: float = 0.0, **kwargs):
+        """
+        Initialize the device.
+
+        Args:
+            device_id (str): The unique identifier for the device.
+            mqtt_client (MQTTClient): The shared connection, its callbacks must run on loop.
+            loop (asyncio.AbstractEventLoop): The simulator's event loop.
+            jitter (float): Random +/- seconds added to every report interval.
+            command_latency (float): Seconds the device takes to handle a command.
+            **kwargs: Topics and reporting options, as for Device.
+        """
+        self.loop: asyncio.AbstractEventLoop = loop
+        self.jitter: float = jitter
+        self.command_latency: float = command_latency
+        self.reports: int = 0
+        super().__init__(device_id, mqtt_client, **kwargs)
+
+    def on_command(self, client: mqtt.Client, userdata: Any, message: mqtt.MQTTMessage) -> None:
+        """
+        Handle a command after the simulated latency, without holding up the other devices.
+        """
+        if self.command_latency > 0:
+            self.loop.call_later(self.command_latency, super().on_command, client, userdata, message)
+        else:
+            super().on_command(client, userdata, message)
+
+    async def report_status(self) -> None:
+        """
+        Report the device's status at jittered intervals, starting at a random offset so the
+        reports of the fleet are spread over the interval instead of arriving together.
+        """
+        await asyncio.sleep(random.uniform(0, self.report_interval))
+        while True:
+            self.report(Status.generate_fake_status(device_id=f"{self.device_id}"))
+            self.reports += 1
+            await asyncio.sleep(max(0.0, self.report_interval + random.uniform(-self.jitter, self.jitter)))
+
+
+class Simulator:
+    """
+    Hosts many logical devices in one process, on one event loop and a small pool of MQTT connections.
+
+    Devices are spread evenly over the connections. Every connection dispatches its messages to the
+    event loop, so command handling and status reports of all devices run on a single thread.
+
+    Attributes:
+        devices (List[SimulatedDevice]): The simulated devices.
+        clients (List[MQTTClient]): The MQTT connections shared by the devices.
+    """
+
+    def __init__(self, device_count: int = SIMULATED_DEVICES, connections: int = SIMULATOR_CONNECTIONS,
+                 broker_address: str = BROKER_ADDRESS, report_interval: float = REPORT_INTERVAL,
+                 jitter: float = REPORT_JITTER, command_latency: float = COMMAND_LATENCY,
+                 device_prefix: Optional[str] = None, codec=JSON, **device_options):
+        """
+        Initialize the simulator, the connections and devices are created by run.
+
+        Args:
+            device_count (int): Number of devices to simulate.
+            connections (int): Number of MQTT connections shared by the devices.
+            broker_address (str): The address of the MQTT broker.
+            report_interval (float): Seconds between two reports of a device.
+            jitter (float): Random +/- seconds added to every report interval.
+            command_latency (float): Seconds a device takes to handle a command.
+            device_prefix (Optional[str]): Prefix of the device IDs, the host name by default.
+            codec: Payload codec of the devices (see shared.codec).
+            **device_options: Other Device options, e.g. batch_size or keyframe_interval.
+        """
+        self.device_count: int = device_count
+        self.connections: int = max(1, min(connections, device_count))
+        self.broker_address: str = broker_address
+        self.report_interval: float = report_interval
+        self.jitter: float = jitter
+        self.command_latency: float = command_latency
+        self.device_prefix: str = device_prefix or socket.gethostname()
+        self.codec = codec
+        self.device_options = device_options
+        self.devices: List[SimulatedDevice] = []
+        self.clients: List[MQTTClient] = []
+
+    def create_devices(self, loop: asyncio.AbstractEventLoop) -> None:
+        """
+        Connect to the broker and create the devices, spread evenly over the connections.
+        Each connection has a stable client ID so its session survives reconnects.
+
+        Args:
+            loop (asyncio.AbstractEventLoop): The loop running the devices.
+        """
+        self.clients = [
+            MQTTClient(self.broker_address, dispatcher=AsyncioDispatcher(loop, max_pending=self.device_count),
+                       client_id=f"{self.device_prefix}-simulator-{index}")
+            for index in range(self.connections)
+        ]
+        self.devices = [
+            SimulatedDevice(
+                f"{self.device_prefix}-{index:05d}", self.clients[index % self.connections], loop,
+                jitter=self.jitter, command_latency=self.command_latency, status_topic=STATUS_TOPIC,
+                command_topic=COMMAND_TOPIC, response_topic=RESPONSE_TOPIC, codec=self.codec,
+                report_interval=self.report_interval, **self.device_options,
+            )
+            for index in range(self.device_count)
+        ]
+
+    async def log_stats(self) -> None:
+        """
+        Periodically log the number of reports made by the fleet.
+        """
+        reported = 0
+        while True:
+            await asyncio.sleep(STATS_INTERVAL)
+            total = sum(device.reports for device in self.devices)
+            logger.info(f"{len(self.devices)} devices, {(total - reported) / STATS_INTERVAL:.0f} reports/s")
+            reported = total
+
+    async def run(self) -> None:
+        """
+        Start the connections and run every device until cancelled.
+        """
+        loop = asyncio.get_running_loop()
+        self.create_devices(loop)
+        for client in self.clients:
+            client.start()
+        try:
+            await asyncio.gather(self.log_stats(), *(device.report_status() for device in self.devices))
+        finally:
+            for client in self.clients:
+                client.stop()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    simulator = Simulator(codec=get_codec(PAYLOAD_CODEC), batch_size=STATUS_BATCH_SIZE,
+                          batch_interval=STATUS_BATCH_INTERVAL, keyframe_interval=STATUS_KEYFRAME_INTERVAL,
+                          status_qos=STATUS_QOS, response_qos=RESPONSE_QOS, command_qos=COMMAND_QOS)
+    print(f"Simulating {simulator.device_count} devices over {simulator.connections} connections")
+    asyncio.run(simulator.run())
@@ -1,8 +1,12 @@
 import asyncio
+import json
 import threading
 import unittest
 from unittest.mock import patch, MagicMock
+from shared.codec import decode_batch
+from shared.models import Status
 from shared.mqtt_client import MQTTClient
+from outbox import Outbox
 from device import Device  # Update the import path according to your project structure
 
 
@@ -17,6 +21,13 @@ class TestDevice(unittest.TestCase):
         self.device = Device(self.device_id, self.mock_mqtt_client, self.status_topic, self.command_topic,
                              self.response_topic)
 
+    def test_subscribes_to_broadcast_and_device_topics(self):
+        """
+        Test that the device listens on the broadcast command topic and on its own command topic.
+        """
+        subscribed = [call[0][0] for call in self.mock_mqtt_client.subscribe.call_args_list]
+        self.assertEqual([self.command_topic, f"{self.command_topic}/123"], subscribed)
+
     @patch('device.Command')
     def test_on_command_echo(self, mock_command):
         # Mocking the incoming MQTT message
@@ -36,6 +47,20 @@ class TestDevice(unittest.TestCase):
             '{"device_id": "123", "echoed_message": "Test Message"}'
         )
 
+    def test_on_command_echo_returns_command_id(self):
+        """
+        Test that the echo response carries the correlation ID of the command.
+        """
+        mock_message = MagicMock()
+        mock_message.payload = b'{"action": "echo", "parameters": {"message": "Hi"}, "command_id": "abc123"}'
+
+        self.device.on_command(None, None, mock_message)
+
+        topic, payload = self.mock_mqtt_client.publish.call_args[0]
+        self.assertEqual(self.response_topic, topic)
+        self.assertEqual("abc123", json.loads(payload)["command_id"])
+        self.assertEqual("Hi", json.loads(payload)["response_message"])
+
     @patch('device.Command')
     def test_on_command_unsupported(self, mock_command):
         """
@@ -71,6 +96,92 @@ class TestDevice(unittest.TestCase):
                 '{"status": "ok"}'
             )
 
+    def test_report_batches_statuses(self):
+        """
+        Test that with batching enabled, readings are published together once the batch is full.
+        """
+        device = Device(self.device_id, self.mock_mqtt_client, self.status_topic, self.command_topic,
+                        self.response_topic, batch_size=3)
+        for _ in range(2):
+            device.report(Status.generate_fake_status(device_id="123"))
+        self.mock_mqtt_client.publish.assert_not_called()
+
+        device.report(Status.generate_fake_status(device_id="123"))
+        topic, payload = self.mock_mqtt_client.publish.call_args[0]
+        self.assertEqual("device/status/batch", topic)
+        self.assertEqual(["123"] * 3, [status["device_id"] for status in decode_batch(payload)])
+        self.assertEqual([], device.pending_statuses)
+
+    def test_report_sends_deltas_between_keyframes(self):
+        """
+        Test that with delta reporting enabled, only changed fields are sent between keyframes.
+        """
+        device = Device(self.device_id, self.mock_mqtt_client, self.status_topic, self.command_topic,
+                        self.response_topic, keyframe_interval=2)
+        status = Status.generate_fake_status(device_id="123")
+        messages = []
+        for _ in range(3):
+            device.report(status)
+            messages.append(json.loads(self.mock_mqtt_client.publish.call_args[0][1]))
+
+        self.assertEqual([True, False, True], [message["keyframe"] for message in messages])
+        self.assertIn("location", messages[0])
+        self.assertEqual({"device_id", "timestamp", "keyframe", "seq"}, set(messages[1]))
+
+    def test_report_numbers_statuses_with_qos(self):
+        """
+        Test that every status carries an increasing seq and is published with the status QoS.
+        """
+        device = Device(self.device_id, self.mock_mqtt_client, self.status_topic, self.command_topic,
+                        self.response_topic, status_qos=1)
+        status = Status.generate_fake_status(device_id="123")
+        seqs = []
+        for _ in range(3):
+            device.report(status)
+            seqs.append(json.loads(self.mock_mqtt_client.publish.call_args[0][1])["seq"])
+            self.assertEqual(1, self.mock_mqtt_client.publish.call_args[1]["qos"])
+
+        self.assertEqual([seqs[0], seqs[0] + 1, seqs[0] + 2], seqs)
+
+    def test_outbox_buffers_while_offline(self):
+        """
+        Test that statuses go to the outbox while offline and are drained as batches after reconnecting.
+        """
+        outbox = Outbox(":memory:")
+        device = Device(self.device_id, self.mock_mqtt_client, self.status_topic, self.command_topic,
+                        self.response_topic, outbox=outbox, drain_batch_size=2)
+        self.mock_mqtt_client.connected = False
+        for _ in range(3):
+            device.report(Status.generate_fake_status(device_id="123"))
+        self.mock_mqtt_client.publish.assert_not_called()
+        self.assertEqual(3, len(outbox))
+
+        self.mock_mqtt_client.connected = True
+        self.assertTrue(device.drain_outbox_once())
+        topic, payload = self.mock_mqtt_client.publish.call_args[0]
+        self.assertEqual("device/status/batch", topic)
+        self.assertEqual(2, len(decode_batch(payload)))
+        self.assertEqual(1, len(outbox))
+
+    def test_outbox_drain_starts_with_keyframe(self):
+        """
+        Test that the outbox keeps full statuses and every drained batch starts with a keyframe,
+        even after the oldest statuses were evicted.
+        """
+        outbox = Outbox(":memory:", max_messages=2)
+        device = Device(self.device_id, self.mock_mqtt_client, self.status_topic, self.command_topic,
+                        self.response_topic, keyframe_interval=10, outbox=outbox)
+        self.mock_mqtt_client.connected = False
+        for _ in range(3):
+            device.report(Status.generate_fake_status(device_id="123"))
+        self.assertNotIn("keyframe", outbox.peek(1)[0][1])
+
+        self.mock_mqtt_client.connected = True
+        self.assertTrue(device.drain_outbox_once())
+        batch = decode_batch(self.mock_mqtt_client.publish.call_args[0][1])
+        self.assertEqual([True, False], [message["keyframe"] for message in batch])
+        self.assertEqual(batch[0]["seq"] + 1, batch[1]["seq"])
+
     def test_start(self):
         """
         Test start method to ensure MQTT client loop and status report are started.
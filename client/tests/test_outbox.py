@@ -0,0 +1,43 @@
+import os
+import tempfile
+import unittest
+from outbox import Outbox
+
+
+class TestOutbox(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "outbox.sqlite3")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_fifo(self):
+        outbox = Outbox(self.path)
+        for index in range(5):
+            outbox.put({"index": index})
+        entries = outbox.peek(3)
+        self.assertEqual([0, 1, 2], [message["index"] for _, message in entries])
+
+        outbox.remove(entries[-1][0])
+        self.assertEqual(2, len(outbox))
+        self.assertEqual([3, 4], [message["index"] for _, message in outbox.peek(10)])
+
+    def test_evicts_oldest_when_full(self):
+        outbox = Outbox(self.path, max_messages=3)
+        for index in range(5):
+            outbox.put({"index": index})
+        self.assertEqual(3, len(outbox))
+        self.assertEqual(2, outbox.evicted)
+        self.assertEqual([2, 3, 4], [message["index"] for _, message in outbox.peek(10)])
+
+    def test_persists_across_restarts(self):
+        outbox = Outbox(self.path)
+        outbox.put({"index": 1})
+        outbox.close()
+        self.assertEqual([{"index": 1}], [message for _, message in Outbox(self.path).peek(10)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import asyncio
+import json
+import unittest
+from unittest.mock import patch, MagicMock
+from simulator import Simulator
+
+
+class TestSimulator(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+
+    @patch('simulator.MQTTClient')
+    def test_devices_share_connections(self, mock_client):
+        """
+        Test that the devices are spread evenly over a small pool of connections.
+        """
+        mock_client.side_effect = lambda *args, **kwargs: MagicMock()
+        simulator = Simulator(device_count=10, connections=3, device_prefix="sim")
+        simulator.create_devices(self.loop)
+
+        self.assertEqual(3, len(simulator.clients))
+        self.assertEqual(10, len(simulator.devices))
+        self.assertEqual("sim-00000", simulator.devices[0].device_id)
+        self.assertEqual([4, 3, 3], [sum(device.mqtt_client is client for device in simulator.devices)
+                                     for client in simulator.clients])
+
+    @patch('simulator.MQTTClient')
+    def test_command_latency(self, mock_client):
+        """
+        Test that a command is answered only after the simulated latency.
+        """
+        simulator = Simulator(device_count=1, connections=1, command_latency=0.05, device_prefix="sim")
+        simulator.create_devices(self.loop)
+        device = simulator.devices[0]
+        message = MagicMock()
+        message.topic = "device/command/sim-00000"
+        message.payload = b'{"action": "echo", "parameters": {"message": "Hi"}, "command_id": "abc"}'
+
+        device.on_command(None, None, message)
+        device.mqtt_client.publish.assert_not_called()
+
+        self.loop.run_until_complete(asyncio.sleep(0.1))
+        topic, payload = device.mqtt_client.publish.call_args[0]
+        self.assertEqual("device/response", topic)
+        self.assertEqual("abc", json.loads(payload)["command_id"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+import json
+import zlib
+from typing import Any, Dict, List, Optional
+
+try:
+    import msgpack
+except ImportError:  # MessagePack support is optional
+    msgpack = None
+
+
+class JsonCodec:
+    """
+    Encodes messages as UTF-8 JSON, the default payload format.
+    """
+    name: str = "json"
+    content_type: str = "application/json"
+
+    def encode(self, message: Any) -> bytes:
+        """
+        Encode a message made of JSON types (use model_dump(mode="json") for pydantic models).
+        """
+        return json.dumps(message, separators=(",", ":")).encode("utf-8")
+
+    def decode(self, payload: bytes) -> Any:
+        return json.loads(payload.decode("utf-8"))
+
+
+class MsgPackCodec:
+    """
+    Encodes messages as MessagePack, a binary format that is markedly smaller than JSON
+    for the small numeric-heavy status messages.
+    """
+    name: str = "msgpack"
+    content_type: str = "application/msgpack"
+
+    def __init__(self):
+        if msgpack is None:
+            raise ImportError("The msgpack package is required for the msgpack codec")
+
+    def encode(self, message: Any) -> bytes:
+        return msgpack.packb(message, use_bin_type=True)
+
+    def decode(self, payload: bytes) -> Any:
+        return msgpack.unpackb(payload, raw=False)
+
+
+JSON = JsonCodec()
+CODECS: Dict[str, Any] = {JSON.name: JSON}
+if msgpack is not None:
+    CODECS[MsgPackCodec.name] = MsgPackCodec()
+CONTENT_TYPES: Dict[str, Any] = {codec.content_type: codec for codec in CODECS.values()}
+
+
+def get_codec(name: str):
+    """
+    Return a codec by name, e.g. "json" or "msgpack".
+
+    Raises:
+        ValueError: If the codec is unknown or its package is not installed.
+    """
+    try:
+        return CODECS[name]
+    except KeyError:
+        raise ValueError(f"Unknown or unavailable codec: {name}")
+
+
+def codec_topic(topic: str, codec) -> str:
+    """
+    Topic to publish on with a codec. Payloads in a codec other than JSON are advertised by
+    appending the codec name as the last topic level, e.g. device/status/msgpack.
+    """
+    return topic if codec is JSON else f"{topic}/{codec.name}"
+
+
+# Topic level marking a payload that packs several messages, e.g. device/status/batch/msgpack
+BATCH_LEVEL: str = "batch"
+# Largest decompressed batch accepted, so a small payload cannot expand without bound
+MAX_BATCH_BYTES: int = 8 * 1024 * 1024
+
+
+def encode_batch(messages: List[Any], codec=JSON) -> bytes:
+    """
+    Pack several messages into one zlib-compressed payload. Field names repeat in every
+    message, so a batch compresses far better than the messages on their own.
+    """
+    return zlib.compress(codec.encode(messages))
+
+
+def decode_batch(payload: bytes, codec=JSON, max_bytes: int = MAX_BATCH_BYTES) -> List[Any]:
+    """
+    Unpack a payload built by encode_batch.
+
+    Raises:
+        ValueError: If the payload decompresses to more than max_bytes.
+    """
+    decompressor = zlib.decompressobj()
+    data = decompressor.decompress(payload, max_bytes)
+    if decompressor.unconsumed_tail:
+        raise ValueError(f"Batch decompresses to more than {max_bytes} bytes")
+    return codec.decode(data)
+
+
+def is_batch_topic(topic: str) -> bool:
+    """
+    Whether a topic carries batches, i.e. has a "batch" level after the base topic.
+    """
+    return BATCH_LEVEL in topic.split("/")[1:]
+
+
+def codec_for(topic: str, content_type: Optional[str] = None):
+    """
+    Find the codec of a received message, from its MQTT v5 content type if it has one,
+    otherwise from the last level of its topic. JSON is the default.
+
+    Args:
+        topic (str): Topic the message was received on.
+        content_type (Optional[str]): MQTT v5 content-type property of the message.
+
+    Returns:
+        The codec to decode the payload with.
+    """
+    if content_type and content_type in CONTENT_TYPES:
+        return CONTENT_TYPES[content_type]
+    return CODECS.get(topic.rsplit("/", 1)[-1], JSON)
@@ -0,0 +1,47 @@
+from typing import Dict, Optional
+
+# Field set on every delta-encoded status message: true for a full keyframe, false for a delta.
+# Messages without it are full statuses from devices that do not use delta reporting.
+KEYFRAME_FIELD: str = "keyframe"
+# Fields sent in every message, changed or not
+DELTA_KEY_FIELDS = ("device_id", "timestamp")
+
+
+def encode_delta(previous: Optional[Dict], current: Dict) -> Dict:
+    """
+    Encode a status message as the fields that changed since the previous one.
+
+    Args:
+        previous (Optional[dict]): The previous status as sent, None to send a keyframe.
+        current (dict): The current status.
+
+    Returns:
+        dict: A keyframe with every field if there is no previous status, otherwise the device ID,
+              the timestamp and the fields whose value changed.
+    """
+    if previous is None:
+        return {**current, KEYFRAME_FIELD: True}
+    delta = {key: value for key, value in current.items() if key in DELTA_KEY_FIELDS or previous.get(key) != value}
+    delta[KEYFRAME_FIELD] = False
+    return delta
+
+
+def apply_delta(state: Optional[Dict], message: Dict) -> Optional[Dict]:
+    """
+    Rebuild a full status from the last known state of a device and a received message.
+
+    Args:
+        state (Optional[dict]): Last known full status of the device, None if unknown.
+        message (dict): The received message, a keyframe, a delta or a plain full status.
+
+    Returns:
+        Optional[dict]: The full status, or None for a delta of a device with no known state,
+                        which cannot be rebuilt until the next keyframe.
+    """
+    keyframe = message.get(KEYFRAME_FIELD, True)
+    fields = {key: value for key, value in message.items() if key != KEYFRAME_FIELD}
+    if keyframe:
+        return fields
+    if state is None:
+        return None
+    return {**state, **fields}
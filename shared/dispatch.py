@@ -0,0 +1,176 @@
+import asyncio
+import logging
+import queue
+import threading
+from typing import Callable, List
+
+logger = logging.getLogger(__name__)
+
+# What to do with a message when the dispatcher already holds max_pending of them
+OVERFLOW_DROP: str = "drop"
+OVERFLOW_BLOCK: str = "block"
+
+
+class ThreadPoolDispatcher:
+    """
+    Runs MQTT message handlers on a bounded pool of worker threads instead of the network thread.
+
+    Each worker has its own queue and every topic is always handled by the same worker, so the
+    messages of a topic are handled one at a time and in the order they arrived, while a slow
+    handler only holds up the topics sharing its worker.
+
+    Attributes:
+        overflow (str): "drop" to discard a message when its worker queue is full, "block" to wait for room.
+        dropped (int): Number of handler calls discarded because a queue was full.
+    """
+
+    def __init__(self, workers: int = 4, max_pending: int = 1000, overflow: str = OVERFLOW_DROP):
+        """
+        Start the worker threads.
+
+        Args:
+            workers (int): Number of worker threads.
+            max_pending (int): Maximum number of queued handler calls, split evenly between the workers.
+            overflow (str): "drop" or "block".
+        """
+        if overflow not in (OVERFLOW_DROP, OVERFLOW_BLOCK):
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        self.overflow: str = overflow
+        self.dropped: int = 0
+        self._queues: List[queue.Queue] = [queue.Queue(maxsize=max(1, max_pending // workers)) for _ in range(workers)]
+        self._threads: List[threading.Thread] = [
+            threading.Thread(target=self._work, args=(q,), daemon=True) for q in self._queues
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, key: str, handler: Callable, *args) -> bool:
+        """
+        Queue a handler call on the worker owning the key.
+
+        Args:
+            key (str): Ordering key, the message topic.
+            handler (Callable): The handler to call.
+            *args: Arguments of the handler.
+
+        Returns:
+            bool: False if the call was dropped.
+        """
+        worker_queue = self._queues[hash(key) % len(self._queues)]
+        if self.overflow == OVERFLOW_BLOCK:
+            worker_queue.put((handler, args))
+            return True
+        try:
+            worker_queue.put_nowait((handler, args))
+        except queue.Full:
+            self.dropped += 1
+            return False
+        return True
+
+    @property
+    def pending(self) -> int:
+        """
+        Number of handler calls waiting in the queues.
+        """
+        return sum(q.qsize() for q in self._queues)
+
+    def _work(self, worker_queue: queue.Queue) -> None:
+        while True:
+            item = worker_queue.get()
+            if item is None:
+                break
+            handler, args = item
+            try:
+                handler(*args)
+            except Exception:
+                logger.exception(f"Handler {handler} failed")
+
+    def stop(self) -> None:
+        """
+        Let the workers finish the queued calls, then stop them.
+        """
+        for worker_queue in self._queues:
+            worker_queue.put(None)
+        for thread in self._threads:
+            thread.join()
+
+
+class AsyncioDispatcher:
+    """
+    Runs MQTT message handlers on an asyncio event loop instead of the network thread.
+
+    Handlers are scheduled with call_soon_threadsafe, so they start in the order the messages
+    arrived. Coroutine handlers run as tasks; their order is only guaranteed up to their first await.
+
+    Attributes:
+        loop (asyncio.AbstractEventLoop): The loop running the handlers.
+        overflow (str): "drop" to discard a message when max_pending handlers are in flight, "block" to wait.
+        dropped (int): Number of handler calls discarded because the limit was reached.
+        pending (int): Number of handler calls scheduled or running.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, max_pending: int = 1000, overflow: str = OVERFLOW_DROP):
+        """
+        Initialize the dispatcher.
+
+        Args:
+            loop (asyncio.AbstractEventLoop): The loop running the handlers.
+            max_pending (int): Maximum number of handler calls scheduled or running at once.
+            overflow (str): "drop" or "block".
+        """
+        if overflow not in (OVERFLOW_DROP, OVERFLOW_BLOCK):
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        self.loop: asyncio.AbstractEventLoop = loop
+        self.overflow: str = overflow
+        self.dropped: int = 0
+        self.pending: int = 0
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+
+    def submit(self, key: str, handler: Callable, *args) -> bool:
+        """
+        Schedule a handler call on the loop.
+
+        Args:
+            key (str): Ordering key, unused as the loop runs handlers in submission order.
+            handler (Callable): The handler to call, a function or a coroutine function.
+            *args: Arguments of the handler.
+
+        Returns:
+            bool: False if the call was dropped.
+        """
+        if not self._slots.acquire(blocking=self.overflow == OVERFLOW_BLOCK):
+            self.dropped += 1
+            return False
+        with self._lock:
+            self.pending += 1
+        self.loop.call_soon_threadsafe(self._run, handler, args)
+        return True
+
+    def _release(self) -> None:
+        with self._lock:
+            self.pending -= 1
+        self._slots.release()
+
+    def _run(self, handler: Callable, args: tuple) -> None:
+        try:
+            result = handler(*args)
+        except Exception:
+            logger.exception(f"Handler {handler} failed")
+            self._release()
+            return
+        if asyncio.iscoroutine(result):
+            task = self.loop.create_task(result)
+            task.add_done_callback(self._done)
+        else:
+            self._release()
+
+    def _done(self, task: asyncio.Task) -> None:
+        self._release()
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Handler failed: {task.exception()}")
+
+    def stop(self) -> None:
+        """
+        Nothing to release, the loop is owned by the caller.
+        """
@@ -1,6 +1,73 @@
+import os
+import random
+import re
+from datetime import datetime, timezone
+from typing import List, Optional, Sequence, Tuple
 from pydantic import BaseModel
 from faker import Faker
 
+# Network states a device reports. Stored as their code, 0 is used for any other value.
+NETWORK_STATUSES: Tuple[str, ...] = ("Connected", "Disconnected", "Poor Connection")
+UNKNOWN_NETWORK_STATUS: str = "Unknown"
+
+STORAGE_USAGE = re.compile(r"^\s*(\d+)\s*GB\s*/\s*(\d+)\s*GB\s*$")
+
+# Number of fake addresses generated up front, fake statuses draw their location from this pool
+FAKE_ADDRESS_POOL_SIZE: int = 1000
+# Seed of the fake status generator, unset for different statuses on every run
+FAKE_STATUS_SEED: Optional[str] = os.environ.get("FAKE_STATUS_SEED")
+
+
+def network_status_code(network_status: str) -> int:
+    """
+    Code of a network status, as stored in the database.
+
+    Args:
+        network_status (str): Network status, e.g. "Connected".
+
+    Returns:
+        int: 1-based position in NETWORK_STATUSES, 0 if the status is unknown.
+    """
+    try:
+        return NETWORK_STATUSES.index(network_status) + 1
+    except ValueError:
+        return 0
+
+
+def network_status_name(code: int) -> str:
+    """
+    Network status of a code returned by network_status_code.
+    """
+    if 0 < code <= len(NETWORK_STATUSES):
+        return NETWORK_STATUSES[code - 1]
+    return UNKNOWN_NETWORK_STATUS
+
+
+def parse_storage_usage(storage_usage: str) -> Tuple[int, int]:
+    """
+    Split a storage usage string into used and total gigabytes.
+
+    Args:
+        storage_usage (str): Storage usage, e.g. "121 GB / 272 GB".
+
+    Returns:
+        Tuple[int, int]: Used and total storage in GB.
+
+    Raises:
+        ValueError: If the string is not in the "<used> GB / <total> GB" format.
+    """
+    match = STORAGE_USAGE.match(storage_usage)
+    if match is None:
+        raise ValueError(f"Invalid storage usage: {storage_usage!r}")
+    return int(match.group(1)), int(match.group(2))
+
+
+def format_storage_usage(used_gb: int, total_gb: int) -> str:
+    """
+    Format used and total gigabytes as a storage usage string, the inverse of parse_storage_usage.
+    """
+    return f"{used_gb} GB / {total_gb} GB"
+
 
 class Command(BaseModel):
     """
@@ -8,6 +75,7 @@ class Command(BaseModel):
     """
     action: str
     parameters: dict = {}
+    command_id: Optional[str] = None  # Correlation ID, echoed back in the responses
 
     @staticmethod
     def create_echo_command(message: str) -> 'Command':
@@ -33,6 +101,8 @@ class Status(BaseModel):
     network_status: str
     storage_usage: str
     last_response: str  = None
+    timestamp: Optional[datetime] = None  # When the device took the reading
+    seq: Optional[int] = None  # Increasing per device, used to discard statuses delivered more than once
 
     @staticmethod
     def generate_fake_status(device_id: str) -> 'Status':
@@ -45,16 +115,98 @@ class Status(BaseModel):
         Returns:
             Status: A fake status message.
         """
+        return fake_status_generator().generate(device_id)
+
+    @staticmethod
+    def generate_fake_statuses(device_ids: Sequence[str]) -> List['Status']:
+        """
+        Generates one fake status message per device at once, for load testing.
+
+        Args:
+            device_ids (Sequence[str]): The IDs of the devices.
+
+        Returns:
+            List[Status]: The fake status messages, in the order of device_ids.
+        """
+        return fake_status_generator().generate_many(device_ids)
+
+
+class FakeStatusGenerator:
+    """
+    Generates fake status messages for simulated devices.
+
+    Building a Faker instance loads all of its providers, which costs far more than a status,
+    so the generator builds one Faker, uses it once to fill a pool of addresses and draws
+    every other field from a plain random.Random.
+
+    Attributes:
+        addresses (List[str]): Pool of fake addresses the locations are drawn from.
+    """
+
+    def __init__(self, seed: Optional[int] = None, address_pool_size: int = FAKE_ADDRESS_POOL_SIZE):
+        """
+        Initialize the generator and pre-generate its address pool.
+
+        Args:
+            seed (Optional[int]): Seed for reproducible statuses, None for a random one.
+            address_pool_size (int): Number of distinct fake addresses.
+        """
         faker = Faker()
-        return Status(
+        if seed is not None:
+            faker.seed_instance(seed)
+        self._random = random.Random(seed)
+        self.addresses: List[str] = [faker.address() for _ in range(address_pool_size)]
+
+    def generate(self, device_id: str, timestamp: Optional[datetime] = None) -> Status:
+        """
+        Generate a fake status message.
+
+        Args:
+            device_id (str): The ID of the device.
+            timestamp (Optional[datetime]): Time of the reading, now by default.
+
+        Returns:
+            Status: A fake status message.
+        """
+        rand = self._random
+        # The fields are valid by construction, skip pydantic validation
+        return Status.model_construct(
             device_id=device_id,
-            battery_level=faker.random_int(min=0, max=100),
-            location=faker.address(),
-            network_status=faker.random_element(elements=("Connected", "Disconnected", "Poor Connection")),
-            storage_usage=f"{faker.random_int(min=10, max=128)} GB / {faker.random_int(min=128, max=512)} GB",
-            last_response=""
+            battery_level=rand.randint(0, 100),
+            location=rand.choice(self.addresses),
+            network_status=rand.choice(NETWORK_STATUSES),
+            storage_usage=format_storage_usage(rand.randint(10, 128), rand.randint(128, 512)),
+            last_response="",
+            timestamp=timestamp or datetime.now(timezone.utc),
         )
 
+    def generate_many(self, device_ids: Sequence[str]) -> List[Status]:
+        """
+        Generate one fake status message per device, all with the same timestamp.
+
+        Args:
+            device_ids (Sequence[str]): The IDs of the devices.
+
+        Returns:
+            List[Status]: The fake status messages, in the order of device_ids.
+        """
+        timestamp = datetime.now(timezone.utc)
+        return [self.generate(device_id, timestamp) for device_id in device_ids]
+
+
+_fake_status_generator: Optional[FakeStatusGenerator] = None
+
+
+def fake_status_generator() -> FakeStatusGenerator:
+    """
+    Return the generator shared by the process, created on first use.
+    """
+    global _fake_status_generator
+    if _fake_status_generator is None:
+        seed = int(FAKE_STATUS_SEED) if FAKE_STATUS_SEED else None
+        _fake_status_generator = FakeStatusGenerator(seed=seed)
+    return _fake_status_generator
+
 
 class Response(BaseModel):
     """
@@ -63,17 +215,19 @@ class Response(BaseModel):
     device_id: str
     response_type: str
     response_message: str = None
+    command_id: Optional[str] = None  # Correlation ID of the command being answered
 
     @staticmethod
-    def generate_fake_echo_response(device_id: str, message: str) -> "Response":
+    def generate_fake_echo_response(device_id: str, message: str, command_id: Optional[str] = None) -> "Response":
         """
         Create an echo response.
 
         Args:
             device_id (str): The ID of the responding device.
             message (str): The message to be echoed back.
+            command_id (Optional[str]): Correlation ID of the command being answered.
 
         Returns:
             EchoResponse: An echo response.
         """
-        return Response(device_id=device_id, response_type="echo", response_message=message)
+        return Response(device_id=device_id, response_type="echo", response_message=message, command_id=command_id)
@@ -1,5 +1,13 @@
+import logging
 import paho.mqtt.client as mqtt
-from typing import Callable, Dict
+from typing import Callable, Dict, Optional, Union
+from shared.topic_trie import TopicTrie
+from shared.dispatch import AsyncioDispatcher, ThreadPoolDispatcher
+
+logger = logging.getLogger(__name__)
+
+# Log one received message out of this many at debug level
+DEBUG_LOG_EVERY: int = 100
 
 
 class MQTTClient:
@@ -11,64 +19,125 @@ class MQTTClient:
     Attributes:
         broker_address (str): The address of the MQTT broker.
         client (mqtt.Client): The Paho MQTT client instance.
-        topic_handlers (Dict[str, Callable]): A dictionary mapping topics to callback functions.
+        topic_handlers (TopicTrie): Trie mapping topic filters, wildcards included, to their callback functions.
+        dispatcher: Runs the callbacks off the network thread, None to run them inline.
+        received (int): Number of messages received.
+        subscriptions (Dict[str, int]): QoS of each subscribed topic filter, renewed when the broker lost the session.
     """
 
-    def __init__(self, broker_address: str):
+    def __init__(self, broker_address: str, dispatcher: Optional[Union[ThreadPoolDispatcher, AsyncioDispatcher]] = None,
+                 client_id: Optional[str] = None):
         """
         Initialize the MQTTClient with a broker address.
 
         Args:
             broker_address (str): The address of the MQTT broker.
+            dispatcher: A ThreadPoolDispatcher or AsyncioDispatcher to run the callbacks on, so a slow callback does not
+                        hold up the network thread and its keepalives. By default callbacks run inline on the network thread.
+            client_id (Optional[str]): Stable client ID. With one, the broker keeps the session (subscriptions and
+                                       undelivered QoS 1 messages) across reconnects. Without one, a random ID and a
+                                       clean session are used.
         """
         self.broker_address: str = broker_address
-        self.client: mqtt.Client = mqtt.Client()
-        self.topic_handlers: Dict[str, Callable] = {}
+        self.client: mqtt.Client = mqtt.Client(client_id=client_id or "", clean_session=client_id is None)
+        self.topic_handlers: TopicTrie = TopicTrie()
+        self.dispatcher = dispatcher
+        self.received: int = 0
+        self.subscriptions: Dict[str, int] = {}
 
         # Set the universal on_message callback
         self.client.on_message = self.on_message_dispatcher
+        self.client.on_connect = self.on_connect
 
         # Connect to the MQTT broker
         self.client.connect(broker_address, 1883, 60)
 
+    def on_connect(self, client, userdata, flags, rc):
+        """
+        Renew the subscriptions after connecting, unless the broker kept them in a persistent session.
+        """
+        if rc != mqtt.CONNACK_ACCEPTED or flags.get("session present"):
+            return
+        for topic, qos in self.subscriptions.items():
+            self.client.subscribe(topic, qos=qos)
+
     def on_message_dispatcher(self, client, userdata, message):
         """
-        Dispatch incoming MQTT messages to the appropriate handler based on the topic.
+        Dispatch incoming MQTT messages to the handlers of every subscription matching the topic.
 
         Args:
             client: The MQTT client instance.
             userdata: User-defined data of any type.
             message: The MQTT message instance.
         """
-        handler = self.topic_handlers.get(message.topic)
-        if handler:
-            handler(client, userdata, message)
-            print(f"handler : {handler}")
-            print(f"Messg: {str(message.payload.decode('utf-8'))}")
+        self.received += 1
+        if self.received % DEBUG_LOG_EVERY == 1 and logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Received message {self.received} on {message.topic}: {message.payload[:200]!r}")
+
+        for handler in self.topic_handlers.match(message.topic):
+            if self.dispatcher is None:
+                handler(client, userdata, message)
+            else:
+                self.dispatcher.submit(message.topic, handler, client, userdata, message)
+
+    @property
+    def connected(self) -> bool:
+        """
+        Whether the client is currently connected to the broker.
+        """
+        return self.client.is_connected()
 
-    def publish(self, topic: str, message: str) -> None:
+    def publish(self, topic: str, message: Union[str, bytes], qos: int = 0) -> bool:
         """
         Publish a message to a specified MQTT topic.
 
         Args:
             topic (str): The MQTT topic to publish to.
-            message (str): The message to publish.
+            message (Union[str, bytes]): The message to publish, text or an encoded payload.
+            qos (int): 0 for at most once, 1 for at least once delivery to the broker.
+
+        Returns:
+            bool: False if the message could not be queued for sending, e.g. while disconnected.
         """
-        self.client.publish(topic, message)
+        return self.client.publish(topic, message, qos=qos).rc == mqtt.MQTT_ERR_SUCCESS
 
-    def subscribe(self, topic: str, callback: Callable) -> None:
+    def subscribe(self, topic: str, callback: Callable, qos: int = 0) -> None:
         """
         Subscribe to a specified MQTT topic and register a callback for handling messages.
+        The topic may contain "+" and "#" wildcards, and several callbacks can be registered for the same topic.
 
         Args:
             topic (str): The MQTT topic to subscribe to.
             callback (Callable): The callback function to be called when a message is received.
+            qos (int): Maximum QoS the broker delivers the topic's messages with.
+        """
+        if self.topic_handlers.add(topic, callback):
+            self.subscriptions[topic] = qos
+            self.client.subscribe(topic, qos=qos)
+
+    def unsubscribe(self, topic: str, callback: Optional[Callable] = None) -> None:
         """
-        self.topic_handlers[topic] = callback
-        self.client.subscribe(topic)
+        Remove a callback from a topic, or all of its callbacks. The broker subscription is
+        dropped once the topic has no callback left.
+
+        Args:
+            topic (str): The MQTT topic as passed to subscribe.
+            callback (Optional[Callable]): The callback to remove, None to remove all of them.
+        """
+        if self.topic_handlers.remove(topic, callback):
+            self.subscriptions.pop(topic, None)
+            self.client.unsubscribe(topic)
 
     def start(self) -> None:
         """
         Start the MQTT client loop to begin processing network events.
         """
         self.client.loop_start()
+
+    def stop(self) -> None:
+        """
+        Stop the MQTT client loop, then the dispatcher once it has handled the queued messages.
+        """
+        self.client.loop_stop()
+        if self.dispatcher is not None:
+            self.dispatcher.stop()
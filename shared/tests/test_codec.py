@@ -0,0 +1,61 @@
+import unittest
+from shared.codec import JSON, CODECS, codec_for, codec_topic, decode_batch, encode_batch, get_codec, is_batch_topic
+from shared.models import Status
+
+
+class TestCodec(unittest.TestCase):
+
+    def setUp(self):
+        self.message = Status.generate_fake_status(device_id="123").model_dump(mode="json")
+
+    def test_round_trip(self):
+        for codec in CODECS.values():
+            self.assertEqual(self.message, codec.decode(codec.encode(self.message)))
+
+    def test_msgpack_is_smaller(self):
+        if "msgpack" not in CODECS:
+            self.skipTest("msgpack is not installed")
+        self.assertLess(len(CODECS["msgpack"].encode(self.message)), len(JSON.encode(self.message)))
+
+    def test_json_keeps_plain_topic(self):
+        self.assertEqual("device/status", codec_topic("device/status", JSON))
+        self.assertIs(JSON, codec_for("device/status"))
+        self.assertIs(JSON, codec_for("device/command/6eee65279d79"))
+
+    def test_codec_from_topic_suffix(self):
+        if "msgpack" not in CODECS:
+            self.skipTest("msgpack is not installed")
+        codec = get_codec("msgpack")
+        self.assertEqual("device/status/msgpack", codec_topic("device/status", codec))
+        self.assertIs(codec, codec_for("device/status/msgpack"))
+
+    def test_codec_from_content_type(self):
+        if "msgpack" not in CODECS:
+            self.skipTest("msgpack is not installed")
+        self.assertIs(CODECS["msgpack"], codec_for("device/status", "application/msgpack"))
+
+    def test_batch_round_trip(self):
+        batch = [self.message] * 10
+        for codec in CODECS.values():
+            payload = encode_batch(batch, codec)
+            self.assertEqual(batch, decode_batch(payload, codec))
+            self.assertLess(len(payload), len(codec.encode(batch)))
+
+    def test_batch_size_limit(self):
+        payload = encode_batch([self.message] * 100)
+        with self.assertRaises(ValueError):
+            decode_batch(payload, max_bytes=1000)
+
+    def test_batch_topic(self):
+        self.assertTrue(is_batch_topic("device/status/batch"))
+        self.assertTrue(is_batch_topic("device/status/batch/msgpack"))
+        self.assertFalse(is_batch_topic("device/status"))
+        self.assertFalse(is_batch_topic("device/status/msgpack"))
+
+    def test_unknown_codec(self):
+        with self.assertRaises(ValueError):
+            get_codec("xml")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,29 @@
+import unittest
+from shared.delta import KEYFRAME_FIELD, apply_delta, encode_delta
+
+
+class TestDelta(unittest.TestCase):
+
+    def setUp(self):
+        self.previous = {"device_id": "123", "battery_level": 80, "location": "1 Main St", "timestamp": "2024-01-01T00:00:00Z"}
+        self.current = {"device_id": "123", "battery_level": 79, "location": "1 Main St", "timestamp": "2024-01-01T00:00:01Z"}
+
+    def test_keyframe_without_previous(self):
+        message = encode_delta(None, self.current)
+        self.assertTrue(message[KEYFRAME_FIELD])
+        self.assertEqual(self.current, apply_delta(None, message))
+
+    def test_delta_has_only_changed_fields(self):
+        message = encode_delta(self.previous, self.current)
+        self.assertEqual({"device_id": "123", "battery_level": 79, "timestamp": "2024-01-01T00:00:01Z", KEYFRAME_FIELD: False}, message)
+        self.assertEqual(self.current, apply_delta(self.previous, message))
+
+    def test_delta_of_unknown_device(self):
+        self.assertIsNone(apply_delta(None, encode_delta(self.previous, self.current)))
+
+    def test_plain_status_is_a_keyframe(self):
+        self.assertEqual(self.current, apply_delta(self.previous, dict(self.current)))
+
+
+if __name__ == '__main__':
+    unittest.main()
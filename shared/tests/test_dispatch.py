@@ -0,0 +1,90 @@
+import asyncio
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+from shared.dispatch import AsyncioDispatcher, ThreadPoolDispatcher
+from shared.mqtt_client import MQTTClient
+
+
+class TestThreadPoolDispatcher(unittest.TestCase):
+
+    def test_topic_order_is_kept(self):
+        dispatcher = ThreadPoolDispatcher(workers=4, max_pending=1000)
+        handled = {"a": [], "b": []}
+        for i in range(100):
+            for topic in handled:
+                dispatcher.submit(topic, handled[topic].append, i)
+        dispatcher.stop()
+        self.assertEqual(list(range(100)), handled["a"])
+        self.assertEqual(list(range(100)), handled["b"])
+
+    def test_drop_when_full(self):
+        dispatcher = ThreadPoolDispatcher(workers=1, max_pending=1)
+        started = threading.Event()
+        release = threading.Event()
+
+        def block():
+            started.set()
+            release.wait()
+
+        dispatcher.submit("a", block)
+        self.assertTrue(started.wait(timeout=5))  # the worker picked up the blocking call
+        self.assertTrue(dispatcher.submit("a", MagicMock()))
+        self.assertFalse(dispatcher.submit("a", MagicMock()))
+        self.assertEqual(1, dispatcher.dropped)
+        release.set()
+        dispatcher.stop()
+
+    def test_handler_errors_do_not_stop_the_worker(self):
+        dispatcher = ThreadPoolDispatcher(workers=1)
+        handler = MagicMock(side_effect=[ValueError("boom"), None])
+        dispatcher.submit("a", handler)
+        dispatcher.submit("a", handler)
+        dispatcher.stop()
+        self.assertEqual(2, handler.call_count)
+
+
+class TestAsyncioDispatcher(unittest.TestCase):
+
+    def test_runs_handlers_on_loop(self):
+        loop = asyncio.new_event_loop()
+        dispatcher = AsyncioDispatcher(loop, max_pending=10)
+        handled = []
+
+        async def handler(value):
+            handled.append((value, threading.current_thread()))
+
+        thread = threading.Thread(target=lambda: [dispatcher.submit("a", handler, i) for i in range(3)])
+        thread.start()
+        thread.join()
+        loop.run_until_complete(asyncio.sleep(0.05))
+        loop.close()
+        self.assertEqual([0, 1, 2], [value for value, _ in handled])
+        self.assertTrue(all(t is threading.main_thread() for _, t in handled))
+        self.assertEqual(0, dispatcher.pending)
+
+    def test_drop_when_full(self):
+        loop = asyncio.new_event_loop()
+        dispatcher = AsyncioDispatcher(loop, max_pending=1)
+        self.assertTrue(dispatcher.submit("a", MagicMock()))
+        self.assertFalse(dispatcher.submit("a", MagicMock()))
+        self.assertEqual(1, dispatcher.dropped)
+        loop.close()
+
+
+class TestMQTTClientDispatch(unittest.TestCase):
+
+    @patch('shared.mqtt_client.mqtt.Client')
+    def test_callbacks_go_through_dispatcher(self, mock_mqtt_client):
+        dispatcher = MagicMock()
+        mqtt_client = MQTTClient("test_broker", dispatcher=dispatcher)
+        callback = MagicMock()
+        mqtt_client.subscribe("test/topic", callback)
+        message = MagicMock(topic="test/topic", payload=b"{}")
+        mqtt_client.on_message_dispatcher(None, None, message)
+        callback.assert_not_called()
+        dispatcher.submit.assert_called_once_with("test/topic", callback, None, None, message)
+
+
+if __name__ == '__main__':
+    unittest.main()
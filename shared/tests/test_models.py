@@ -0,0 +1,51 @@
+import unittest
+from shared.models import (
+    Status,
+    FakeStatusGenerator,
+    network_status_code,
+    network_status_name,
+    parse_storage_usage,
+    format_storage_usage,
+)
+
+
+class TestStatusColumns(unittest.TestCase):
+
+    def test_network_status_round_trip(self):
+        for name in ("Connected", "Disconnected", "Poor Connection"):
+            self.assertEqual(name, network_status_name(network_status_code(name)))
+
+    def test_unknown_network_status(self):
+        self.assertEqual(0, network_status_code("Roaming"))
+        self.assertEqual("Unknown", network_status_name(0))
+
+    def test_storage_usage_round_trip(self):
+        self.assertEqual((121, 272), parse_storage_usage("121 GB / 272 GB"))
+        self.assertEqual("121 GB / 272 GB", format_storage_usage(121, 272))
+
+    def test_invalid_storage_usage(self):
+        with self.assertRaises(ValueError):
+            parse_storage_usage("full")
+
+    def test_fake_status_is_parseable(self):
+        status = Status.generate_fake_status(device_id="123")
+        used, total = parse_storage_usage(status.storage_usage)
+        self.assertLessEqual(used, total)
+        self.assertNotEqual(0, network_status_code(status.network_status))
+
+    def test_fake_statuses_in_bulk(self):
+        statuses = Status.generate_fake_statuses(["1", "2", "3"])
+        self.assertEqual(["1", "2", "3"], [status.device_id for status in statuses])
+        self.assertEqual(1, len({status.timestamp for status in statuses}))
+        for status in statuses:
+            Status.model_validate(status.model_dump())
+
+    def test_seeded_fake_statuses_repeat(self):
+        first = FakeStatusGenerator(seed=7, address_pool_size=10).generate_many(["1", "2"])
+        second = FakeStatusGenerator(seed=7, address_pool_size=10).generate_many(["1", "2"])
+        self.assertEqual([status.location for status in first], [status.location for status in second])
+        self.assertEqual([status.battery_level for status in first], [status.battery_level for status in second])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -17,21 +17,55 @@ class TestMQTTClient(unittest.TestCase):
     def test_publish(self):
         self.mqtt_client.client = MagicMock()
         self.mqtt_client.publish("test/topic", "test message")
-        self.mqtt_client.client.publish.assert_called_with("test/topic", "test message")
+        self.mqtt_client.client.publish.assert_called_with("test/topic", "test message", qos=0)
 
     def test_subscribe(self):
         self.mqtt_client.client = MagicMock()
         callback = MagicMock()
         self.mqtt_client.subscribe("test/topic", callback)
-        self.mqtt_client.client.subscribe.assert_called_with("test/topic")
+        self.mqtt_client.client.subscribe.assert_called_with("test/topic", qos=0)
         self.assertIn("test/topic", self.mqtt_client.topic_handlers)
-        self.assertEqual(callback, self.mqtt_client.topic_handlers["test/topic"])
+        self.assertEqual([callback], self.mqtt_client.topic_handlers["test/topic"])
+
+    def test_subscribe_same_topic_twice(self):
+        self.mqtt_client.client = MagicMock()
+        first, second = MagicMock(), MagicMock()
+        self.mqtt_client.subscribe("test/topic", first)
+        self.mqtt_client.subscribe("test/topic", second)
+        self.mqtt_client.client.subscribe.assert_called_once_with("test/topic", qos=0)
+        self.assertEqual([first, second], self.mqtt_client.topic_handlers["test/topic"])
+
+    def test_dispatch_wildcard_subscription(self):
+        self.mqtt_client.client = MagicMock()
+        callback = MagicMock()
+        self.mqtt_client.subscribe("device/+/status/#", callback)
+        message = MagicMock(topic="device/123/status/battery", payload=b"{}")
+        self.mqtt_client.on_message_dispatcher(None, None, message)
+        callback.assert_called_once_with(None, None, message)
+
+    def test_unsubscribe(self):
+        self.mqtt_client.client = MagicMock()
+        callback = MagicMock()
+        self.mqtt_client.subscribe("test/topic", callback)
+        self.mqtt_client.unsubscribe("test/topic", callback)
+        self.mqtt_client.client.unsubscribe.assert_called_once_with("test/topic")
+        self.assertNotIn("test/topic", self.mqtt_client.topic_handlers)
 
     def test_start(self):
         self.mqtt_client.client = MagicMock()
         self.mqtt_client.start()
         self.mqtt_client.client.loop_start.assert_called_once()
 
+    def test_resubscribe_when_session_lost(self):
+        self.mqtt_client.client = MagicMock()
+        self.mqtt_client.subscribe("test/topic", MagicMock(), qos=1)
+        self.mqtt_client.client.subscribe.reset_mock()
+
+        self.mqtt_client.on_connect(None, None, {"session present": 1}, 0)
+        self.mqtt_client.client.subscribe.assert_not_called()
+        self.mqtt_client.on_connect(None, None, {"session present": 0}, 0)
+        self.mqtt_client.client.subscribe.assert_called_once_with("test/topic", qos=1)
+
 
 if __name__ == '__main__':
     unittest.main()
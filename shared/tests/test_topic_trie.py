@@ -0,0 +1,70 @@
+import unittest
+from shared.topic_trie import TopicTrie
+
+
+class TestTopicTrie(unittest.TestCase):
+
+    def setUp(self):
+        self.trie = TopicTrie()
+
+    def handler(self, name):
+        def handle(*args):
+            return name
+        handle.__name__ = name
+        return handle
+
+    def test_exact_match(self):
+        handler = self.handler("exact")
+        self.trie.add("device/command", handler)
+        self.assertEqual([handler], self.trie.match("device/command"))
+        self.assertEqual([], self.trie.match("device/command/123"))
+        self.assertEqual([], self.trie.match("device"))
+
+    def test_single_level_wildcard(self):
+        handler = self.handler("plus")
+        self.trie.add("device/+/status", handler)
+        self.assertEqual([handler], self.trie.match("device/123/status"))
+        self.assertEqual([], self.trie.match("device/status"))
+        self.assertEqual([], self.trie.match("device/123/456/status"))
+
+    def test_multi_level_wildcard(self):
+        handler = self.handler("hash")
+        self.trie.add("device/status/#", handler)
+        self.assertEqual([handler], self.trie.match("device/status"))
+        self.assertEqual([handler], self.trie.match("device/status/123"))
+        self.assertEqual([handler], self.trie.match("device/status/123/batch"))
+        self.assertEqual([], self.trie.match("device/response/123"))
+
+    def test_all_matching_filters_dispatch(self):
+        exact, plus, hash_ = self.handler("exact"), self.handler("plus"), self.handler("hash")
+        self.trie.add("device/command/123", exact)
+        self.trie.add("device/command/+", plus)
+        self.trie.add("#", hash_)
+        self.assertEqual({exact, plus, hash_}, set(self.trie.match("device/command/123")))
+        self.assertEqual({plus, hash_}, set(self.trie.match("device/command/456")))
+
+    def test_handler_matched_once(self):
+        handler = self.handler("shared")
+        self.trie.add("device/#", handler)
+        self.trie.add("device/+", handler)
+        self.assertEqual([handler], self.trie.match("device/status"))
+
+    def test_wildcards_skip_system_topics(self):
+        handler = self.handler("hash")
+        self.trie.add("#", handler)
+        self.trie.add("+/broker", handler)
+        self.assertEqual([], self.trie.match("$SYS/broker"))
+
+    def test_remove(self):
+        first, second = self.handler("first"), self.handler("second")
+        self.trie.add("device/command", first)
+        self.trie.add("device/command", second)
+        self.assertFalse(self.trie.remove("device/command", first))
+        self.assertEqual([second], self.trie.match("device/command"))
+        self.assertTrue(self.trie.remove("device/command", second))
+        self.assertNotIn("device/command", self.trie)
+        self.assertEqual({}, self.trie._root.children)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+from typing import Callable, Dict, List, Optional
+
+
+class _Node:
+    """
+    One level of a topic filter in the trie.
+    """
+    __slots__ = ("children", "handlers")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        # Insertion ordered set of handlers
+        self.handlers: Dict[Callable, None] = {}
+
+
+class TopicTrie:
+    """
+    Trie of MQTT topic filters, each with one or more handlers.
+
+    Filters are split on "/" into levels and stored one level per node. The "+" level matches
+    exactly one topic level and "#" matches the remaining levels, including none, as in the MQTT
+    specification. Looking up a topic walks at most the literal, "+" and "#" children of each
+    node, so matching costs grow with the depth of the topic rather than the number of filters.
+    Topics starting with "$" are not matched by a wildcard in the first level.
+    """
+
+    def __init__(self):
+        """
+        Initialize an empty trie.
+        """
+        self._root: _Node = _Node()
+
+    def add(self, topic_filter: str, handler: Callable) -> bool:
+        """
+        Register a handler for a topic filter.
+
+        Args:
+            topic_filter (str): Topic filter, possibly with "+" and "#" wildcards.
+            handler (Callable): The handler to be called for matching topics.
+
+        Returns:
+            bool: True if the filter had no handler before.
+        """
+        node = self._root
+        for level in topic_filter.split("/"):
+            node = node.children.setdefault(level, _Node())
+        new_filter = not node.handlers
+        node.handlers[handler] = None
+        return new_filter
+
+    def remove(self, topic_filter: str, handler: Optional[Callable] = None) -> bool:
+        """
+        Unregister one handler, or all handlers, of a topic filter.
+
+        Args:
+            topic_filter (str): Topic filter as registered.
+            handler (Optional[Callable]): The handler to remove, None to remove every handler of the filter.
+
+        Returns:
+            bool: True if the filter has no handler left.
+        """
+        path = [self._root]
+        levels = topic_filter.split("/")
+        for level in levels:
+            node = path[-1].children.get(level)
+            if node is None:
+                return True
+            path.append(node)
+
+        node = path[-1]
+        if handler is None:
+            node.handlers.clear()
+        else:
+            node.handlers.pop(handler, None)
+
+        # Prune the nodes that no longer lead to a handler
+        for level, parent in zip(reversed(levels), reversed(path[:-1])):
+            child = parent.children[level]
+            if child.handlers or child.children:
+                break
+            del parent.children[level]
+        return not node.handlers
+
+    def match(self, topic: str) -> List[Callable]:
+        """
+        Return the handlers of every filter matching a topic.
+
+        Args:
+            topic (str): Topic of a received message, without wildcards.
+
+        Returns:
+            List[Callable]: The matching handlers, each handler at most once.
+        """
+        levels = topic.split("/")
+        handlers: List[Callable] = []
+        nodes = [self._root]
+        for depth, level in enumerate(levels):
+            next_nodes = []
+            for node in nodes:
+                if depth == 0 and level.startswith("$"):
+                    wildcard = None
+                    multi = None
+                else:
+                    wildcard = node.children.get("+")
+                    multi = node.children.get("#")
+                if multi is not None:
+                    handlers.extend(multi.handlers)
+                exact = node.children.get(level)
+                if exact is not None:
+                    next_nodes.append(exact)
+                if wildcard is not None:
+                    next_nodes.append(wildcard)
+            nodes = next_nodes
+            if not nodes:
+                break
+        for node in nodes:
+            handlers.extend(node.handlers)
+            # "a/#" also matches "a"
+            multi = node.children.get("#")
+            if multi is not None:
+                handlers.extend(multi.handlers)
+
+        return list(dict.fromkeys(handlers))
+
+    def __getitem__(self, topic_filter: str) -> List[Callable]:
+        """
+        Return the handlers registered for exactly this topic filter.
+        """
+        node = self._root
+        for level in topic_filter.split("/"):
+            node = node.children.get(level)
+            if node is None:
+                raise KeyError(topic_filter)
+        if not node.handlers:
+            raise KeyError(topic_filter)
+        return list(node.handlers)
+
+    def __contains__(self, topic_filter: str) -> bool:
+        try:
+            self[topic_filter]
+        except KeyError:
+            return False
+        return True